@@ -16,7 +16,7 @@ import threading
 from datetime import datetime, timezone
 
 from app.core.security import get_current_user
-from app.services import who_api_client
+from app.services import who_api_client, translation_index, who_enrichment
 from scripts.discover_ai_mappings import discover_ai_mappings
 import re # Make sure to import 're' at the top of admin.py
 from app.db.session import get_db
@@ -155,6 +155,12 @@ class EnrichICDPayload(BaseModel):
     release: str | None = None
 
 
+class BulkEnrichPayload(BaseModel):
+    release: str | None = None
+    force: bool = False  # also retry rows already attempted for this release
+    concurrency: int | None = None
+
+
 # --- File Paths ---
 DATA_PATH = "data/processed"
 DATA_PATH2 = "data/source2"
@@ -236,7 +242,7 @@ def get_who_api_token():
             'client_id': WHO_API_CLIENT_ID, 'client_secret': WHO_API_CLIENT_SECRET,
             'grant_type': 'client_credentials', 'scope': 'icdapi_access'
         }
-        r = requests.post(WHO_TOKEN_URL, data=payload, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        r = who_api_client.who_post(WHO_TOKEN_URL, data=payload, headers={'Content-Type': 'application/x-www-form-urlencoded'})
         r.raise_for_status()
         return r.json().get('access_token')
     except requests.exceptions.RequestException as e:
@@ -955,6 +961,8 @@ def reset_curation(db: Session = Depends(get_db), user: Any = Depends(get_curren
         db.query(Mapping).delete(synchronize_session=False)
         db.query(TraditionalTerm).delete(synchronize_session=False)
         db.commit()
+        # Stop serving the deleted verified mappings from memory (in this and every other worker)
+        translation_index.reset()
         return {
             "status": "success",
             "deleted": {
@@ -1636,6 +1644,7 @@ def undo_verification(payload: UndoPayload, db: Session = Depends(get_db)):
 
     verified_mappings.update({"status": "staged"}, synchronize_session=False)
     db.commit()
+    translation_index.schedule_rebuild([payload.icd_name])
 
     return {"message": f"Verification for '{payload.icd_name}' has been undone."}
 
@@ -1723,8 +1732,10 @@ def commit_to_master(db: Session = Depends(get_db)):
     if count == 0:
         raise HTTPException(status_code=400, detail="No staged mappings to commit.")
 
+    committed_icds = [name for (name,) in db.query(ICD11Code.icd_name).join(Mapping).filter(Mapping.status == 'staged').distinct()]
     staged_mappings.update({"status": "verified"}, synchronize_session=False)
     db.commit()
+    translation_index.schedule_rebuild(committed_icds)
     
     return {"message": f"{count} staged mappings have been verified."}
 
@@ -1871,6 +1882,8 @@ def update_master_mapping(payload: MasterUpdatePayload, db: Session = Depends(ge
         db.delete(mapping_to_delete)
 
     db.commit()
+    # Term edits here can touch terms that verified mappings share
+    translation_index.schedule_rebuild([payload.icd_name])
     return {"status": "success", "message": "Master map updated successfully."}
 
 
@@ -1975,6 +1988,7 @@ async def verify_mapping_with_ai(payload: AIVerifyPayload, db: Session = Depends
     except Exception as e:
         db.rollback()
         raise HTTPException(500, f"Failed to persist verification: {e}")
+    translation_index.schedule_rebuild([payload.icd_name])
 
     return {
         "status": "success",
@@ -2061,6 +2075,7 @@ def revert_master_mapping(payload: RevertPayload, db: Session = Depends(get_db))
     }, synchronize_session=False)
 
     db.commit()
+    translation_index.schedule_rebuild([payload.icd_name])
 
     return {"status": "success", "message": f"{count_to_revert} mapping(s) for '{payload.icd_name}' reverted to New Suggestions."}
 
@@ -2220,17 +2235,20 @@ def enrich_icd_from_who(payload: EnrichICDPayload, db: Session = Depends(get_db)
             pass
 
     # Persist updates
-    dirty = False
+    dirty = code_changed = False
     if definition and icd.description != definition:
         icd.description = definition
         dirty = True
     if code and getattr(icd, 'icd_code', None) != code:
         icd.icd_code = code
-        dirty = True
+        dirty = code_changed = True
 
     if dirty:
         db.add(icd)
         db.commit()
+    if code_changed:
+        # The translation index serves ICD codes (FHIR $translate, reverse lookup by code)
+        translation_index.schedule_rebuild([icd.icd_name])
 
     return {
         "icd_name": icd.icd_name,
@@ -2240,6 +2258,37 @@ def enrich_icd_from_who(payload: EnrichICDPayload, db: Session = Depends(get_db)
     }
 
 
+@router.post("/who-enrichment/start")
+def start_bulk_who_enrichment(payload: BulkEnrichPayload | None = None, user: Any = Depends(get_current_user)):
+    """Enrich every ICD row missing its WHO code, definition or TM2 data in the background.
+
+    Resumes an interrupted job instead of starting over; 409 while one is already running.
+    """
+    payload = payload or BulkEnrichPayload()
+    try:
+        job = who_enrichment.start(payload.release, payload.force, payload.concurrency)
+    except who_enrichment.EnrichmentJobRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "accepted", "job": job}
+
+
+@router.get("/who-enrichment/status")
+def bulk_who_enrichment_status(job_id: int | None = None):
+    """Stored state and counters of a bulk enrichment job (latest by default)."""
+    job = who_enrichment.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No WHO enrichment job found.")
+    return job
+
+
+@router.get("/who-enrichment/progress")
+def bulk_who_enrichment_progress(job_id: int | None = None):
+    """Completion, throughput and ETA of a bulk enrichment job (latest by default)."""
+    progress = who_enrichment.progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No WHO enrichment job found.")
+    return progress
+
 
 @router.post("/add-icd-code")
 def add_icd_code(payload: ICDAddPayload, db: Session = Depends(get_db), user: Any = Depends(get_current_user)):
@@ -2289,7 +2338,7 @@ def fetch_who_description(payload: DescriptionFetchPayload, user: Any = Depends(
         if not token: raise HTTPException(status_code=503, detail="Could not authenticate with WHO API.")
         headers = { 'Authorization': f'Bearer {token}', 'Accept': 'application/json', 'API-Version': 'v2' }
         search_url = f"{WHO_API_BASE_URL}?q={payload.icd_name}"
-        r = requests.get(search_url, headers=headers); r.raise_for_status()
+        r = who_api_client.who_get(search_url, headers=headers); r.raise_for_status()
         entities = r.json().get('destinationEntities', [])
         if not entities: raise HTTPException(status_code=404, detail="ICD code not found via WHO API.")
         
@@ -2553,6 +2602,8 @@ def _deep_reset_job():
                 _dr_log(f"Commit after DELETE fallback failed: {ce}")
         if deadlock_fallback_used:
             _dr_log("Fallback delete strategy completed")
+        # Stop serving the truncated mappings from memory (in this and every other worker)
+        translation_index.reset()
         _set_progress(2)
         # 2. Remove legacy CSV artifacts (best effort)
         _dr_log("[3/6] Removing legacy CSV artifacts")
@@ -2569,7 +2620,8 @@ def _deep_reset_job():
         def discovery_progress_callback(msg: str):
             _dr_log(msg)
         
-        discover_ai_mappings(progress_callback=discovery_progress_callback)
+        with who_api_client.priority(who_api_client.BACKGROUND):
+            discover_ai_mappings(progress_callback=discovery_progress_callback)
         _set_progress(4)
         # 4. Sanity checks
         _dr_log("[5/6] Performing sanity checks")
@@ -2579,6 +2631,7 @@ def _deep_reset_job():
         if icd_count == 0 or mapping_count == 0:
             raise RuntimeError("Population validation failed (zero icd or mapping records)")
         _dr_log(f"Sanity OK: icd={icd_count}, terms={term_count}, mappings={mapping_count}")
+        translation_index.reset()
         _set_progress(5)
         # 5. Completed
         _dr_log("[6/6] Deep reset completed successfully")
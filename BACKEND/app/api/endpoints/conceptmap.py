@@ -4,6 +4,8 @@ from sqlalchemy import select, func
 from typing import List, Optional
 from app.db.session import get_db
 from app.db import models
+from app.services import translation_index, release_registry
+from app.services.cache_service import translation_cache
 
 router = APIRouter(prefix="/conceptmap", tags=["conceptmap"])
 
@@ -193,6 +195,11 @@ def refresh_release(version: str, db: Session = Depends(get_db)):
         inserted += 1
 
     db.commit()
+    release_registry.notify(db)
+    # Bumped first so the other workers rebuild (and pick up the release) on their next check
+    translation_index.bump_version()
+    translation_index.rebuild(db)
+    translation_cache.invalidate_release(version)
     return {"version": version, "elements": inserted, "status": "refreshed"}
 
 
@@ -10,6 +10,8 @@ from app.db.models import Mapping, TraditionalTerm, ICD11Code, DiagnosisEvent, C
 from app.core.consent import require_consent
 from app.core.security import get_current_principal
 from app.util.fhir_outcome import outcome_not_found, outcome_validation, outcome_error
+from app.services import translation_index
+from app.services import release_registry
 
 router = APIRouter()
 
@@ -54,6 +56,42 @@ def append_audit_log(action: str, principal: Dict[str, Any], detail: Dict[str, A
         pass
 
 
+def _translate_parameters(target_uri: str, key: str, icd_code: Optional[str], icd_name: str,
+                          term_code: Optional[str], term_name: str, fallback_used: bool) -> Dict[str, Any]:
+    match_part = [
+        {"name": "equivalence", "valueCode": "equivalent"},
+        {
+            "name": "concept",
+            "valueCoding": {
+                "system": target_uri,
+                "code": icd_code or icd_name,
+                "display": icd_name,
+            },
+        },
+    ]
+    # Include source details as well
+    match_part.append(
+        {
+            "name": "source",
+            "valueCoding": {
+                "system": system_key_to_uri(key),
+                "code": term_code or term_name,
+                "display": term_name,
+            },
+        }
+    )
+    params = {
+        "resourceType": "Parameters",
+        "parameter": [
+            {"name": "result", "valueBoolean": True},
+            {"name": "match", "part": match_part},
+        ],
+    }
+    if fallback_used:
+        params["parameter"].append({"name": "note", "valueString": "Fallback used: non-primary verified mapping"})
+    return params
+
+
 # ---- FHIR CapabilityStatement ----
 
 
@@ -61,8 +99,8 @@ def append_audit_log(action: str, principal: Dict[str, Any], detail: Dict[str, A
 def capability_statement(principal: Dict[str, Any] = Depends(get_current_principal), db: Session = Depends(get_db)):
     """Enhanced CapabilityStatement advertising full implemented surface."""
     append_audit_log("fhir.metadata", principal, {})
-    latest_release = db.query(ConceptMapRelease).order_by(ConceptMapRelease.created_at.desc()).first()
-    releases = db.query(ConceptMapRelease).order_by(ConceptMapRelease.created_at.desc()).all()
+    latest_release = release_registry.current(db)
+    releases = db.query(ConceptMapRelease.version).order_by(ConceptMapRelease.created_at.desc()).all()
     current_version = latest_release.version if latest_release else None
     total_elements = 0
     if latest_release:
@@ -252,7 +290,7 @@ def ingest_bundle(
         if not rel_obj:
             raise HTTPException(400, f"Unknown release version: {release}")
     else:
-        rel_obj = db.query(ConceptMapRelease).order_by(ConceptMapRelease.created_at.desc()).first()
+        rel_obj = release_registry.current(db)
     release_version = rel_obj.version if rel_obj else None
     total = 0
     valid = 0
@@ -424,6 +462,19 @@ def conceptmap_translate(
 ):
     key = system_param_to_key(system)
     target_uri = target or ICD11_SYSTEM_URI
+    # Unpinned requests resolve against the in-memory index of the current release.
+    index = translation_index.current() if not release else None
+    hits = index.match_code_or_term(key, code) if index else []
+    if hits:
+        icd, term = hits[0]
+        params = _translate_parameters(
+            target_uri, key,
+            icd_code=icd.icd_code, icd_name=icd.icd_name,
+            term_code=term.code, term_name=term.term,
+            fallback_used=not term.is_primary,
+        )
+        append_audit_log("fhir.conceptmap.translate", principal, {"system": key, "code": code, "result": True, "release": release})
+        return params
     # Find verified primary mapping for given source.
     # Fallback: if no term has that code, allow passing the raw term (useful before codes are curated).
     base_q = db.query(Mapping).join(TraditionalTerm).options(joinedload(Mapping.icd11_code), joinedload(Mapping.traditional_term)).filter(TraditionalTerm.system == key, Mapping.status == "verified", Mapping.is_primary == True, or_(TraditionalTerm.code == code, TraditionalTerm.term == code))
@@ -446,39 +497,15 @@ def conceptmap_translate(
         append_audit_log("fhir.conceptmap.translate", principal, {"system": key, "code": code, "result": False})
         return outcome_not_found("No verified mapping found (code or term)")
     icd = mapping.icd11_code
-    match_part = [
-        {"name": "equivalence", "valueCode": "equivalent"},
-        {
-            "name": "concept",
-            "valueCoding": {
-                "system": target_uri,
-                "code": icd.icd_code or icd.icd_name,
-                "display": icd.icd_name,
-            },
-        },
-    ]
-    # Include source details as well
-    match_part.append(
-        {
-            "name": "source",
-            "valueCoding": {
-                "system": system_key_to_uri(key),
-                "code": mapping.traditional_term.code or mapping.traditional_term.term,
-                "display": mapping.traditional_term.term,
-            },
-        }
+    params = _translate_parameters(
+        target_uri, key,
+        icd_code=icd.icd_code, icd_name=icd.icd_name,
+        term_code=mapping.traditional_term.code, term_name=mapping.traditional_term.term,
+        fallback_used=fallback_used,
     )
-    params = {
-        "resourceType": "Parameters",
-        "parameter": [
-            {"name": "result", "valueBoolean": True},
-            {"name": "match", "part": match_part},
-        ],
-    }
-    if fallback_used:
-        params["parameter"].append({"name": "note", "valueString": "Fallback used: non-primary verified mapping"})
     append_audit_log("fhir.conceptmap.translate", principal, {"system": key, "code": code, "result": True, "release": release})
     return params
 
+
 # Alias without '$' for environments or clients that mis-handle the $ in path (helper for smoke/tests)
 router.get("/ConceptMap/translate")(conceptmap_translate)
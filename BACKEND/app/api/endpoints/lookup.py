@@ -1,13 +1,14 @@
 # File: app/api/endpoints/lookup.py
 # DEFINITIVE VERSION with correct data structure
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_, and_
 
 from app.db.session import get_db
 from app.core.security import get_current_principal
-from app.db.models import Mapping, TraditionalTerm, ICD11Code, ConceptMapElement, ConceptMapRelease
+from app.db.models import Mapping, TraditionalTerm, ICD11Code, ConceptMapElement
+from app.services import release_registry, term_search, typeahead_index
 from typing import List, Optional
 from pydantic import BaseModel
 from collections import defaultdict
@@ -49,9 +50,11 @@ router = APIRouter()
 
 @router.get("/lookup", response_model=List[LookupResult])
 async def lookup_term(
+    response: Response,
     query: str = Query(..., min_length=2, description="Search (smart) across ICD-11 names/codes and traditional system terms/codes/aliases."),
     system: str | None = Query(None, description="Optional system hint (ayurveda|siddha|unani)."),
     use_snapshot_fallback: bool = Query(True, description="If no live verified mappings, fallback to latest ConceptMap snapshot."),
+    limit: int = Query(200, ge=1, le=2000, description="Most ICD results to return (best first); the X-Result-Truncated response header is 'true' when more matched."),
     db: Session = Depends(get_db),
     principal = Depends(get_current_principal)
 ):
@@ -61,39 +64,47 @@ async def lookup_term(
     2. If user types an ICD name or ICD code, return all system primary + alias terms bound to that ICD.
     3. Matching considers: traditional.term, traditional.code, vernacular (devanagari|tamil|arabic), ICD name, ICD code.
     4. If nothing in live verified mappings matches and snapshot fallback enabled, read latest ConceptMapRelease elements.
+    Each table is matched through its own trigram index (see term_search) and ICDs are returned best match first.
+    At most `limit` ICDs come back; X-Result-Truncated: true tells the caller there were more (raise limit or narrow the query).
     """
-    import re
     q_raw = query.strip()
     q_lower = q_raw.lower()
     like = f"%{q_lower}%"
 
     # Pattern hints
-    looks_like_icd_code = bool(re.match(r"^[A-TV-Z][0-9][0-9A-Z](?:\.[0-9A-Z]{1,4})?$", q_raw, flags=re.I))
-    looks_like_tm_code = bool(re.match(r"^[A-Z]{1,6}[-_]?[0-9]{1,5}[A-Z0-9]*$", q_raw, flags=re.I))
+    looks_like_icd_code = bool(term_search.ICD_CODE_RE.match(q_raw))
 
     # 1. Try to resolve candidate ICD IDs via verified mappings
-    base_q = db.query(Mapping).join(TraditionalTerm).join(ICD11Code).filter(Mapping.status=='verified')
-    term_match_filter = or_(
-        TraditionalTerm.term.ilike(like),
-        TraditionalTerm.code.ilike(q_raw) if looks_like_tm_code else TraditionalTerm.code.ilike(like),
-        TraditionalTerm.devanagari.ilike(like),
-        TraditionalTerm.tamil.ilike(like),
-        TraditionalTerm.arabic.ilike(like),
-        ICD11Code.icd_name.ilike(like),
-        ICD11Code.icd_code.ilike(q_raw) if looks_like_icd_code else ICD11Code.icd_code.ilike(like)
+    # One match past the limit on either side means the ranked lists were cut short
+    term_ids = term_search.term_matches(db, q_raw, system, limit=limit + 1, verified_only=True)
+    matched_icd_ids = term_search.icd_matches(db, q_raw, limit=limit + 1, verified_only=True, system=system)
+    truncated = len(term_ids) > limit or len(matched_icd_ids) > limit
+    term_ids, matched_icd_ids = term_ids[:limit], matched_icd_ids[:limit]
+    term_rank = {tid: i for i, tid in enumerate(term_ids)}
+    icd_rank = {cid: i for i, cid in enumerate(matched_icd_ids)}
+    unranked = len(term_ids) + len(matched_icd_ids)
+
+    candidate_q = db.query(Mapping.icd11_code_id, Mapping.traditional_term_id).join(TraditionalTerm).filter(
+        Mapping.status=='verified',
+        or_(Mapping.traditional_term_id.in_(term_ids), Mapping.icd11_code_id.in_(matched_icd_ids))
     )
     if system:
-        term_match_filter = and_(term_match_filter, TraditionalTerm.system==system.lower())
-
-    candidate_mappings = base_q.filter(term_match_filter).options(
-        joinedload(Mapping.traditional_term), joinedload(Mapping.icd11_code)
-    ).all()
+        candidate_q = candidate_q.filter(TraditionalTerm.system==system.lower())
 
-    icd_ids = {m.icd11_code_id for m in candidate_mappings}
+    # An ICD ranks by its best hit, whether on its own name/code or on one of its mapped terms
+    best_rank: dict[int, int] = {}
+    for icd_id, term_id in candidate_q.all():
+        rank = min(icd_rank.get(icd_id, unranked), term_rank.get(term_id, unranked))
+        best_rank[icd_id] = min(rank, best_rank.get(icd_id, rank))
+    if len(best_rank) > limit:
+        truncated = True
+        best_rank = {i: best_rank[i] for i in sorted(best_rank, key=lambda i: (best_rank[i], i))[:limit]}
+    icd_ids = set(best_rank)
+    response.headers["X-Result-Truncated"] = "true" if truncated else "false"
 
     if not icd_ids and use_snapshot_fallback:
         # Fallback to latest snapshot release elements (acts as cached system mapping)
-        latest_rel = db.query(ConceptMapRelease).order_by(ConceptMapRelease.created_at.desc()).first()
+        latest_rel = release_registry.current(db)
         if latest_rel:
             el_q = db.query(ConceptMapElement).filter(ConceptMapElement.release_id==latest_rel.id)
             # filter by term/code/system or icd
@@ -157,7 +168,7 @@ async def lookup_term(
         else:
             sys_block["aliases"].append(entry)
 
-    for m in all_mappings:
+    for m in sorted(all_mappings, key=lambda m: (best_rank[m.icd11_code_id], m.id)):
         push_mapping(m)
 
     final: list[LookupResult] = []
@@ -168,33 +179,17 @@ async def lookup_term(
         final.append(LookupResult(icd_name=icd_name, icd_description=data["icd_description"], system_mappings=sms))
     return final
 
-@router.get("/lookup/suggest", response_model=List[LookupSuggestion])
-async def lookup_suggest(
-    q: str = Query(..., min_length=2, description="Typeahead smart suggestions (ICD anchor first, then traditional)."),
-    system: Optional[str] = Query(None, description="Filter to a traditional system for term matches."),
-    limit: int = Query(20, ge=1, le=60),
-    include_snapshot: bool = Query(True, description="Include snapshot fallback if no live matches."),
-    db: Session = Depends(get_db),
-    principal = Depends(get_current_principal)
-):
-    frag = q.strip()
-    like = f"%{frag.lower()}%"
-    import re
-    looks_like_icd_code = bool(re.match(r"^[A-TV-Z][0-9][0-9A-Z](?:\.[0-9A-Z]{1,4})?$", frag, flags=re.I))
-    looks_like_tm_code = bool(re.match(r"^[A-Z]{1,6}[-_]?[0-9]{1,5}[A-Z0-9]*$", frag, flags=re.I))
-
-    # 1. Direct ICD match (code or name) => expand all its mappings as suggestions
-    icd_anchor_q = db.query(ICD11Code).filter(or_(
-        ICD11Code.icd_name.ilike(like),
-        ICD11Code.icd_code.ilike(frag if looks_like_icd_code else like)
-    )).limit(10).all()
+def _db_suggestions(db: Session, frag: str, system: Optional[str], limit: int) -> list[LookupSuggestion]:
+    """Live suggestions straight from the DB (used until the in-memory typeahead index is built)."""
+    # 1. Direct ICD match (code or name) => expand all its mappings as suggestions, best match first
+    icd_ids = term_search.icd_matches(db, frag, limit=10, verified_only=True)
 
     suggestions: list[LookupSuggestion] = []
-    if icd_anchor_q:
-        icd_ids = [c.id for c in icd_anchor_q]
+    if icd_ids:
+        icd_rank = {cid: i for i, cid in enumerate(icd_ids)}
         mapped = db.query(Mapping).join(TraditionalTerm).filter(Mapping.status=='verified', Mapping.icd11_code_id.in_(icd_ids)).join(ICD11Code).options(joinedload(Mapping.traditional_term), joinedload(Mapping.icd11_code)).all()
         by_icd: dict[str, list[Mapping]] = defaultdict(list)
-        for m in mapped: by_icd[m.icd11_code.icd_name].append(m)
+        for m in sorted(mapped, key=lambda m: (icd_rank[m.icd11_code_id], m.id)): by_icd[m.icd11_code.icd_name].append(m)
         for icd_name, maps in by_icd.items():
             # Add ICD anchor suggestion (single) – user can choose it directly
             suggestions.append(LookupSuggestion(kind='icd', icd_name=icd_name))
@@ -207,17 +202,11 @@ async def lookup_suggest(
 
     # 2. Traditional term/code fragment (if not already captured above sufficiently)
     if len(suggestions) < limit:
-        tt_like = or_(
-            TraditionalTerm.term.ilike(like),
-            TraditionalTerm.devanagari.ilike(like),
-            TraditionalTerm.tamil.ilike(like),
-            TraditionalTerm.arabic.ilike(like),
-            TraditionalTerm.code.ilike(frag if looks_like_tm_code else like)
-        )
-        tt_filters = [Mapping.status=='verified', tt_like]
-        if system: tt_filters.append(TraditionalTerm.system==system.lower())
-        tt_rows = db.query(Mapping).join(TraditionalTerm).join(ICD11Code).filter(*tt_filters) \
-            .options(joinedload(Mapping.traditional_term), joinedload(Mapping.icd11_code)).limit(limit*2).all()
+        term_ids = term_search.term_matches(db, frag, system, limit=limit*2, verified_only=True)
+        term_rank = {tid: i for i, tid in enumerate(term_ids)}
+        tt_rows = db.query(Mapping).filter(Mapping.status=='verified', Mapping.traditional_term_id.in_(term_ids)) \
+            .options(joinedload(Mapping.traditional_term), joinedload(Mapping.icd11_code)).all()
+        tt_rows.sort(key=lambda m: (term_rank[m.traditional_term_id], m.id))
         seen_tm: set[tuple[str,str|None]] = set()
         for m in tt_rows:
             td = m.traditional_term
@@ -227,10 +216,30 @@ async def lookup_suggest(
             suggestions.append(LookupSuggestion(kind='traditional', icd_name=m.icd11_code.icd_name, system=td.system, term=td.term, code=td.code, is_primary=m.is_primary))
             if len(suggestions) >= limit:
                 break
+    return suggestions
+
+@router.get("/lookup/suggest", response_model=List[LookupSuggestion])
+async def lookup_suggest(
+    q: str = Query(..., min_length=2, description="Typeahead smart suggestions (ICD anchor first, then traditional)."),
+    system: Optional[str] = Query(None, description="Filter to a traditional system for term matches."),
+    limit: int = Query(20, ge=1, le=60),
+    include_snapshot: bool = Query(True, description="Include snapshot fallback if no live matches."),
+    db: Session = Depends(get_db),
+    principal = Depends(get_current_principal)
+):
+    frag = q.strip()
+    like = f"%{frag.lower()}%"
+
+    # 1-2. ICD anchors with their mappings, then traditional term matches: in memory when the typeahead index is up
+    index = typeahead_index.current()
+    if index is not None:
+        suggestions = [LookupSuggestion(**s) for s in index.suggest(frag, system, limit)]
+    else:
+        suggestions = _db_suggestions(db, frag, system, limit)
 
     # 3. Snapshot fallback if still empty
     if not suggestions and include_snapshot:
-        latest_rel = db.query(ConceptMapRelease).order_by(ConceptMapRelease.created_at.desc()).first()
+        latest_rel = release_registry.current(db)
         if latest_rel:
             el_q = db.query(ConceptMapElement).filter(ConceptMapElement.release_id==latest_rel.id)
             el_filters = or_(ConceptMapElement.icd_name.ilike(like), ConceptMapElement.icd_code.ilike(like), ConceptMapElement.term.ilike(like))
@@ -6,6 +6,7 @@ from typing import Optional
 
 from app.db.session import get_db
 from app.db import models
+from app.services import release_registry
 
 router = APIRouter(prefix="/provenance", tags=["Provenance"]) 
 
@@ -16,7 +17,7 @@ def provenance_for_mapping(
     db: Session = Depends(get_db)
 ):
     # Find latest release and one element for the given icd_name (+ optional system)
-    rel = db.execute(select(models.ConceptMapRelease).order_by(models.ConceptMapRelease.created_at.desc())).scalar_one_or_none()
+    rel = release_registry.current(db)
     if not rel:
         raise HTTPException(404, "No ConceptMap release found")
     # Case-insensitive icd_name match
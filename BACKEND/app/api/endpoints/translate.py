@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from sqlalchemy import and_, select
+from app.db.session import get_db, SessionLocal
+from app.core.config import settings
 from app.core.security import get_current_principal
 from app.core.consent import require_consent
-from app.db.models import Mapping, TraditionalTerm, ICD11Code, ConceptMapRelease
+from app.db.models import Mapping, TraditionalTerm, ICD11Code, ConceptMapRelease, ConceptMapElement
 from app.util.fhir_outcome import outcome_not_found, outcome_validation
-from app.services.cache_service import translation_cache
-from app.services import who_api_client
+from app.services.cache_service import SharedTranslationCache, translation_cache
+from app.services import who_api_client, who_api_async, who_release_mirror, translation_index, release_registry
+from app.services.translation_index import IndexedICD, IndexedTerm
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Awaitable
 from sqlalchemy import or_, func
+import asyncio
+from dataclasses import dataclass
+import json
+import logging
+from itertools import groupby
+from datetime import datetime, timedelta, timezone
+
+LOGGER = logging.getLogger(__name__)
 
 # --- Pydantic Response Models ---
 
@@ -40,15 +51,21 @@ class TranslateResult(BaseModel):
     tm2: Optional[ICDEntry] = None
     release_version: Optional[str] = None
     direction: Optional[str] = None  # 'forward' or 'reverse'
+    enrichment: Optional[str] = None  # 'degraded' when WHO was unreachable and stored codes were served
 
-# --- Router Definition ---
+class TranslateBatchItem(BaseModel):
+    system: Optional[str] = None
+    code: Optional[str] = None
+    icd_name: Optional[str] = None
 
-router = APIRouter()
+class TranslateBatchRequest(BaseModel):
+    items: List[TranslateBatchItem] = Field(..., min_length=1, max_length=500)
+    release: Optional[str] = None
+    fhir: bool = False
 
-def _latest_release_version(db: Session) -> Optional[str]:
-    rel = db.query(ConceptMapRelease).order_by(ConceptMapRelease.created_at.desc()).first()
-    return rel.version if rel else None
+# --- Router Definition ---
 
+router = APIRouter()
 
 def _to_fhir_parameters(result: TranslateResult) -> dict:
     """Convert internal TranslateResult into a FHIR Parameters resource."""
@@ -60,6 +77,8 @@ def _to_fhir_parameters(result: TranslateResult) -> dict:
             {"name": "direction", "valueString": result.direction or "forward"},
         ]
     }
+    if result.enrichment:
+        params["parameter"].append({"name": "enrichment", "valueString": result.enrichment})
     # ICD target
     if result.icd:
         params["parameter"].append({
@@ -94,8 +113,398 @@ def _to_fhir_parameters(result: TranslateResult) -> dict:
     return params
 
 
+
+@dataclass(frozen=True)
+class _CachedTranslation:
+    """A translate answer as cached: the result (for batch callers) plus ready-to-send
+    JSON bodies keyed by response form ('json' or 'fhir')."""
+    result: TranslateResult
+    bodies: Dict[str, bytes]
+
+
+def _cache_entry(result: TranslateResult) -> _CachedTranslation:
+    fhir_body = json.dumps(_to_fhir_parameters(result), ensure_ascii=False, separators=(",", ":"))
+    return _CachedTranslation(result=result, bodies={
+        "json": result.model_dump_json().encode("utf-8"),
+        "fhir": fhir_body.encode("utf-8"),
+    })
+
+
+def _send(entry: _CachedTranslation, fhir: bool) -> Response:
+    """Raw response from pre-serialized bytes; skips response_model validation and re-encoding."""
+    return Response(content=entry.bodies["fhir" if fhir else "json"], media_type="application/json")
+
+
+def _group_system_mappings(terms: Iterable[IndexedTerm]) -> Dict[str, SystemMappingEntry]:
+    """Group the verified terms of one ICD into per-system primary + aliases entries."""
+    sys_map: Dict[str, SystemMappingEntry] = {}
+    for t in terms:
+        if t.system not in sys_map:
+            sys_map[t.system] = SystemMappingEntry(primary=None, aliases=[])
+        term_obj = SystemTerm(
+            name=t.term,
+            code=t.code,
+            description=t.source_description,
+            vernacular=t.vernacular,
+            extra={"source_row": t.source_row}
+        )
+        if t.is_primary and sys_map[t.system].primary is None:
+            sys_map[t.system].primary = term_obj
+        else:
+            sys_map[t.system].aliases.append(term_obj)
+    return sys_map
+
+
+def _anchor_for_code(db: Session, system: str, code: str) -> Optional[IndexedICD]:
+    """ICD anchor of the verified primary mapping for a NAMASTE code (index first, DB on a miss)."""
+    index = translation_index.current()
+    hit = index.primary_for_code(system, code) if index else None
+    if hit:
+        return hit[0]
+    mapping = (
+        db.query(Mapping)
+        .join(TraditionalTerm)
+        .filter(
+            TraditionalTerm.system == system,
+            TraditionalTerm.code == code,
+            Mapping.status == 'verified',
+            Mapping.is_primary == True
+        )
+        .first()
+    )
+    if not mapping:
+        return None
+    return translation_index.load_icds(db, [mapping.icd11_code_id]).get(mapping.icd11_code_id)
+
+
+def _anchor_for_icd_name(db: Session, icd_name: str) -> tuple[Optional[IndexedICD], Optional[dict]]:
+    """ICD anchor by name (index first, DB on a miss); returns (anchor, outcome) with outcome set on failure."""
+    index = translation_index.current()
+    anchor = index.by_icd_name.get(icd_name) if index else None
+    if anchor:
+        return anchor, None
+    icd_obj = db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).first()
+    if not icd_obj:
+        return None, outcome_not_found("ICD name not found")
+    anchor = translation_index.load_icds(db, [icd_obj.id]).get(icd_obj.id)
+    if not anchor:
+        return None, outcome_validation("Disease not verified")
+    return anchor, None
+
+
+# --- WHO resolution helpers (concurrent fan-out) ---
+
+def _val(x):
+    """Extract a plain string from WHO's {'@value': ...} language-tagged values."""
+    if isinstance(x, dict):
+        return x.get("@value") or x.get("value")
+    return x
+
+
+def _usable(data: Optional[dict]) -> bool:
+    return bool(data) and bool(data.get("code") or data.get("title"))
+
+
+def _who_entry(data: dict) -> ICDEntry:
+    """Shape any WHO entity-like dict (search hit, linearized or foundation entity) as an ICDEntry."""
+    return ICDEntry(
+        name=_val(data.get("title")),
+        code=data.get("code") or None,
+        description=_val(data.get("definition")),
+        icd_uri=data.get("@id") or data.get("id"),
+        extra={}
+    )
+
+
+def _alt_terms(sys_map: Dict[str, SystemMappingEntry]) -> list[str]:
+    """Traditional term names (primary first, then aliases across systems), capped to 10 variants."""
+    alt_terms: list[str] = []
+    for entry in sys_map.values():
+        if entry and entry.primary and entry.primary.name:
+            alt_terms.append(entry.primary.name)
+        if entry:
+            for al in entry.aliases:
+                if al.name:
+                    alt_terms.append(al.name)
+    return alt_terms[:10]
+
+
+async def _foundation_linearized(term: str, linearization: str, release: Optional[str]) -> Optional[dict]:
+    """Foundation search, then release-specific linearized fetch for the first hit."""
+    ent_uri = await who_api_async.search_foundation_uri(term)
+    if not ent_uri:
+        return None
+    ent_id = ent_uri.rstrip('/').split('/')[-1]
+    if not ent_id:
+        return None
+    return await who_api_async.fetch_linearized_entity_by_release(ent_id, linearization, release)
+
+
+async def _first_by_release(search: Callable[[str, Optional[str]], Awaitable[Optional[dict]]], terms: list[str], release: Optional[str]) -> Optional[dict]:
+    for t in terms:
+        try:
+            res = await search(t, release)
+        except Exception:
+            continue
+        if res:
+            return res
+    return None
+
+
+async def _first_usable(candidates: list[Awaitable[Optional[dict]]]) -> Optional[dict]:
+    """Run WHO lookups concurrently on the event loop; return the first usable result.
+
+    Remaining branches are cancelled as soon as a winner is found, which also aborts
+    their in-flight HTTP requests.
+    """
+    pending = {asyncio.ensure_future(c) for c in candidates}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    data = task.result()
+                except Exception:
+                    continue
+                if _usable(data):
+                    return data
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _resolve_mms(icd_name: str, release: Optional[str]) -> Optional[dict]:
+    """MMS: release search, foundation -> linearized by release, and the generic entity search race."""
+    return await _first_usable([
+        who_api_async.mms_search_by_release(icd_name, release),
+        _foundation_linearized(icd_name, 'mms', release),
+        who_api_async.search_and_fetch_entity(icd_name),
+    ])
+
+
+async def _resolve_tm2(icd_name: str, alt_terms: list[str], release: Optional[str]) -> Optional[dict]:
+    """TM2: ICD-name and traditional-term variants race; alias walks stay ordered within their branch."""
+    candidates: list[Awaitable[Optional[dict]]] = [
+        who_api_async.search_and_fetch_tm2(icd_name),
+        who_api_async.tm2_search_by_release(icd_name, release),
+        _foundation_linearized(icd_name, 'tm2', release),
+    ]
+    if alt_terms:
+        candidates.append(who_api_async.search_tm2_by_terms(alt_terms))
+        candidates.append(_first_by_release(who_api_async.tm2_search_by_release, alt_terms, release))
+    return await _first_usable(candidates)
+
+
+async def _fetch_who_entries(icd_name: str, alt_terms: list[str], release: Optional[str]) -> tuple[Optional[ICDEntry], Optional[ICDEntry]]:
+    """Resolve the WHO ICD (MMS) and TM2 entries for an ICD name as two concurrent tasks."""
+    mms_task = asyncio.create_task(_resolve_mms(icd_name, release))
+    tm2_task = asyncio.create_task(_resolve_tm2(icd_name, alt_terms, release))
+    try:
+        who_data, tm2_data = await asyncio.gather(mms_task, tm2_task)
+    except asyncio.CancelledError:
+        mms_task.cancel()
+        tm2_task.cancel()
+        raise
+
+    icd_entry: Optional[ICDEntry] = None
+    if who_data:
+        icd_entry = _who_entry(who_data)
+        # If definition was not present in the initial normalized search result,
+        # fetch full entity details using the @id to obtain the definition.
+        if not icd_entry.description and icd_entry.icd_uri:
+            try:
+                full_ent = await who_api_async.get_entity_details(icd_entry.icd_uri)
+                if full_ent:
+                    icd_entry.name = _val(full_ent.get("title")) or icd_entry.name
+                    icd_entry.description = _val(full_ent.get("definition")) or icd_entry.description
+                    icd_entry.code = full_ent.get("code") or icd_entry.code
+            except Exception:
+                pass
+    tm2_entry: Optional[ICDEntry] = _who_entry(tm2_data) if tm2_data else None
+    return icd_entry, tm2_entry
+
+
+def _apply_who_enrichment(icd_code: ICD11Code, icd_entry: Optional[ICDEntry], tm2_entry: Optional[ICDEntry], release: Optional[str]) -> bool:
+    """Persist a WHO enrichment attempt (MMS + TM2) and its freshness metadata onto the ICD row.
+
+    Returns whether the row's ICD code changed: the translation index serves that code, so
+    the caller schedules a rebuild once the change is committed.
+    """
+    code_changed = False
+    if icd_entry:
+        if icd_entry.description:
+            icd_code.description = icd_entry.description
+        # Save the WHO MMS code if provided
+        if icd_entry.code:
+            code_changed = icd_entry.code != icd_code.icd_code
+            icd_code.icd_code = icd_entry.code
+        if icd_entry.icd_uri:
+            icd_code.icd_uri = icd_entry.icd_uri
+    if tm2_entry:
+        icd_code.tm2_code = tm2_entry.code or icd_code.tm2_code
+        icd_code.tm2_title = tm2_entry.name or icd_code.tm2_title
+        icd_code.tm2_definition = tm2_entry.description or icd_code.tm2_definition
+        icd_code.tm2_uri = tm2_entry.icd_uri or icd_code.tm2_uri
+    icd_code.who_enriched_at = datetime.now(timezone.utc)
+    icd_code.who_release = release or who_api_client.WHO_DEFAULT_RELEASE
+    # The client reports outages and misses alike as None; either way, retry later.
+    icd_code.who_enrich_failed = not (icd_entry or tm2_entry)
+    return code_changed
+
+
+def _persists_release(release: Optional[str]) -> bool:
+    """Only the default release is written back: who_release is a single column, so storing
+    answers for pinned releases would make rows flip-flop (and re-enrich) between releases."""
+    return (release or who_api_client.WHO_DEFAULT_RELEASE) == who_api_client.WHO_DEFAULT_RELEASE
+
+
+def _enrichment_state(icd_code: ICD11Code, release: Optional[str]) -> str:
+    """Classify persisted WHO enrichment for a release as 'fresh', 'stale' or 'missing'.
+
+    Rows are only ever 'stale' (refreshed in the background) for the default release; a
+    pinned release either matches a fresh row or is looked up live without being persisted.
+    """
+    enriched_at = icd_code.who_enriched_at
+    if not enriched_at or icd_code.who_release != (release or who_api_client.WHO_DEFAULT_RELEASE):
+        return 'missing'
+    if enriched_at.tzinfo is None:
+        enriched_at = enriched_at.replace(tzinfo=timezone.utc)
+    if icd_code.who_enrich_failed:
+        max_age = timedelta(minutes=settings.WHO_ENRICHMENT_RETRY_MINUTES)
+    else:
+        max_age = timedelta(hours=settings.WHO_ENRICHMENT_TTL_HOURS)
+    if datetime.now(timezone.utc) - enriched_at <= max_age:
+        return 'fresh'
+    return 'stale' if _persists_release(release) else 'missing'
+
+
+def _persisted_entries(icd_code: ICD11Code) -> tuple[Optional[ICDEntry], Optional[ICDEntry]]:
+    """Build ICD/TM2 entries from enrichment already stored on the ICD row."""
+    icd_entry = None
+    if icd_code.icd_code or icd_code.description:
+        icd_entry = ICDEntry(
+            name=icd_code.icd_name,
+            code=icd_code.icd_code,
+            description=icd_code.description,
+            icd_uri=icd_code.icd_uri,
+            extra={}
+        )
+    tm2_entry = None
+    if icd_code.tm2_code or icd_code.tm2_title:
+        tm2_entry = ICDEntry(
+            name=icd_code.tm2_title,
+            code=icd_code.tm2_code,
+            description=icd_code.tm2_definition,
+            icd_uri=icd_code.tm2_uri,
+            extra={}
+        )
+    return icd_entry, tm2_entry
+
+
+async def _live_who_entries(icd_code: ICD11Code, alt_terms: list[str], release: Optional[str]) -> tuple[Optional[ICDEntry], Optional[ICDEntry], bool]:
+    """WHO entries for a row without usable enrichment, plus whether the answer is degraded.
+
+    While the circuit of every WHO host is open, WHO is not called at all. When a host's
+    circuit is open and an entry came back empty, the answer is degraded: whatever is
+    stored on the row fills the gaps, and the caller must neither persist nor cache it.
+    """
+    if who_api_client.breakers.all_open():
+        icd_entry, tm2_entry = None, None
+    else:
+        icd_entry, tm2_entry = await _fetch_who_entries(icd_code.icd_name, alt_terms, release)
+        if (icd_entry and tm2_entry) or not who_api_client.breakers.degraded():
+            return icd_entry, tm2_entry, False
+    stored_icd, stored_tm2 = _persisted_entries(icd_code)
+    return icd_entry or stored_icd, tm2_entry or stored_tm2, True
+
+
+# ICD ids with a background WHO refresh already queued (per process)
+_refresh_inflight: set[int] = set()
+
+
+async def _refresh_enrichment(icd_id: int, icd_name: str, alt_terms: list[str], release: Optional[str]) -> None:
+    """Background revalidation of a stale ICD row; runs after the response has been sent."""
+    try:
+        # Revalidation is not on anyone's critical path: yield WHO capacity to live requests
+        with who_api_client.priority(who_api_client.BACKGROUND):
+            icd_entry, tm2_entry = await _fetch_who_entries(icd_name, alt_terms, release)
+        if who_api_client.breakers.degraded() and not (icd_entry and tm2_entry):
+            return  # WHO outage: keep the stored enrichment and retry on a later request
+        if not _persists_release(release):
+            return
+        with SessionLocal() as db:
+            icd_code = db.get(ICD11Code, icd_id)
+            if icd_code is None:
+                return
+            code_changed = _apply_who_enrichment(icd_code, icd_entry, tm2_entry, release)
+            db.commit()
+        if code_changed:
+            translation_index.schedule_rebuild([icd_name])
+    except Exception as e:
+        LOGGER.warning("[TRANSLATE] Background WHO refresh failed for %s: %s", icd_name, e)
+    finally:
+        _refresh_inflight.discard(icd_id)
+
+
+def _queue_refresh(background_tasks: BackgroundTasks, icd_code: ICD11Code, alt_terms: list[str], release: Optional[str]) -> None:
+    if icd_code.id in _refresh_inflight:
+        return
+    _refresh_inflight.add(icd_code.id)
+    background_tasks.add_task(_refresh_enrichment, icd_code.id, icd_code.icd_name, alt_terms, release)
+
+
+# In-flight forward resolutions per event loop, keyed like translation_cache entries.
+_flights: Dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+_flight_stats = {"leaders": 0, "coalesced": 0}
+
+
+async def _cache_io(fn: Callable[..., Any], *args, **kwargs):
+    """fn(*args, **kwargs) on translation_cache; on a worker thread when the cache is SQLite-backed."""
+    if isinstance(translation_cache, SharedTranslationCache):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+async def _single_flight(key: str, make: Callable[[], Awaitable[Any]]):
+    """Run make() once per key at a time; concurrent callers await the leader's result.
+
+    A follower whose leader was cancelled (client went away) resolves on its own.
+    """
+    loop = asyncio.get_running_loop()
+    flight = _flights.get(key)
+    if flight and flight[0] is loop:
+        _flight_stats["coalesced"] += 1
+        try:
+            return await asyncio.shield(flight[1])
+        except asyncio.CancelledError:
+            if not flight[1].cancelled():
+                raise
+            return await make()
+
+    fut = loop.create_future()
+    # Mark failures as retrieved so an unawaited future does not log "exception never retrieved"
+    fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _flights[key] = (loop, fut)
+    _flight_stats["leaders"] += 1
+    try:
+        result = await make()
+        fut.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        if _flights.get(key, (None, None))[1] is fut:
+            del _flights[key]
+
+
 @router.get("/translate", response_model=TranslateResult)
 async def translate_code(
+    background_tasks: BackgroundTasks,
     system: Optional[str] = Query(None, description="The source traditional medicine system (e.g., 'ayurveda')."),
     code: Optional[str] = Query(None, description="The source NAMASTE code (e.g., 'AKK-12')."),
     icd_name: Optional[str] = Query(None, description="ICD-11 disease name to enrich via WHO; preferred for WHO lookups."),
@@ -113,322 +522,572 @@ async def translate_code(
       then fetch WHO details for that ICD name.
 
     In all cases, WHO is queried with the ICD disease name, not the NAMASTE code.
+    WHO enrichment persisted on the ICD row is reused while fresh (see _enrichment_state).
     """
-    icd_code: Optional[ICD11Code] = None
-    mapping: Optional[Mapping] = None
     cache_id_parts: list[str] = []
 
     if icd_name:
         # Lookup by ICD name (disease-centric request)
-        icd_code = db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).first()
-        if not icd_code:
-            return outcome_not_found("ICD name not found")
-        has_verified = db.query(Mapping).filter(
-            Mapping.icd11_code_id == icd_code.id,
-            Mapping.status == 'verified'
-        ).first() is not None
-        if not has_verified:
-            return outcome_validation("Disease not verified")
+        anchor, outcome = _anchor_for_icd_name(db, icd_name)
+        if outcome:
+            return outcome
         cache_id_parts.append(icd_name)
     else:
         # Lookup by (system, code)
         if not (system and code):
             return outcome_validation("Provide either icd_name or (system and code)")
-        mapping = (
-            db.query(Mapping)
-            .join(TraditionalTerm)
-            .options(joinedload(Mapping.traditional_term), joinedload(Mapping.icd11_code))
-            .filter(
-                TraditionalTerm.system == system.lower(),
-                TraditionalTerm.code == code,
-                Mapping.status == 'verified',
-                Mapping.is_primary == True
-            )
-            .first()
-        )
-        if not mapping:
+        anchor = _anchor_for_code(db, system.lower(), code)
+        if not anchor:
             return outcome_not_found("No verified primary mapping found for the given NAMASTE code")
-        icd_code = mapping.icd11_code
         cache_id_parts.append(f"{system}:{code}")
 
-    if not icd_code:
-        return outcome_not_found("ICD context not resolved")
-
     # Cache lookup (forward direction)
-    active_release = release or _latest_release_version(db)
+    active_release = release or release_registry.latest_version(db)
     cache_key = "|".join(cache_id_parts + [active_release or 'latest'])
-    cached = translation_cache.get(active_release, 'forward', cache_key)
+    cached = await _cache_io(translation_cache.get, active_release, 'forward', cache_key)
     if cached:
-        if fhir and hasattr(cached, 'release_version'):
-            return _to_fhir_parameters(cached)  # type: ignore
-        return cached
+        return _send(cached, fhir)
 
-    # 2. For the mapped ICD, pull the verified terms for each system (primary + aliases)
-    verified_mappings = (
-        db.query(Mapping)
-        .join(TraditionalTerm)
-        .filter(
-            Mapping.icd11_code_id == icd_code.id,
-            Mapping.status == 'verified',
-            # include both primary and aliases
-        ).all()
+    # Concurrent misses for the same key share one resolution (and one ICD11Code write)
+    resolved = await _single_flight(
+        f"{active_release}|forward|{cache_key}",
+        lambda: _resolve_forward(db, background_tasks, anchor, release, active_release, cache_key),
     )
+    return resolved if isinstance(resolved, dict) else _send(resolved, fhir)
 
-    sys_map: Dict[str, SystemMappingEntry] = {}
-    for m in verified_mappings:
-        t = m.traditional_term
-        if t.system not in sys_map:
-            sys_map[t.system] = SystemMappingEntry(primary=None, aliases=[])
-        term_obj = SystemTerm(
-            name=t.term,
-            code=t.code,
-            description=t.source_description,
-            vernacular=t.devanagari or t.tamil or t.arabic,
-            extra={"source_row": t.source_row}
-        )
-        if m.is_primary and sys_map[t.system].primary is None:
-            sys_map[t.system].primary = term_obj
-        else:
-            sys_map[t.system].aliases.append(term_obj)
 
-    # 3. Use the helper to fetch live data from the WHO API for the mapped ICD code
-    # Prefer MMS search by release to fetch a code directly if available
-    who_data = None
-    mms_norm = None
-    try:
-        mms_norm = who_api_client.mms_search_by_release(icd_code.icd_name, release)
-    except Exception:
-        mms_norm = None
-    if mms_norm and (mms_norm.get("code") or mms_norm.get("title")):
-        who_data = mms_norm
-    else:
-        # Try foundation search -> release-specific linearized fetch to pull a code
-        ent_uri = who_api_client.search_foundation_uri(icd_code.icd_name)
-        ent_id = None
-        if ent_uri:
+async def _resolve_forward(db: Session, background_tasks: BackgroundTasks, anchor: IndexedICD, release: Optional[str],
+                           active_release: Optional[str], cache_key: str) -> _CachedTranslation | dict:
+    """Cache-miss path of translate_code: returns the cached entry it built, or an OperationOutcome."""
+    # 2. Verified terms for each system (primary + aliases) come with the anchor
+    sys_map = _group_system_mappings(anchor.terms)
+    icd_code = db.get(ICD11Code, anchor.icd_id)
+    if not icd_code:
+        return outcome_not_found("ICD context not resolved")
+
+    # 3./4. WHO ICD (MMS) and TM2: serve persisted enrichment while fresh; when stale answer
+    # from the DB and revalidate in the background; only go to WHO inline when nothing is stored.
+    state = _enrichment_state(icd_code, release)
+    degraded = False
+    if state == 'missing':
+        icd_entry, tm2_entry, degraded = await _live_who_entries(icd_code, _alt_terms(sys_map), release)
+        # Persist WHO definition and codes into ICD table so they appear in the ICD list
+        if not degraded and _persists_release(release):
             try:
-                ent_id = ent_uri.rstrip('/').split('/')[-1]
+                code_changed = _apply_who_enrichment(icd_code, icd_entry, tm2_entry, release)
+                db.add(icd_code)
+                db.commit()
+                if code_changed:
+                    translation_index.schedule_rebuild([icd_code.icd_name])
             except Exception:
-                ent_id = None
-        if ent_id:
-            lin = who_api_client.fetch_linearized_entity_by_release(ent_id, 'mms', release)
-            if lin and (lin.get('code') or lin.get('title')):
-                who_data = lin
+                db.rollback()
+    else:
+        icd_entry, tm2_entry = _persisted_entries(icd_code)
+        if state == 'stale':
+            _queue_refresh(background_tasks, icd_code, _alt_terms(sys_map), release)
+
+    # 5. Assemble the final response
+    result = TranslateResult(
+        ayurveda=sys_map.get('ayurveda'),
+        siddha=sys_map.get('siddha'),
+        unani=sys_map.get('unani'),
+        icd=icd_entry,
+        tm2=tm2_entry,
+        release_version=active_release,
+        direction='forward',
+        enrichment='degraded' if degraded else None
+    )
+    entry = _cache_entry(result)
+    # Stale and degraded answers are not cached so the next request picks up the refreshed row
+    if state != 'stale' and not degraded:
+        await _cache_io(translation_cache.set, result.release_version, 'forward', cache_key, entry, icd_name=anchor.icd_name)
+    return entry
+
+
+# Upper bound on distinct ICDs enriched from WHO at once within one batch request.
+BATCH_WHO_CONCURRENCY = 8
+
+
+@router.post("/translate/batch")
+async def translate_batch(
+    payload: TranslateBatchRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    principal = Depends(get_current_principal),
+    _consent=Depends(require_consent('translation'))
+):
+    """
+    Batch variant of /translate for EMR documents carrying many NAMASTE codes.
+
+    Each item is either {system, code} or {icd_name}. Verified mappings for all
+    items are resolved with set-based queries, WHO enrichment runs once per distinct
+    ICD name, and every item gets its own result or OperationOutcome (per-item
+    errors never fail the whole batch). Results share translation_cache entries
+    with the single-item endpoint.
+    """
+    release = payload.release
+    active_release = release or release_registry.latest_version(db)
+    results: list[Optional[dict]] = [None] * len(payload.items)
+    keys: list[Optional[str]] = [None] * len(payload.items)
+    item_results: Dict[int, TranslateResult] = {}
+
+    # 1. Validate items and serve what we can from the cache
+    for idx, item in enumerate(payload.items):
+        if item.icd_name:
+            ident = item.icd_name
+        elif item.system and item.code:
+            ident = f"{item.system}:{item.code}"
+        else:
+            results[idx] = outcome_validation("Provide either icd_name or (system and code)")
+            continue
+        keys[idx] = "|".join([ident, active_release or 'latest'])
+        cached = await _cache_io(translation_cache.get, active_release, 'forward', keys[idx])
+        if cached:
+            item_results[idx] = cached.result
+
+    misses = [idx for idx, k in enumerate(keys) if k is not None and idx not in item_results]
+
+    # 2. Resolve the ICD anchor for each miss from the index; set-based DB queries for the rest
+    index = translation_index.current()
+    anchor_for_item: Dict[int, IndexedICD] = {}
+    code_items: list[int] = []
+    name_items: list[int] = []
+    for idx in misses:
+        item = payload.items[idx]
+        if item.icd_name:
+            anchor = index.by_icd_name.get(item.icd_name) if index else None
+            if anchor:
+                anchor_for_item[idx] = anchor
             else:
-                who_data = who_api_client.search_and_fetch_entity(icd_code.icd_name)
+                name_items.append(idx)
         else:
-            who_data = who_api_client.search_and_fetch_entity(icd_code.icd_name)
+            hit = index.primary_for_code(item.system.lower(), item.code) if index else None
+            if hit:
+                anchor_for_item[idx] = hit[0]
+            else:
+                code_items.append(idx)
 
-    icd_entry: Optional[ICDEntry] = None
-    if who_data:
-        # Extract title/definition with tolerant handling of dict or string
-        def _val(x):
-            if isinstance(x, dict):
-                return x.get("@value") or x.get("value")
-            return x
-        title = _val(who_data.get("title"))
-        definition = _val(who_data.get("definition"))
-        # Only set code if WHO returns a code; otherwise leave None.
-        icd_code_val = who_data.get("code") or None
-        icd_uri = who_data.get("@id")
+    icd_id_for_item: Dict[int, int] = {}
+    if code_items:
+        codes = {payload.items[idx].code for idx in code_items}
+        primary_by_code: Dict[tuple[str, str], int] = {}
+        for m in (
+            db.query(Mapping)
+            .join(TraditionalTerm)
+            .options(joinedload(Mapping.traditional_term))
+            .filter(
+                TraditionalTerm.code.in_(codes),
+                Mapping.status == 'verified',
+                Mapping.is_primary == True
+            )
+            .all()
+        ):
+            primary_by_code.setdefault((m.traditional_term.system, m.traditional_term.code), m.icd11_code_id)
+        for idx in code_items:
+            item = payload.items[idx]
+            icd_id = primary_by_code.get((item.system.lower(), item.code))
+            if icd_id is None:
+                results[idx] = outcome_not_found("No verified primary mapping found for the given NAMASTE code")
+                continue
+            icd_id_for_item[idx] = icd_id
+    if name_items:
+        names = {payload.items[idx].icd_name for idx in name_items}
+        id_by_name = dict(db.query(ICD11Code.icd_name, ICD11Code.id).filter(ICD11Code.icd_name.in_(names)).all())
+        for idx in name_items:
+            icd_id = id_by_name.get(payload.items[idx].icd_name)
+            if icd_id is None:
+                results[idx] = outcome_not_found("ICD name not found")
+                continue
+            icd_id_for_item[idx] = icd_id
 
-        # If definition was not present in the initial normalized search result,
-        # fetch full entity details using the @id to obtain the definition.
-        if not definition and icd_uri:
-            try:
-                full_ent = who_api_client.get_entity_details(icd_uri)
-                if full_ent:
-                    title = _val(full_ent.get("title")) or title
-                    definition = _val(full_ent.get("definition")) or definition
-                    icd_code_val = full_ent.get("code") or icd_code_val
-            except Exception:
-                pass
+    # 3. All verified mappings (primary + aliases) for DB-resolved ICDs in one query
+    if icd_id_for_item:
+        loaded = translation_index.load_icds(db, set(icd_id_for_item.values()))
+        for idx, icd_id in icd_id_for_item.items():
+            if icd_id in loaded:
+                anchor_for_item[idx] = loaded[icd_id]
+            else:
+                results[idx] = outcome_validation("Disease not verified")
+    anchors: Dict[int, IndexedICD] = {a.icd_id: a for a in anchor_for_item.values()}
+    icds: Dict[int, ICD11Code] = {}
+    if anchors:
+        icds = {c.id: c for c in db.query(ICD11Code).filter(ICD11Code.id.in_(list(anchors))).all()}
+    sys_maps = {icd_id: _group_system_mappings(a.terms) for icd_id, a in anchors.items() if icd_id in icds}
+
+    # 4. WHO enrichment deduped by ICD name: persisted rows are served directly (stale ones
+    # revalidated in the background); only missing ones go to WHO, with bounded concurrency.
+    gate = asyncio.Semaphore(BATCH_WHO_CONCURRENCY)
+    needed = set(sys_maps)
+    enriched: Dict[int, tuple[Optional[ICDEntry], Optional[ICDEntry]]] = {}
+    stale: set[int] = set()
+    live: list[int] = []
+    for icd_id in needed:
+        state = _enrichment_state(icds[icd_id], release)
+        if state == 'missing':
+            live.append(icd_id)
+            continue
+        enriched[icd_id] = _persisted_entries(icds[icd_id])
+        if state == 'stale':
+            stale.add(icd_id)
+            _queue_refresh(background_tasks, icds[icd_id], _alt_terms(sys_maps[icd_id]), release)
 
-        # Persist WHO definition and ICD code into ICD table so it appears in ICD list
+    async def _enrich(icd_id: int):
+        async with gate:
+            icd_entry, tm2_entry, degraded = await _live_who_entries(icds[icd_id], _alt_terms(sys_maps[icd_id]), release)
+        if degraded:
+            stale.add(icd_id)  # served, but neither persisted nor cached
+        return icd_entry, tm2_entry
+
+    fetched = dict(zip(live, await asyncio.gather(*[_enrich(i) for i in live])))
+    degraded_ids = stale & set(fetched)
+    enriched.update({icd_id: fetched.pop(icd_id) for icd_id in degraded_ids})
+    if fetched and _persists_release(release):
         try:
-            dirty = False
-            if definition and (icd_code.description != definition):
-                icd_code.description = definition
-                dirty = True
-            # Save the WHO MMS/TM2 code if provided
-            if icd_code_val and getattr(icd_code, 'icd_code', None) != icd_code_val:
-                icd_code.icd_code = icd_code_val
-                dirty = True
-            if dirty:
-                db.add(icd_code)
-                db.commit()
+            recoded = []
+            for icd_id, (icd_entry, tm2_entry) in fetched.items():
+                if _apply_who_enrichment(icds[icd_id], icd_entry, tm2_entry, release):
+                    recoded.append(icds[icd_id].icd_name)
+                db.add(icds[icd_id])
+            db.commit()
+            if recoded:
+                translation_index.schedule_rebuild(recoded)
         except Exception:
             db.rollback()
+    enriched.update(fetched)
 
-        icd_entry = ICDEntry(
-            name=title,
-            code=icd_code_val,
-            description=definition,
-            icd_uri=icd_uri,
-            extra={}
+    # 5. Assemble per-item results and populate the shared cache
+    by_icd: Dict[int, TranslateResult] = {}
+    for icd_id, (icd_entry, tm2_entry) in enriched.items():
+        sys_map = sys_maps[icd_id]
+        by_icd[icd_id] = TranslateResult(
+            ayurveda=sys_map.get('ayurveda'),
+            siddha=sys_map.get('siddha'),
+            unani=sys_map.get('unani'),
+            icd=icd_entry,
+            tm2=tm2_entry,
+            release_version=active_release,
+            direction='forward',
+            enrichment='degraded' if icd_id in degraded_ids else None
         )
+    entries: Dict[int, _CachedTranslation] = {}
+    to_cache = []
+    for idx, anchor in anchor_for_item.items():
+        if anchor.icd_id not in by_icd:
+            results[idx] = outcome_not_found("ICD context not resolved")
+            continue
+        item_results[idx] = by_icd[anchor.icd_id]
+        if anchor.icd_id not in stale:
+            if anchor.icd_id not in entries:
+                entries[anchor.icd_id] = _cache_entry(by_icd[anchor.icd_id])
+            to_cache.append((keys[idx], entries[anchor.icd_id], anchor.icd_name))
 
-    # 4. Try to fetch a TM2 entry (best-effort) via WHO API helper.
-    tm2_entry: Optional[ICDEntry] = None
-    tm2_data = who_api_client.search_and_fetch_tm2(icd_code.icd_name)
-    # Fallback: try traditional term names (primary first, then aliases across systems)
-    if not tm2_data:
-        alt_terms: list[str] = []
-        for syskey, entry in sys_map.items():
-            if entry and entry.primary and entry.primary.name:
-                alt_terms.append(entry.primary.name)
-            if entry:
-                for al in entry.aliases:
-                    if al.name:
-                        alt_terms.append(al.name)
-        if alt_terms:
-            try:
-                tm2_data = who_api_client.search_tm2_by_terms(alt_terms[:10])  # cap to 10 variants
-            except Exception:
-                tm2_data = None
-    if tm2_data:
-        tm2_title = (tm2_data.get("title") or {}).get("@value") if isinstance(tm2_data.get("title"), dict) else tm2_data.get("title")
-        tm2_definition = (tm2_data.get("definition") or {}).get("@value") if isinstance(tm2_data.get("definition"), dict) else tm2_data.get("definition")
-        tm2_code_val = tm2_data.get("code")
-        tm2_uri = tm2_data.get("@id") or tm2_data.get("id")
-        tm2_entry = ICDEntry(
-            name=tm2_title,
-            code=tm2_code_val,
-            description=tm2_definition,
-            icd_uri=tm2_uri,
-            extra={}
-        )
-    # If still no TM2, try release-aware TM2 search by icd_name and alternative terms; then foundation->linearized by release
-    if not tm2_entry:
-        tm2_norm = None
-        try:
-            tm2_norm = who_api_client.tm2_search_by_release(icd_code.icd_name, release)
-        except Exception:
-            tm2_norm = None
-        if not tm2_norm:
-            alt_terms: list[str] = []
-            for entry in sys_map.values():
-                if entry and entry.primary and entry.primary.name:
-                    alt_terms.append(entry.primary.name)
-                if entry:
-                    for al in entry.aliases:
-                        if al.name:
-                            alt_terms.append(al.name)
-            for t in alt_terms[:10]:
-                try:
-                    tm2_norm = who_api_client.tm2_search_by_release(t, release)
-                    if tm2_norm:
-                        break
-                except Exception:
-                    continue
-        if tm2_norm:
-            tm2_entry = ICDEntry(
-                name=tm2_norm.get("title", {}).get("@value") if isinstance(tm2_norm.get("title"), dict) else tm2_norm.get("title"),
-                code=tm2_norm.get("code"),
-                description=None,
-                icd_uri=tm2_norm.get("@id") or tm2_norm.get("id"),
-                extra={}
-            )
+    def _store():
+        for key, entry, icd_name in to_cache:
+            translation_cache.set(active_release, 'forward', key, entry, icd_name=icd_name)
+
+    if to_cache:
+        await _cache_io(_store)
+
+    for idx, res in item_results.items():
+        results[idx] = _to_fhir_parameters(res) if payload.fhir else res.model_dump()
+
+    errors = sum(1 for r in results if r and r.get("resourceType") == "OperationOutcome")
+    return {
+        "release_version": active_release,
+        "count": len(results),
+        "errors": errors,
+        "results": [
+            {"index": idx, "input": payload.items[idx].model_dump(exclude_none=True), "result": res}
+            for idx, res in enumerate(results)
+        ]
+    }
+
+
+def _anchors_for_icd_codes(db: Session, codes: Iterable[str]) -> tuple[Dict[str, List[IndexedICD]], set[str]]:
+    """Verified ICD anchors per ICD-11 code (index first, one DB query for the rest).
+
+    Returns (anchors_by_code, known_codes); a code in known_codes without anchors exists
+    in icd11_codes but has no verified mapping.
+    """
+    index = translation_index.current()
+    found: Dict[str, List[IndexedICD]] = {}
+    missing: list[str] = []
+    for c in codes:
+        hits = index.by_icd_code.get(c) if index else None
+        if hits:
+            found[c] = list(hits)
         else:
-            # Foundation search then TM2 linearized for a specific release
-            ent_uri2 = who_api_client.search_foundation_uri(icd_code.icd_name)
-            ent_id2 = None
-            if ent_uri2:
-                try:
-                    ent_id2 = ent_uri2.rstrip('/').split('/')[-1]
-                except Exception:
-                    ent_id2 = None
-            if ent_id2:
-                tm2_lin = who_api_client.fetch_linearized_entity_by_release(ent_id2, 'tm2', release)
-                if tm2_lin and (tm2_lin.get('code') or tm2_lin.get('title')):
-                    tm2_entry = ICDEntry(
-                        name=(tm2_lin.get("title") or {}).get("@value") if isinstance(tm2_lin.get("title"), dict) else tm2_lin.get("title"),
-                        code=tm2_lin.get("code"),
-                        description=(tm2_lin.get("definition") or {}).get("@value") if isinstance(tm2_lin.get("definition"), dict) else tm2_lin.get("definition"),
-                        icd_uri=tm2_lin.get("@id") or tm2_lin.get("id"),
-                        extra={}
-                    )
+            missing.append(c)
+    known = set(found)
+    if missing:
+        rows = db.query(ICD11Code.id, ICD11Code.icd_code).filter(ICD11Code.icd_code.in_(missing)).order_by(ICD11Code.id).all()
+        anchors = translation_index.load_icds(db, [r.id for r in rows])
+        for r in rows:
+            code_key = r.icd_code.upper()
+            known.add(code_key)
+            if r.id in anchors:
+                found.setdefault(code_key, []).append(anchors[r.id])
+    return found, known
 
-    # 5. Assemble the final response
-    result = TranslateResult(
+
+def _reverse_result(anchors: List[IndexedICD], release_version: Optional[str], icd_code: Optional[str] = None) -> TranslateResult:
+    """Reverse payload for one ICD (or every ICD sharing an ICD-11 code): grouped system mappings only."""
+    sys_map = _group_system_mappings(t for a in anchors for t in a.terms)
+    icd_entry = None
+    if icd_code:
+        # Callers that reverse by code need to know which ICD name(s) it resolved to
+        icd_entry = ICDEntry(name=anchors[0].icd_name, code=icd_code, description=None, icd_uri=None,
+                             extra={"icd_names": [a.icd_name for a in anchors]} if len(anchors) > 1 else {})
+    return TranslateResult(
         ayurveda=sys_map.get('ayurveda'),
         siddha=sys_map.get('siddha'),
         unani=sys_map.get('unani'),
-        icd=icd_entry,
-        tm2=tm2_entry,
-        release_version=_latest_release_version(db),
-        direction='forward'
+        icd=icd_entry,  # Reverse minimal payload (ICD/tm2 enrichment optional)
+        tm2=None,
+        release_version=release_version,
+        direction='reverse'
     )
-    result.release_version = active_release
-    translation_cache.set(result.release_version, 'forward', cache_key, result)
-    return _to_fhir_parameters(result) if fhir else result
+
+
+def _cache_reverse(release_version: Optional[str], cache_key: str, anchors: List[IndexedICD], result: TranslateResult) -> _CachedTranslation:
+    entry = _cache_entry(result)
+    # Entries are invalidated by ICD name; one tagged name per entry, so codes shared by
+    # several ICDs are not cached.
+    if len(anchors) == 1:
+        translation_cache.set(release_version, 'reverse', cache_key, entry, icd_name=anchors[0].icd_name)
+    return entry
 
 
 @router.get("/translate/reverse", response_model=TranslateResult)
 async def reverse_translate(
-    icd_name: str = Query(..., description="ICD-11 disease name to reverse translate into traditional systems."),
+    icd_name: Optional[str] = Query(None, description="ICD-11 disease name to reverse translate into traditional systems."),
+    icd_code: Optional[str] = Query(None, description="ICD-11 code (e.g. ME01, 1A00) to reverse translate; alternative to icd_name."),
     release: Optional[str] = Query(None, description="Reserved: specific release version (ignored for now)."),
     fhir: bool = Query(False, description="If true, wrap successful response as FHIR Parameters resource."),
     db: Session = Depends(get_db),
     principal = Depends(get_current_principal),
     _consent=Depends(require_consent('translation'))
 ):
-    cache_key = icd_name
-    latest_rel = release or _latest_release_version(db)
-    cached = translation_cache.get(latest_rel, 'reverse', cache_key)
+    if not (icd_name or icd_code):
+        return outcome_validation("Provide either icd_name or icd_code")
+    code = icd_code.strip().upper() if not icd_name else None
+    cache_key = f"code:{code}" if code else icd_name
+    latest_rel = release or release_registry.latest_version(db)
+    cached = await _cache_io(translation_cache.get, latest_rel, 'reverse', cache_key)
     if cached:
-        if fhir and hasattr(cached, 'release_version'):
-            return _to_fhir_parameters(cached)  # type: ignore
-        return cached
+        return _send(cached, fhir)
 
-    icd_obj = db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).first()
-    if not icd_obj:
-        return outcome_not_found("ICD name not found")
-    verified = db.query(Mapping).join(TraditionalTerm).filter(
-        Mapping.icd11_code_id == icd_obj.id,
-        Mapping.status == 'verified'
-    ).all()
-    if not verified:
-        return outcome_validation("Disease not verified")
+    if code:
+        found, known = _anchors_for_icd_codes(db, [code])
+        anchors = found.get(code)
+        if not anchors:
+            return outcome_validation("Disease not verified") if code in known else outcome_not_found("ICD code not found")
+    else:
+        anchor, outcome = _anchor_for_icd_name(db, icd_name)
+        if outcome:
+            return outcome
+        anchors = [anchor]
 
-    sys_map: Dict[str, SystemMappingEntry] = {}
-    for m in verified:
-        t = m.traditional_term
-        if t.system not in sys_map:
-            sys_map[t.system] = SystemMappingEntry(primary=None, aliases=[])
-        term_obj = SystemTerm(
-            name=t.term,
-            code=t.code,
-            description=t.source_description,
-            vernacular=t.devanagari or t.tamil or t.arabic,
-            extra={"source_row": t.source_row}
-        )
-        if m.is_primary and sys_map[t.system].primary is None:
-            sys_map[t.system].primary = term_obj
+    result = _reverse_result(anchors, latest_rel, code)
+    return _send(await _cache_io(_cache_reverse, result.release_version, cache_key, anchors, result), fhir)
+
+
+class ReverseBatchRequest(BaseModel):
+    icd_codes: List[str] = Field(..., min_length=1, max_length=500)
+    release: Optional[str] = None
+    fhir: bool = False
+
+
+@router.post("/translate/reverse/batch")
+def reverse_translate_batch(
+    payload: ReverseBatchRequest,
+    db: Session = Depends(get_db),
+    principal = Depends(get_current_principal),
+    _consent=Depends(require_consent('translation'))
+):
+    """Reverse translate many ICD-11 codes in one call.
+
+    Results are returned in request order with per-item OperationOutcomes for unknown or
+    unverified codes. Shares the 'reverse' translation_cache namespace with GET /translate/reverse.
+    """
+    active_release = payload.release or release_registry.latest_version(db)
+    codes = [(c or '').strip().upper() for c in payload.icd_codes]
+    by_code: Dict[str, Any] = {}
+    for code in dict.fromkeys(c for c in codes if c):
+        cached = translation_cache.get(active_release, 'reverse', f"code:{code}")
+        if cached:
+            by_code[code] = cached.result
+
+    found, known = _anchors_for_icd_codes(db, [c for c in dict.fromkeys(codes) if c and c not in by_code])
+    for code, anchors in found.items():
+        result = _reverse_result(anchors, active_release, code)
+        _cache_reverse(active_release, f"code:{code}", anchors, result)
+        by_code[code] = result
+
+    results: list[dict] = []
+    for code in codes:
+        if not code:
+            res = outcome_validation("Empty icd_code")
+        elif code in by_code:
+            res = _to_fhir_parameters(by_code[code]) if payload.fhir else by_code[code].model_dump()
+        elif code in known:
+            res = outcome_validation("Disease not verified")
         else:
-            sys_map[t.system].aliases.append(term_obj)
+            res = outcome_not_found("ICD code not found")
+        results.append(res)
+
+    errors = sum(1 for r in results if r.get("resourceType") == "OperationOutcome")
+    return {
+        "release_version": active_release,
+        "count": len(results),
+        "errors": errors,
+        "results": [
+            {"index": idx, "input": {"icd_code": payload.icd_codes[idx]}, "result": res}
+            for idx, res in enumerate(results)
+        ]
+    }
+
+@router.get("/translate/cache/stats")
+def translation_cache_stats(db: Session = Depends(get_db)):
+    index = translation_index.current()
+    return {
+        **translation_cache.stats(),
+        "index": index.stats() if index else None,
+        "who": who_api_client.cache_stats(),
+        "who_variants": who_api_client.variant_stats.snapshot(),
+        "who_mirror": who_release_mirror.stats(),
+        "who_budget": who_api_client.budget.stats(),
+        "who_circuits": who_api_client.breakers.stats(),
+        "single_flight": dict(_flight_stats),
+    }
+
+# Rows fetched per round-trip by the export's server-side cursor, and lines per flushed chunk.
+EXPORT_FETCH_SIZE = 1000
+EXPORT_FLUSH_LINES = 100
+
 
+def _export_line(icd_name: str, terms: list[IndexedTerm], icd_code: Optional[ICD11Code],
+                 release_version: Optional[str], snapshot_icd_code: Optional[str] = None) -> str:
+    sys_map = _group_system_mappings(terms)
+    icd_entry, tm2_entry = _persisted_entries(icd_code) if icd_code else (None, None)
+    if snapshot_icd_code:
+        # A pinned release reports the ICD code captured in its snapshot
+        icd_entry = icd_entry or ICDEntry(name=icd_name, code=None, description=None, icd_uri=None)
+        icd_entry.code = snapshot_icd_code
     result = TranslateResult(
         ayurveda=sys_map.get('ayurveda'),
         siddha=sys_map.get('siddha'),
         unani=sys_map.get('unani'),
-        icd=None,  # Reverse minimal payload (ICD/tm2 enrichment optional)
-        tm2=None,
-        release_version=latest_rel,
-        direction='reverse'
+        icd=icd_entry,
+        tm2=tm2_entry,
+        release_version=release_version,
+        direction='forward'
+    )
+    return json.dumps({"icd_name": icd_name, **result.model_dump()}, ensure_ascii=False) + "\n"
+
+
+def _export_live_rows(db: Session, release_version: Optional[str]) -> Iterator[str]:
+    """One line per ICD from live verified mappings, streamed in ICD order."""
+    stmt = (
+        select(Mapping)
+        .join(Mapping.traditional_term)
+        .join(Mapping.icd11_code)
+        .options(contains_eager(Mapping.traditional_term), contains_eager(Mapping.icd11_code))
+        .where(Mapping.status == 'verified')
+        .order_by(Mapping.icd11_code_id, Mapping.id)
+        .execution_options(yield_per=EXPORT_FETCH_SIZE)
+    )
+    rows = db.execute(stmt).scalars()
+    for _, group in groupby(rows, key=lambda m: m.icd11_code_id):
+        mappings = list(group)
+        icd = mappings[0].icd11_code
+        yield _export_line(icd.icd_name, [IndexedTerm.from_mapping(m) for m in mappings], icd, release_version)
+
+
+def _export_release_rows(db: Session, rel: ConceptMapRelease) -> Iterator[str]:
+    """One line per ICD from a pinned release snapshot (term codes joined back from traditional_terms)."""
+    stmt = (
+        select(ConceptMapElement, TraditionalTerm, ICD11Code)
+        .outerjoin(TraditionalTerm, and_(TraditionalTerm.system == ConceptMapElement.system,
+                                         TraditionalTerm.term == ConceptMapElement.term))
+        .outerjoin(ICD11Code, ICD11Code.icd_name == ConceptMapElement.icd_name)
+        .where(ConceptMapElement.release_id == rel.id)
+        .order_by(ConceptMapElement.icd_name, ConceptMapElement.id)
+        .execution_options(yield_per=EXPORT_FETCH_SIZE)
+    )
+    for icd_name, group in groupby(db.execute(stmt), key=lambda row: row[0].icd_name):
+        terms: list[IndexedTerm] = []
+        seen: set[int] = set()
+        icd_code, snapshot_code = None, None
+        for el, term, icd in group:
+            icd_code = icd_code or icd
+            snapshot_code = snapshot_code or el.icd_code
+            if el.id in seen:  # several traditional_terms rows share (system, term)
+                continue
+            seen.add(el.id)
+            terms.append(IndexedTerm(
+                mapping_id=el.id,
+                system=el.system,
+                term=el.term,
+                code=term.code if term else None,
+                source_description=term.source_description if term else None,
+                vernacular=(term.devanagari or term.tamil or term.arabic) if term else None,
+                source_row=term.source_row if term else None,
+                is_primary=bool(el.is_primary),
+            ))
+        yield _export_line(icd_name, terms, icd_code, rel.version, snapshot_code)
+
+
+@router.get("/translate/export")
+def export_translations(
+    release: Optional[str] = Query(None, description="Pin the export to a ConceptMap release snapshot; defaults to live verified mappings."),
+    db: Session = Depends(get_db),
+    principal = Depends(get_current_principal),
+    _consent=Depends(require_consent('translation'))
+):
+    """Stream the whole verified translation table as NDJSON, one TranslateResult-shaped line per ICD.
+
+    Rows are read through a server-side cursor and flushed in small chunks, so memory
+    stays flat regardless of table size. ICD/TM2 entries come from persisted WHO enrichment.
+    """
+    rel = None
+    if release:
+        rel = db.query(ConceptMapRelease).filter(ConceptMapRelease.version == release).first()
+        if not rel:
+            return outcome_not_found(f"Unknown release version: {release}")
+    release_version = rel.version if rel else release_registry.latest_version(db)
+    release_id = rel.id if rel else None
+
+    def _stream() -> Iterator[bytes]:
+        # The request-scoped session is closed once the endpoint returns; stream on our own.
+        with SessionLocal() as stream_db:
+            lines = (_export_release_rows(stream_db, stream_db.get(ConceptMapRelease, release_id))
+                     if release_id else _export_live_rows(stream_db, release_version))
+            buf: list[str] = []
+            for line in lines:
+                buf.append(line)
+                if len(buf) >= EXPORT_FLUSH_LINES:
+                    yield "".join(buf).encode("utf-8")
+                    buf.clear()
+            if buf:
+                yield "".join(buf).encode("utf-8")
+
+    filename = f"translations-{release_version or 'live'}.ndjson"
+    return StreamingResponse(
+        _stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Release-Version": release_version or ""},
     )
-    translation_cache.set(result.release_version, 'reverse', cache_key, result)
-    return _to_fhir_parameters(result) if fhir else result
 
-@router.get("/translate/cache/stats")
-def translation_cache_stats(db: Session = Depends(get_db)):
-    return translation_cache.stats()
 
 # --- NEW: Public helper endpoints for UI search flow ---
 
 @router.get("/verified-icd")
 def list_verified_icd(db: Session = Depends(get_db)):
     """Return distinct ICD names that have at least one verified mapping."""
+    index = translation_index.current()
+    if index:
+        return {"icd_names": list(index.verified_icd_names)}
     rows = (
         db.query(ICD11Code.icd_name)
         .join(Mapping, Mapping.icd11_code_id == ICD11Code.id)
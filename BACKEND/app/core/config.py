@@ -36,6 +36,19 @@ class Settings(BaseSettings):
     ABHA_HMAC_SECRET: str = "change_me"  # used when ABHA_VALIDATION_MODE=hmac
     ENABLE_WHO_SYNC: bool = False  # background WHO sync scheduler
     WHO_SYNC_INTERVAL_MINUTES: int = 180  # every 3 hours by default
+    WHO_SYNC_STALE_HOURS: int = 24  # a row checked more recently than this is skipped by the sync
+    WHO_SYNC_MAX_ROWS_PER_CYCLE: int = 2000  # stalest rows first; the rest wait for the next cycle
+    WHO_SYNC_BATCH_SIZE: int = 100  # rows per committed chunk
+    WHO_SYNC_CONCURRENCY: int = 4  # WHO lookups in flight per chunk
+    WHO_ENRICHMENT_TTL_HOURS: int = 24 * 7  # persisted WHO enrichment served without refresh
+    WHO_ENRICHMENT_RETRY_MINUTES: int = 30  # wait before re-trying an enrichment that got nothing
+    WHO_ENRICHMENT_CONCURRENCY: int = 4  # WHO lookups in flight per bulk enrichment job
+    WHO_ENRICHMENT_BATCH_SIZE: int = 50  # ICD rows per bulk enrichment chunk (one UPDATE + checkpoint)
+    TRANSLATION_CACHE_MAX_ENTRIES: int = 10000  # LRU bound for cached translate responses
+    TRANSLATION_CACHE_TTL_SECONDS: int = 3600
+    CACHE_BACKEND: str = "memory"  # memory|sqlite (see app/services/cache_backends.py)
+    CACHE_SQLITE_PATH: str = os.path.join("data", "cache", "shared_cache.sqlite3")
+    CACHE_COUNTER_FLUSH_SECONDS: float = 1.0  # sqlite backend: how often batched hit/miss counters are written
 
     # Development flag sometimes present in environment on CI/dev hosts
     DEV_MODE: bool | None = None
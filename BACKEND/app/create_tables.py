@@ -43,6 +43,36 @@ def main():
             conn.execute(text(
                 "ALTER TABLE icd11_codes ADD COLUMN IF NOT EXISTS tm2_definition TEXT"
             ))
+            # WHO enrichment freshness columns (icd11_codes)
+            conn.execute(text(
+                "ALTER TABLE icd11_codes ADD COLUMN IF NOT EXISTS icd_uri VARCHAR(255)"
+            ))
+            conn.execute(text(
+                "ALTER TABLE icd11_codes ADD COLUMN IF NOT EXISTS tm2_uri VARCHAR(255)"
+            ))
+            conn.execute(text(
+                "ALTER TABLE icd11_codes ADD COLUMN IF NOT EXISTS who_enriched_at TIMESTAMPTZ"
+            ))
+            conn.execute(text(
+                "ALTER TABLE icd11_codes ADD COLUMN IF NOT EXISTS who_release VARCHAR(50)"
+            ))
+            conn.execute(text(
+                "ALTER TABLE icd11_codes ADD COLUMN IF NOT EXISTS who_enrich_failed BOOLEAN NOT NULL DEFAULT FALSE"
+            ))
+            # WHO sync change tracking columns (icd11_codes)
+            conn.execute(text(
+                "ALTER TABLE icd11_codes ADD COLUMN IF NOT EXISTS who_synced_at TIMESTAMPTZ"
+            ))
+            conn.execute(text(
+                "ALTER TABLE icd11_codes ADD COLUMN IF NOT EXISTS who_sync_hash VARCHAR(64)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_icd11_codes_who_synced_at ON icd11_codes (who_synced_at)"
+            ))
+            # Reverse translate by WHO code looks up icd11_codes.icd_code
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_icd11_codes_icd_code ON icd11_codes (icd_code)"
+            ))
             # Indexes for diagnosis_events to support analytics map queries
             conn.execute(text(
                 "CREATE INDEX IF NOT EXISTS idx_diagnosis_events_created_at ON diagnosis_events (created_at)"
@@ -60,8 +90,14 @@ def main():
             conn.commit()
             print("Ensured new columns on traditional_terms (source_short_definition, source_long_definition).")
             print("Ensured TM2 columns on icd11_codes (tm2_code, tm2_title, tm2_definition).")
+            print("Ensured WHO enrichment freshness columns on icd11_codes (icd_uri, tm2_uri, who_enriched_at, who_release, who_enrich_failed).")
+            print("Ensured WHO sync tracking columns on icd11_codes (who_synced_at, who_sync_hash).")
+            print("Ensured index on icd11_codes (icd_code).")
             print("Ensured indexes on diagnosis_events (created_at, latitude/longitude).")
             print("Ensured provenance columns on mappings (origin, ingestion_filename).")
+            # pg_trgm extension + GIN trigram indexes for /public/lookup (commits on its own)
+            from app.services import term_search
+            print(f"Ensured lookup search indexes (backend: {term_search.ensure_indexes(conn)}).")
         except Exception as e:
             print(f"Warning: Could not apply column migrations: {e}")
 
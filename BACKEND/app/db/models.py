@@ -1,6 +1,6 @@
 # FILE: app/db/models.py
 
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, TIMESTAMP, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, TIMESTAMP, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 
@@ -11,12 +11,21 @@ class ICD11Code(Base):
     id = Column(Integer, primary_key=True, index=True)
     icd_name = Column(String(255), unique=True, nullable=False, index=True)
     # WHO linearized ICD code (e.g., ME01). Nullable until enriched via WHO.
-    icd_code = Column(String(50))
+    icd_code = Column(String(50), index=True)
     description = Column(Text)
     # --- New TM2 enrichment fields (optional, populated when TM2 data discovered) ---
     tm2_code = Column(String(50))
     tm2_title = Column(Text)
     tm2_definition = Column(Text)
+    # --- WHO enrichment freshness (translate serves persisted data while fresh) ---
+    icd_uri = Column(String(255))
+    tm2_uri = Column(String(255))
+    who_enriched_at = Column(TIMESTAMP(timezone=True))  # last WHO enrichment attempt
+    who_release = Column(String(50))  # WHO linearization release the enrichment was fetched for
+    who_enrich_failed = Column(Boolean, nullable=False, server_default='f')  # last attempt got nothing from WHO
+    # --- Background WHO sync change tracking (see app/services/who_sync.py) ---
+    who_synced_at = Column(TIMESTAMP(timezone=True), index=True)  # last time the sync checked this row
+    who_sync_hash = Column(String(64))  # sha256 of the WHO payload fields the sync applies
     status = Column(String(50), nullable=False, server_default='Orphaned')
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     mappings = relationship("Mapping", back_populates="icd11_code")
@@ -174,4 +183,98 @@ class IngestionRow(Base):
     status = Column(String(30), nullable=False, server_default='pending')  # pending|promoted|rejected
     # Background inference lifecycle: null (not scheduled), 'queued', 'running', 'done', 'error'
     inference_status = Column(String(20))
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+# --- Offline WHO ICD-11 release mirror (see app/services/who_release_mirror.py) ---
+class WhoReleaseEntity(Base):
+    """One linearized entity (MMS or TM2) of an imported WHO ICD-11 release."""
+    __tablename__ = 'who_release_entities'
+    __table_args__ = (
+        UniqueConstraint('release', 'linearization', 'entity_id', name='uq_who_release_entity'),
+    )
+    id = Column(Integer, primary_key=True)
+    release = Column(String(50), nullable=False)  # e.g. 2025-01
+    linearization = Column(String(20), nullable=False)  # mms|tm2
+    entity_id = Column(String(100), nullable=False)  # foundation entity id (last URI segment)
+    code = Column(String(50), index=True)
+    title = Column(Text)
+    definition = Column(Text)
+    uri = Column(String(255))  # linearization URI
+    foundation_uri = Column(String(255))
+
+
+class WhoReleaseTerm(Base):
+    """Normalized title / synonym of a mirrored entity, for exact-term local search."""
+    __tablename__ = 'who_release_terms'
+    __table_args__ = (
+        Index('ix_who_release_terms_lookup', 'release', 'linearization', 'term_norm'),
+    )
+    id = Column(Integer, primary_key=True)
+    release = Column(String(50), nullable=False)
+    linearization = Column(String(20), nullable=False)
+    entity_id = Column(String(100), nullable=False)
+    term_norm = Column(String(255), nullable=False)
+
+
+# --- Bulk WHO enrichment (see app/services/who_enrichment.py) ---
+class WhoEnrichmentJob(Base):
+    """A bulk WHO enrichment run over icd11_codes; the row doubles as its resume checkpoint."""
+    __tablename__ = 'who_enrichment_jobs'
+    id = Column(Integer, primary_key=True)
+    state = Column(String(20), nullable=False, server_default='running')  # running|completed|error
+    release = Column(String(50), nullable=False)
+    force = Column(Boolean, nullable=False, server_default='f')  # also retry rows already attempted for the release
+    concurrency = Column(Integer, nullable=False)
+    last_icd_id = Column(Integer, nullable=False, server_default='0')  # checkpoint: rows up to here are done
+    total = Column(Integer, nullable=False, server_default='0')
+    processed = Column(Integer, nullable=False, server_default='0')
+    enriched = Column(Integer, nullable=False, server_default='0')  # WHO returned MMS and/or TM2 data
+    not_found = Column(Integer, nullable=False, server_default='0')
+    deferred = Column(Integer, nullable=False, server_default='0')  # skipped while a WHO circuit was open
+    error = Column(Text)
+    started_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True))
+    finished_at = Column(TIMESTAMP(timezone=True))
+
+
+class IndexVersion(Base):
+    """Change counter per in-memory index; workers compare it to pick up other workers' writes."""
+    __tablename__ = 'index_versions'
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, server_default='0')
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class WhoSyncStatus(Base):
+    """WHO sync scheduler status (a single row), so every worker reports the leader's view."""
+    __tablename__ = 'who_sync_status'
+    id = Column(Integer, primary_key=True)  # always 1
+    leader = Column(String(255))  # host:pid of the process running the scheduler
+    leader_since = Column(TIMESTAMP(timezone=True))
+    heartbeat_at = Column(TIMESTAMP(timezone=True))
+    last_run = Column(TIMESTAMP(timezone=True))
+    changes = Column(Integer, nullable=False, server_default='0')
+    created_release = Column(String(50))
+    next_run_eta_minutes = Column(Integer)
+    last_cycle = Column(Text)  # JSON: counts and throughput of the latest cycle
+    recent_cycles = Column(Text)  # JSON list, newest last
+
+
+class WhoSyncJob(Base):
+    """An on-demand WHO sync over the whole ICD table, walked in id-ordered pages."""
+    __tablename__ = 'who_sync_jobs'
+    id = Column(Integer, primary_key=True)
+    state = Column(String(20), nullable=False, server_default='running')  # running|completed|error
+    page_size = Column(Integer, nullable=False)
+    cursor = Column(Integer, nullable=False, server_default='0')  # continuation: last icd11_codes.id done
+    total = Column(Integer, nullable=False, server_default='0')
+    processed = Column(Integer, nullable=False, server_default='0')
+    changes = Column(Integer, nullable=False, server_default='0')
+    unchanged = Column(Integer, nullable=False, server_default='0')
+    not_found = Column(Integer, nullable=False, server_default='0')
+    failed = Column(Integer, nullable=False, server_default='0')
+    created_release = Column(String(50))
+    error = Column(Text)
+    started_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True))
+    finished_at = Column(TIMESTAMP(timezone=True))
@@ -1,16 +1,18 @@
 # File: app/main.py
 # This file is updated to include a more robust and explicit CORS configuration.
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.router import api_router
 from app.core.config import settings
 import time, json, os
 from app.db.session import engine
 from app.db.models import Base, ConceptMapRelease, ConceptMapElement, Mapping, ICD11Code, TraditionalTerm
-from app.services import who_sync
+from app.services import who_sync, translation_index, release_registry, who_api_async, who_enrichment, term_search, typeahead_index
+from app.services.cache_service import translation_cache
 from sqlalchemy.orm import Session
 from sqlalchemy import select
+from typing import Optional
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -61,6 +63,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Allows all methods (GET, POST, etc.)
     allow_headers=["*"], # Allows all headers
+    expose_headers=["X-Result-Truncated"], # /public/lookup: more ICDs matched than the limit
 )
 
 
@@ -103,6 +106,24 @@ def ensure_tables_exist_on_startup():
                 print("[STARTUP] ConceptMap release already exists", flush=True)
     except Exception as e:
         print(f"[STARTUP] Failed to create initial ConceptMap release: {e}", flush=True)
+    # Trigram search indexes behind /public/lookup (pg_trgm GIN on Postgres, FTS5 on SQLite)
+    try:
+        with Session(engine) as db:
+            print(f"[STARTUP] Lookup search backend: {term_search.backend(db)}", flush=True)
+    except Exception as e:
+        print(f"[STARTUP] Lookup search index setup failed: {e}", flush=True)
+    # Prime the current-release registry, then build the in-memory translation index
+    try:
+        release_registry.notify()
+        index = translation_index.rebuild()
+        print(f"[STARTUP] Translation index built: {index.stats()}", flush=True)
+    except Exception as e:
+        print(f"[STARTUP] Translation index build failed (translate falls back to DB): {e}", flush=True)
+    try:
+        typeahead_index.rebuild()
+    except Exception as e:
+        print(f"[STARTUP] Typeahead index build failed (suggest falls back to DB): {e}", flush=True)
+    translation_cache.start_sweeper()
     # Start WHO sync scheduler if enabled
     try:
         who_sync.start_scheduler()
@@ -110,6 +131,24 @@ def ensure_tables_exist_on_startup():
             print("[STARTUP] WHO sync scheduler started", flush=True)
     except Exception as e:
         print(f"[STARTUP] WHO sync scheduler failed to start: {e}", flush=True)
+    # Pick up WHO sync / bulk enrichment jobs interrupted by the last shutdown
+    try:
+        job = who_sync.resume_job()
+        if job:
+            print(f"[STARTUP] Resumed WHO sync job {job['id']}", flush=True)
+    except Exception as e:
+        print(f"[STARTUP] WHO sync job resume failed: {e}", flush=True)
+    try:
+        job = who_enrichment.resume()
+        if job:
+            print(f"[STARTUP] Resumed WHO enrichment job {job['id']}", flush=True)
+    except Exception as e:
+        print(f"[STARTUP] WHO enrichment resume failed: {e}", flush=True)
+
+
+@app.on_event("shutdown")
+async def close_who_client():
+    await who_api_async.aclose()
 
 
 @app.get("/health")
@@ -160,9 +199,22 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 def who_sync_status():
     return who_sync.status()
 
-@app.post(f"{settings.API_V1_STR}/admin/who-sync/trigger")
-def who_sync_trigger():
-    return who_sync.trigger_once()
+@app.post(f"{settings.API_V1_STR}/admin/who-sync/trigger", status_code=202)
+def who_sync_trigger(page_size: Optional[int] = None, cursor: int = 0):
+    """Queue a full WHO sync job (resuming an interrupted one) and return its id right away."""
+    try:
+        job = who_sync.enqueue_job(page_size, cursor)
+    except who_sync.SyncJobRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "accepted", "job_id": job["id"], "job": job}
+
+@app.get(f"{settings.API_V1_STR}/admin/who-sync/jobs/{{job_id}}")
+def who_sync_job_status(job_id: int):
+    """Progress, continuation cursor and change counts of a WHO sync job."""
+    job = who_sync.job_status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="WHO sync job not found")
+    return job
 
 if __name__ == "__main__":
     import uvicorn
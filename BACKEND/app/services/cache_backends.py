@@ -0,0 +1,263 @@
+"""Storage backends for the translation cache and the WHO lookup caches.
+
+CACHE_BACKEND selects where cached entries live:
+  - memory (default): per-process structures; every uvicorn worker warms its own copy.
+  - sqlite: one SQLite file (CACHE_SQLITE_PATH) shared by all workers on the host. Entries,
+    LRU order and hit/miss counters live in the file, so workers warm a single cache and
+    stats aggregate across them. No external service is needed. Counters are batched in
+    memory and written at most every CACHE_COUNTER_FLUSH_SECONDS (and at exit), so a cache
+    read costs no write beyond its LRU touch; stats from other workers lag by that much.
+
+Values are pickled into the file; it is a private cache file written only by this service.
+"""
+import atexit
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+CACHE_BACKEND = settings.CACHE_BACKEND.lower()
+CACHE_SQLITE_PATH = settings.CACHE_SQLITE_PATH
+CACHE_COUNTER_FLUSH_SECONDS = settings.CACHE_COUNTER_FLUSH_SECONDS
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS cache_entries (
+        ns TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB,
+        tag TEXT,
+        expires_at REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (ns, key)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_cache_entries_tag ON cache_entries (ns, tag)",
+    "CREATE INDEX IF NOT EXISTS ix_cache_entries_lru ON cache_entries (ns, last_access)",
+    "CREATE INDEX IF NOT EXISTS ix_cache_entries_expiry ON cache_entries (ns, expires_at)",
+    """CREATE TABLE IF NOT EXISTS cache_counters (
+        ns TEXT NOT NULL,
+        name TEXT NOT NULL,
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (ns, name)
+    )""",
+)
+
+
+class SqliteStore:
+    """Namespaced key/value store with TTL, LRU eviction and counters in one SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; multi-statement writes open their own IMMEDIATE transaction
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, ns: str, key: str):
+        """Return (found, value); expired rows count as missing and are removed."""
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM cache_entries WHERE ns=? AND key=?", (ns, key)).fetchone()
+        if row is None:
+            return False, None
+        if row[1] < now:
+            conn.execute("DELETE FROM cache_entries WHERE ns=? AND key=? AND expires_at < ?", (ns, key, now))
+            return False, None
+        conn.execute("UPDATE cache_entries SET last_access=? WHERE ns=? AND key=?", (now, ns, key))
+        return True, pickle.loads(row[0])
+
+    def set(self, ns: str, key: str, value: Any, ttl: float, tag: Optional[str] = None, max_entries: Optional[int] = None) -> int:
+        """Upsert one entry; returns how many least-recently-used entries were evicted to stay bounded."""
+        conn = self._conn()
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (ns, key, value, tag, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (ns, key, blob, tag, now + ttl, now),
+            )
+            evicted = 0
+            if max_entries:
+                over = conn.execute("SELECT COUNT(*) FROM cache_entries WHERE ns=?", (ns,)).fetchone()[0] - max_entries
+                if over > 0:
+                    evicted = conn.execute(
+                        "DELETE FROM cache_entries WHERE rowid IN ("
+                        " SELECT rowid FROM cache_entries WHERE ns=? ORDER BY last_access LIMIT ?)",
+                        (ns, over),
+                    ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return evicted
+
+    def delete_tag(self, ns: str, tag: str) -> int:
+        return self._conn().execute("DELETE FROM cache_entries WHERE ns=? AND tag=?", (ns, tag)).rowcount
+
+    def delete_prefix(self, ns: str, prefix: str) -> int:
+        return self._conn().execute(
+            "DELETE FROM cache_entries WHERE ns=? AND substr(key, 1, ?) = ?", (ns, len(prefix), prefix)
+        ).rowcount
+
+    def purge_expired(self, ns: str) -> int:
+        return self._conn().execute("DELETE FROM cache_entries WHERE ns=? AND expires_at < ?", (ns, time.time())).rowcount
+
+    def clear(self, ns: str) -> int:
+        return self._conn().execute("DELETE FROM cache_entries WHERE ns=?", (ns,)).rowcount
+
+    def count(self, ns: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cache_entries WHERE ns=?", (ns,)).fetchone()[0]
+
+    def incr(self, ns: str, name: str, n: int = 1):
+        self.incr_many(ns, {name: n})
+
+    def incr_many(self, ns: str, values: Dict[str, int]):
+        """Add several counter deltas in one write."""
+        rows = [(ns, name, n) for name, n in values.items() if n]
+        if rows:
+            self._conn().executemany(
+                "INSERT INTO cache_counters (ns, name, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (ns, name) DO UPDATE SET value = value + excluded.value",
+                rows,
+            )
+
+    def counters(self, ns: str) -> Dict[str, int]:
+        return dict(self._conn().execute("SELECT name, value FROM cache_counters WHERE ns=?", (ns,)).fetchall())
+
+
+_shared_store: Optional[SqliteStore] = None
+_shared_lock = threading.Lock()
+
+
+def shared_store() -> SqliteStore:
+    """The per-process handle on the shared cache file (created on first use)."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = SqliteStore(CACHE_SQLITE_PATH)
+        return _shared_store
+
+
+_batched: List["Counters"] = []
+
+
+class Counters:
+    """Named integer counters: process-local for memory, stored in the shared file for sqlite.
+
+    With a store, increments collect in memory and are added to the file in one write
+    every flush_seconds (checked on incr), on snapshot() and at interpreter exit.
+    """
+
+    def __init__(self, ns: str, names, store: Optional[SqliteStore] = None,
+                 flush_seconds: Optional[float] = None):
+        self.ns = ns
+        self.store = store
+        self.flush_seconds = CACHE_COUNTER_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self._lock = threading.Lock()
+        self._values = {name: 0 for name in names}
+        self._pending: Dict[str, int] = {}
+        self._flushed_at = time.monotonic()
+        if store is not None:
+            _batched.append(self)
+
+    def incr(self, name: str, n: int = 1):
+        if not n:
+            return
+        with self._lock:
+            if self.store is None:
+                self._values[name] = self._values.get(name, 0) + n
+                return
+            self._pending[name] = self._pending.get(name, 0) + n
+            due = time.monotonic() - self._flushed_at >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the batched increments to the store; they are kept for the next flush if that fails."""
+        if self.store is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        try:
+            self.store.incr_many(self.ns, pending)
+        except sqlite3.Error:
+            with self._lock:
+                for name, n in pending.items():
+                    self._pending[name] = self._pending.get(name, 0) + n
+
+    def snapshot(self) -> Dict[str, int]:
+        if self.store is not None:
+            self.flush()
+            return {**{name: 0 for name in self._values}, **self.store.counters(self.ns)}
+        with self._lock:
+            return dict(self._values)
+
+
+@atexit.register
+def _flush_counters():
+    for c in list(_batched):
+        try:
+            c.flush()
+        except Exception:
+            pass
+
+
+class SharedTTLCache:
+    """Drop-in for the cachetools.TTLCache operations who_api_client uses, backed by SqliteStore."""
+
+    def __init__(self, ns: str, maxsize: int, ttl: float, store: Optional[SqliteStore] = None):
+        self.ns = ns
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store or shared_store()
+
+    def get(self, key, default=None):
+        found, value = self.store.get(self.ns, repr(key))
+        return value if found else default
+
+    def __contains__(self, key) -> bool:
+        return self.store.get(self.ns, repr(key))[0]
+
+    def __getitem__(self, key):
+        found, value = self.store.get(self.ns, repr(key))
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.ns, repr(key), value, self.ttl, max_entries=self.maxsize)
+
+    def __len__(self) -> int:
+        return self.store.count(self.ns)
+
+    def clear(self):
+        self.store.clear(self.ns)
+
+
+def ttl_cache(ns: str, maxsize: int, ttl: float):
+    """A TTL cache for the configured backend (cachetools.TTLCache when CACHE_BACKEND=memory)."""
+    if CACHE_BACKEND == "sqlite":
+        return SharedTTLCache(ns, maxsize, ttl)
+    from cachetools import TTLCache
+    return TTLCache(maxsize=maxsize, ttl=ttl)
+
+
+def counters(ns: str, names) -> Counters:
+    return Counters(ns, names, shared_store() if CACHE_BACKEND == "sqlite" else None)
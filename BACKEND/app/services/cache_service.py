@@ -1,33 +1,134 @@
-from typing import Dict, Tuple, Any
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import threading
 import time
 
+from app.core.config import settings
+from app.services import cache_backends
+
+
 class TranslationCache:
-    def __init__(self):
-        self._store: Dict[str, Tuple[float, Any]] = {}
+    """Bounded LRU cache with per-entry TTL for translate responses.
+
+    Entries are optionally tagged with the ICD name they were built from so curator
+    writes can drop exactly the affected answers (invalidate_icd); invalidate_release
+    drops everything cached under one ConceptMap release. Expired entries are removed
+    by a background sweeper as well as on read, so unread entries do not linger.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 3600, sweep_interval_seconds: int = 60):
+        self._store: "OrderedDict[str, Tuple[float, Any, Optional[str]]]" = OrderedDict()
+        self._by_icd: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
         self.hits = 0
         self.misses = 0
-        self.ttl_seconds = 3600
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
 
     def _key(self, release: str | None, direction: str, identifier: str) -> str:
         return f"{release or 'none'}|{direction}|{identifier}".lower()
 
+    def _drop(self, k: str):
+        # Caller holds the lock
+        _, _, icd = self._store.pop(k)
+        if icd is not None:
+            keys = self._by_icd.get(icd)
+            if keys is not None:
+                keys.discard(k)
+                if not keys:
+                    self._by_icd.pop(icd, None)
+
     def get(self, release: str | None, direction: str, identifier: str):
         k = self._key(release, direction, identifier)
-        tup = self._store.get(k)
-        if not tup:
-            self.misses += 1
-            return None
-        ts, val = tup
-        if time.time() - ts > self.ttl_seconds:
-            self._store.pop(k, None)
-            self.misses += 1
-            return None
-        self.hits += 1
-        return val
-
-    def set(self, release: str | None, direction: str, identifier: str, value: Any):
+        with self._lock:
+            tup = self._store.get(k)
+            if not tup:
+                self.misses += 1
+                return None
+            ts, val, _ = tup
+            if time.time() - ts > self.ttl_seconds:
+                self._drop(k)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._store.move_to_end(k)
+            self.hits += 1
+            return val
+
+    def set(self, release: str | None, direction: str, identifier: str, value: Any, icd_name: Optional[str] = None):
         k = self._key(release, direction, identifier)
-        self._store[k] = (time.time(), value)
+        icd = icd_name.lower() if icd_name else None
+        with self._lock:
+            if k in self._store:
+                self._drop(k)
+            self._store[k] = (time.time(), value, icd)
+            if icd is not None:
+                self._by_icd.setdefault(icd, set()).add(k)
+            while len(self._store) > self.max_entries:
+                self._drop(next(iter(self._store)))
+                self.evictions += 1
+
+    def invalidate_icd(self, icd_names: Iterable[str] | str) -> int:
+        """Drop every entry tagged with one of these ICD names (any release, any direction)."""
+        if isinstance(icd_names, str):
+            icd_names = [icd_names]
+        removed = 0
+        with self._lock:
+            for name in icd_names:
+                for k in list(self._by_icd.get((name or '').lower(), ())):
+                    self._drop(k)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def invalidate_release(self, release: str | None) -> int:
+        """Drop every entry cached under this release version."""
+        prefix = f"{release or 'none'}|".lower()
+        with self._lock:
+            doomed = [k for k in self._store if k.startswith(prefix)]
+            for k in doomed:
+                self._drop(k)
+            self.invalidations += len(doomed)
+        return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._store)
+            self._store.clear()
+            self._by_icd.clear()
+
+    def expire(self) -> int:
+        """Remove all entries past their TTL; returns how many were removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            # The store is kept in LRU order (get() moves hits to the end), not write order,
+            # so an expired entry can sit behind fresh ones: scan everything
+            doomed = [k for k, (ts, _, _) in self._store.items() if ts < cutoff]
+            for k in doomed:
+                self._drop(k)
+            self.expirations += len(doomed)
+        return len(doomed)
+
+    def start_sweeper(self):
+        """Start the background expiry thread (idempotent)."""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+
+        def _loop():
+            while True:
+                time.sleep(self.sweep_interval_seconds)
+                try:
+                    self.expire()
+                except Exception as e:  # pragma: no cover - keep the sweeper alive
+                    print(f"[CACHE] Translation cache sweep failed: {e}", flush=True)
+
+        self._sweeper = threading.Thread(target=_loop, daemon=True, name="translation-cache-sweeper")
+        self._sweeper.start()
 
     def stats(self):
         total = self.hits + self.misses
@@ -35,7 +136,83 @@ class TranslationCache:
             "hits": self.hits,
             "misses": self.misses,
             "hit_ratio": (self.hits / total) if total else 0,
-            "entries": len(self._store)
+            "backend": "memory",
+            "entries": len(self._store),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
         }
 
-translation_cache = TranslationCache()
+class SharedTranslationCache(TranslationCache):
+    """TranslationCache whose entries and counters live in the shared SQLite cache file.
+
+    Every worker on the host reads and writes the same entries, so the cache is warmed
+    once and stats() reports totals across workers.
+    """
+
+    NS = "translation"
+
+    def __init__(self, store: cache_backends.SqliteStore, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.counters = cache_backends.Counters(
+            self.NS, ("hits", "misses", "evictions", "expirations", "invalidations"), store)
+
+    def get(self, release: str | None, direction: str, identifier: str):
+        found, val = self.store.get(self.NS, self._key(release, direction, identifier))
+        self.counters.incr("hits" if found else "misses")
+        return val if found else None
+
+    def set(self, release: str | None, direction: str, identifier: str, value: Any, icd_name: Optional[str] = None):
+        evicted = self.store.set(self.NS, self._key(release, direction, identifier), value, self.ttl_seconds,
+                                 tag=icd_name.lower() if icd_name else None, max_entries=self.max_entries)
+        self.counters.incr("evictions", evicted)
+
+    def invalidate_icd(self, icd_names: Iterable[str] | str) -> int:
+        if isinstance(icd_names, str):
+            icd_names = [icd_names]
+        removed = sum(self.store.delete_tag(self.NS, (name or '').lower()) for name in icd_names)
+        self.counters.incr("invalidations", removed)
+        return removed
+
+    def invalidate_release(self, release: str | None) -> int:
+        removed = self.store.delete_prefix(self.NS, f"{release or 'none'}|".lower())
+        self.counters.incr("invalidations", removed)
+        return removed
+
+    def clear(self):
+        self.counters.incr("invalidations", self.store.clear(self.NS))
+
+    def expire(self) -> int:
+        removed = self.store.purge_expired(self.NS)
+        self.counters.incr("expirations", removed)
+        return removed
+
+    def stats(self):
+        c = self.counters.snapshot()
+        hits, misses = c.get("hits", 0), c.get("misses", 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": (hits / total) if total else 0,
+            "backend": "sqlite",
+            "entries": self.store.count(self.NS),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": c.get("evictions", 0),
+            "expirations": c.get("expirations", 0),
+            "invalidations": c.get("invalidations", 0),
+        }
+
+
+def _make_translation_cache() -> TranslationCache:
+    kwargs = dict(max_entries=settings.TRANSLATION_CACHE_MAX_ENTRIES, ttl_seconds=settings.TRANSLATION_CACHE_TTL_SECONDS)
+    if cache_backends.CACHE_BACKEND == "sqlite":
+        return SharedTranslationCache(cache_backends.shared_store(), **kwargs)
+    return TranslationCache(**kwargs)
+
+
+translation_cache = _make_translation_cache()
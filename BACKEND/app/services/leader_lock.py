@@ -0,0 +1,145 @@
+"""Cross-process leader election for background work that must run in one process only.
+
+With several uvicorn/gunicorn workers every process runs the startup hooks; a LeaderLock
+lets exactly one of them own a named piece of background work. On PostgreSQL it is a
+session-level advisory lock (pg_try_advisory_lock) held on a dedicated connection, so it
+is released by the server if the process dies. That connection comes from a separate
+engine without a pool: closing it always ends the database session, so a lock whose
+unlock failed can never be handed back to the app's pool still held. On other databases (SQLite) it is an
+exclusive, non-blocking lock on a file next to the database, released by the OS when
+the process exits.
+
+acquire() never blocks; callers that are not the leader retry it periodically so a
+standby takes over when the leader goes away.
+"""
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from app.db.session import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+_lock_engine: Optional[Engine] = None
+_lock_engine_lock = threading.Lock()
+
+
+def _lock_connect():
+    """A fresh, unpooled connection to the app database for holding advisory locks."""
+    global _lock_engine
+    with _lock_engine_lock:
+        if _lock_engine is None:
+            _lock_engine = create_engine(engine.url, poolclass=NullPool)
+    return _lock_engine.connect()
+
+
+def identity() -> str:
+    """host:pid of this process, recorded by whoever holds a lock."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaderLock:
+    def __init__(self, name: str):
+        self.name = name
+        # Advisory lock keys are signed 64-bit integers
+        self.key = int.from_bytes(hashlib.sha256(name.encode("utf-8")).digest()[:8], "big", signed=True)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._fh = None
+
+    def _lock_path(self) -> str:
+        database = engine.url.database
+        if database and database != ":memory:":
+            return f"{os.path.abspath(database)}.{self.name}.lock"
+        return os.path.join(tempfile.gettempdir(), f"ayur-sync-{self.name}.lock")
+
+    def acquire(self) -> bool:
+        """Take the lock if no other holder has it; True while this object holds it."""
+        with self._lock:
+            if self._conn is not None or self._fh is not None:
+                return True
+            if engine.dialect.name == "postgresql":
+                conn = _lock_connect()
+                try:
+                    got = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": self.key}).scalar()
+                    conn.commit()
+                except Exception:
+                    conn.close()
+                    raise
+                if got:
+                    self._conn = conn
+                else:
+                    conn.close()
+                return bool(got)
+            fh = open(self._lock_path(), "a+")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                fh.close()
+                return False
+            self._fh = fh
+            return True
+
+    def held(self) -> bool:
+        """Whether this object still holds the lock (for Postgres: its connection is alive)."""
+        with self._lock:
+            if self._fh is not None:
+                return True
+            if self._conn is None:
+                return False
+            try:
+                self._conn.execute(text("SELECT 1"))
+                self._conn.commit()
+                return True
+            except Exception:
+                # Connection lost: the server released the advisory lock with it
+                self._close(invalidate=True)
+                return False
+
+    def release(self) -> None:
+        with self._lock:
+            unlocked = True
+            if self._conn is not None:
+                try:
+                    self._conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": self.key})
+                    self._conn.commit()
+                except Exception:
+                    unlocked = False
+            # If the unlock failed, drop the session (and the lock with it) rather than keep it
+            self._close(invalidate=not unlocked)
+
+    def _close(self, invalidate: bool = False) -> None:
+        if self._conn is not None:
+            try:
+                if invalidate:
+                    self._conn.invalidate()
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._fh is not None:
+            if fcntl is None:
+                try:
+                    self._fh.seek(0)
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+                except OSError:
+                    pass
+            self._fh.close()
+            self._fh = None
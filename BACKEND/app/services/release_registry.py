@@ -0,0 +1,60 @@
+"""Process-wide record of the current (latest) ConceptMap release.
+
+Public endpoints resolve "latest" through current()/latest_version() instead of running
+ORDER BY created_at DESC LIMIT 1 per request. Code that creates or refreshes a release
+calls notify(); the cached value is also re-read after MAX_AGE_SECONDS so releases
+created by another worker process are picked up without a restart.
+"""
+from dataclasses import dataclass
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.db.models import ConceptMapRelease
+
+MAX_AGE_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class CurrentRelease:
+    id: int
+    version: str
+
+
+_current: Optional[CurrentRelease] = None
+_loaded_at: float = 0.0
+_lock = threading.Lock()
+
+
+def _load(db: Session) -> Optional[CurrentRelease]:
+    rel = db.query(ConceptMapRelease.id, ConceptMapRelease.version) \
+        .order_by(ConceptMapRelease.created_at.desc(), ConceptMapRelease.id.desc()).first()
+    return CurrentRelease(id=rel.id, version=rel.version) if rel else None
+
+
+def notify(db: Optional[Session] = None) -> Optional[CurrentRelease]:
+    """Re-read the current release; call after a release is created or refreshed."""
+    global _current, _loaded_at
+    with _lock:
+        if db is None:
+            with SessionLocal() as own:
+                _current = _load(own)
+        else:
+            _current = _load(db)
+        _loaded_at = time.monotonic()
+        return _current
+
+
+def current(db: Optional[Session] = None) -> Optional[CurrentRelease]:
+    """The latest release (id, version), or None when no release exists yet."""
+    if _loaded_at and time.monotonic() - _loaded_at < MAX_AGE_SECONDS:
+        return _current
+    return notify(db)
+
+
+def latest_version(db: Optional[Session] = None) -> Optional[str]:
+    rel = current(db)
+    return rel.version if rel else None
@@ -0,0 +1,196 @@
+"""Indexed substring search over traditional terms and ICD-11 names/codes for /public/lookup.
+
+Each table is searched on its own (no OR across a join), so its indexes can serve the
+match, and hits come back best first:
+  - PostgreSQL with pg_trgm: ILIKE '%q%' per column, served by the GIN trigram indexes
+    ensure_indexes() creates, ranked by the best similarity() across the columns.
+  - SQLite with FTS5: external-content trigram FTS5 tables kept in sync by triggers,
+    ranked by bm25.
+  - Anything else (or a query too short for trigrams): plain ILIKE, ranked by how early
+    and how tightly the query matches.
+A query shaped like a code matches codes exactly instead of by substring. With
+verified_only, rows without a verified mapping are filtered inside the ranked query, so
+the limit counts only rows the lookup endpoints can actually return.
+"""
+import re
+import threading
+from typing import List, Optional
+
+from sqlalchemy import case, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.db.models import ICD11Code, Mapping, TraditionalTerm
+
+ICD_CODE_RE = re.compile(r"^[A-TV-Z][0-9][0-9A-Z](?:\.[0-9A-Z]{1,4})?$", re.I)
+TM_CODE_RE = re.compile(r"^[A-Z]{1,6}[-_]?[0-9]{1,5}[A-Z0-9]*$", re.I)
+
+# Trigram indexes (pg_trgm GIN / FTS5 trigram) need at least three characters to help
+MIN_INDEXED_LENGTH = 3
+
+_TERM_COLUMNS = ("term", "code", "devanagari", "tamil", "arabic")
+_ICD_COLUMNS = ("icd_name", "icd_code")
+
+_PG_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS ix_{table}_{col}_trgm ON {table} USING gin ({col} gin_trgm_ops)"
+    for table, cols in (("traditional_terms", _TERM_COLUMNS), ("icd11_codes", _ICD_COLUMNS))
+    for col in cols
+]
+
+
+def _fts_ddl(table: str, cols) -> List[str]:
+    fts = f"{table}_fts"
+    col_list = ", ".join(cols)
+    new_vals = ", ".join(f"new.{c}" for c in cols)
+    old_vals = ", ".join(f"old.{c}" for c in cols)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({col_list}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals}); "
+        f"INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals}); END",
+    ]
+
+
+_backend: dict = {}
+_backend_lock = threading.Lock()
+
+
+def ensure_indexes(conn) -> str:
+    """Create the search indexes for conn's dialect (idempotent); returns the backend in use."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        try:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for ddl in _PG_INDEXES:
+                conn.execute(text(ddl))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"[SEARCH] pg_trgm indexes unavailable, lookup uses plain ILIKE: {e}", flush=True)
+        installed = conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+        return "pg_trgm" if installed else "like"
+    if dialect == "sqlite":
+        try:
+            for table, cols in (("traditional_terms", _TERM_COLUMNS), ("icd11_codes", _ICD_COLUMNS)):
+                required = {f"{table}_fts", f"{table}_fts_ai", f"{table}_fts_ad", f"{table}_fts_au"}
+                existing = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master"))}
+                for ddl in _fts_ddl(table, cols):
+                    conn.execute(text(ddl))
+                # A missing table or trigger means the index may lag the table: rebuild it
+                if not required <= existing:
+                    conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+            conn.commit()
+            return "fts5"
+        except Exception as e:
+            conn.rollback()
+            print(f"[SEARCH] FTS5 trigram index unavailable, lookup uses plain LIKE: {e}", flush=True)
+    return "like"
+
+
+def backend(db: Session) -> str:
+    """The search backend for db's engine, set up on first use."""
+    engine = db.get_bind()
+    found = _backend.get(engine)
+    if found is None:
+        with _backend_lock:
+            found = _backend.get(engine)
+            if found is None:
+                with engine.connect() as conn:
+                    found = _backend[engine] = ensure_indexes(conn)
+    return found
+
+
+def _like(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_phrase(q: str) -> str:
+    return '"' + q.replace('"', '""') + '"'
+
+
+def _like_rank(q: str, col):
+    """Prefix hits, then other substring hits, shortest first (the fallback's stand-in for similarity)."""
+    escaped = _like(q)[1:]
+    return case((col.ilike(escaped, escape="\\"), 0), (col.ilike(_like(q), escape="\\"), 1), else_=2), func.length(col)
+
+
+def _verified_exists(model, mapping_fk, mapping_system: Optional[str]):
+    """EXISTS a verified mapping on the row (through a term of mapping_system, when given)."""
+    sub = select(Mapping.id).where(mapping_fk == model.id, Mapping.status == 'verified')
+    if mapping_system:
+        sub = sub.join(TraditionalTerm, Mapping.traditional_term_id == TraditionalTerm.id) \
+            .where(TraditionalTerm.system == mapping_system)
+    return sub.exists()
+
+
+def _ranked_ids(db: Session, model, cols, code_col, q: str, exact_code: bool, limit: int,
+                system: Optional[str] = None, verified_fk=None, mapping_system: Optional[str] = None) -> List[int]:
+    kind = backend(db)
+    table = model.__tablename__
+    substring_cols = [c for c in cols if c is not code_col or not exact_code]
+    code_filter = func.lower(code_col) == q.lower()
+    where = [model.system == system] if system else []
+    if verified_fk is not None:
+        where.append(_verified_exists(model, verified_fk, mapping_system))
+    if kind == "fts5" and len(q) >= MIN_INDEXED_LENGTH:
+        fts = f"{table}_fts"
+        verified_sql = ""
+        if verified_fk is not None:
+            verified_sql = (
+                f" AND EXISTS (SELECT 1 FROM mappings JOIN traditional_terms vt ON vt.id = mappings.traditional_term_id"
+                f" WHERE mappings.{verified_fk.key} = {table}.id AND mappings.status = 'verified'"
+                f"{' AND vt.system = :mapping_system' if mapping_system else ''})"
+            )
+
+        def fts_ids(columns, extra=""):
+            return db.execute(text(
+                f"SELECT {table}.id FROM {table} JOIN {fts} ON {fts}.rowid = {table}.id "
+                f"WHERE {fts} MATCH :m{' AND ' + table + '.system = :system' if system else ''}{verified_sql}{extra} "
+                f"ORDER BY {fts}.rank LIMIT :n"
+            ), {"m": f"{{{' '.join(c.key for c in columns)}}} : {_fts_phrase(q)}", "system": system,
+                "mapping_system": mapping_system, "q": q.lower(), "n": limit}).scalars().all()
+
+        rows = fts_ids(substring_cols)
+        if exact_code:
+            exact = fts_ids([code_col], f" AND lower({table}.{code_col.key}) = :q")
+            rows = exact + [i for i in rows if i not in set(exact)]
+        return rows[:limit]
+
+    like = _like(q)
+    match = or_(*[c.ilike(like, escape="\\") for c in substring_cols], *([code_filter] if exact_code else []))
+    if kind == "pg_trgm":
+        if exact_code:
+            # ILIKE without wildcards is still served by the trigram index, unlike lower(code) = ...
+            match = or_(*[c.ilike(like, escape="\\") for c in substring_cols], code_col.ilike(like[1:-1], escape="\\"))
+        order = (func.greatest(*[func.similarity(func.coalesce(c, ""), q) for c in cols]).desc(),)
+    else:
+        order = _like_rank(q, cols[0])
+        if exact_code:
+            order = (case((code_filter, 0), else_=1), *order)
+    return db.execute(select(model.id).where(match, *where).order_by(*order, model.id).limit(limit)).scalars().all()
+
+
+def term_matches(db: Session, q: str, system: Optional[str] = None, limit: int = 200,
+                 verified_only: bool = False) -> List[int]:
+    """Ids of traditional terms matching q in term, code or vernacular, best first
+    (only terms with a verified mapping when verified_only)."""
+    q = q.strip()
+    cols = [getattr(TraditionalTerm, c) for c in _TERM_COLUMNS]
+    return _ranked_ids(db, TraditionalTerm, cols, TraditionalTerm.code, q, bool(TM_CODE_RE.match(q)), limit,
+                       system.lower() if system else None,
+                       verified_fk=Mapping.traditional_term_id if verified_only else None)
+
+
+def icd_matches(db: Session, q: str, limit: int = 200, verified_only: bool = False,
+                system: Optional[str] = None) -> List[int]:
+    """Ids of ICD-11 codes matching q in name or code, best first (only ICDs with a verified
+    mapping, to a term of system when given, when verified_only)."""
+    q = q.strip()
+    cols = [getattr(ICD11Code, c) for c in _ICD_COLUMNS]
+    return _ranked_ids(db, ICD11Code, cols, ICD11Code.icd_code, q, bool(ICD_CODE_RE.match(q)), limit,
+                       verified_fk=Mapping.icd11_code_id if verified_only else None,
+                       mapping_system=system.lower() if system else None)
@@ -0,0 +1,276 @@
+"""Immutable in-memory index of verified NAMASTE <-> ICD-11 mappings.
+
+Built from the verified mappings behind the current ConceptMap release and keyed by
+(system, code), (system, term), ICD name and ICD code. A rebuild constructs a fresh
+TranslationIndex and swaps the module-level reference in one assignment, so readers
+always see either the old or the new index, never a partially built one.
+
+Every write path bumps a shared counter row (index_versions); current() re-reads it after
+MAX_AGE_SECONDS and, when another worker has written since this index was built, rebuilds
+in the background and drops cached translations for the ICDs that changed.
+"""
+from dataclasses import dataclass
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+
+from app.db.session import SessionLocal
+from app.db.models import Mapping, TraditionalTerm, ICD11Code, IndexVersion
+from app.services import release_registry, typeahead_index
+from app.services.cache_service import translation_cache
+
+
+@dataclass(frozen=True)
+class IndexedTerm:
+    mapping_id: int
+    system: str
+    term: str
+    code: Optional[str]
+    source_description: Optional[str]
+    vernacular: Optional[str]
+    source_row: Optional[int]
+    is_primary: bool
+
+    @classmethod
+    def from_mapping(cls, m: Mapping) -> "IndexedTerm":
+        t = m.traditional_term
+        return cls(
+            mapping_id=m.id,
+            system=t.system,
+            term=t.term,
+            code=t.code,
+            source_description=t.source_description,
+            vernacular=t.devanagari or t.tamil or t.arabic,
+            source_row=t.source_row,
+            is_primary=bool(m.is_primary),
+        )
+
+
+@dataclass(frozen=True)
+class IndexedICD:
+    icd_id: int
+    icd_name: str
+    icd_code: Optional[str]
+    terms: Tuple[IndexedTerm, ...]
+
+
+class TranslationIndex:
+    def __init__(self, release_version: Optional[str], icds: Iterable[IndexedICD]):
+        self.release_version = release_version
+        self.by_icd_id: Dict[int, IndexedICD] = {}
+        self.by_icd_name: Dict[str, IndexedICD] = {}
+        self.by_icd_code: Dict[str, List[IndexedICD]] = {}  # several ICD names can share one WHO code
+        self.by_code: Dict[Tuple[str, str], List[Tuple[IndexedICD, IndexedTerm]]] = {}
+        self.by_term: Dict[Tuple[str, str], List[Tuple[IndexedICD, IndexedTerm]]] = {}
+        for icd in icds:
+            self.by_icd_id[icd.icd_id] = icd
+            self.by_icd_name[icd.icd_name] = icd
+            if icd.icd_code:
+                self.by_icd_code.setdefault(icd.icd_code.upper(), []).append(icd)
+            for t in icd.terms:
+                if t.code:
+                    self.by_code.setdefault((t.system, t.code), []).append((icd, t))
+                self.by_term.setdefault((t.system, t.term), []).append((icd, t))
+        # Primary mappings first, then oldest mapping first (mirrors the DB fallbacks)
+        for bucket in (self.by_code, self.by_term):
+            for hits in bucket.values():
+                hits.sort(key=lambda hit: (not hit[1].is_primary, hit[1].mapping_id))
+        self.verified_icd_names: Tuple[str, ...] = tuple(sorted(self.by_icd_name))
+
+    def primary_for_code(self, system: str, code: str) -> Optional[Tuple[IndexedICD, IndexedTerm]]:
+        hits = self.by_code.get((system, code)) or []
+        return hits[0] if hits and hits[0][1].is_primary else None
+
+    def match_code_or_term(self, system: str, value: str) -> List[Tuple[IndexedICD, IndexedTerm]]:
+        """Verified hits where the term's code OR its name equals value; primaries first."""
+        seen: set[int] = set()
+        hits: List[Tuple[IndexedICD, IndexedTerm]] = []
+        for hit in (self.by_code.get((system, value)) or []) + (self.by_term.get((system, value)) or []):
+            if hit[1].mapping_id in seen:
+                continue
+            seen.add(hit[1].mapping_id)
+            hits.append(hit)
+        hits.sort(key=lambda hit: (not hit[1].is_primary, hit[1].mapping_id))
+        return hits
+
+    def stats(self) -> dict:
+        return {
+            "release_version": self.release_version,
+            "icds": len(self.by_icd_id),
+            "codes": len(self.by_code),
+            "terms": len(self.by_term),
+        }
+
+
+def load_icds(db: Session, icd_ids: Optional[Iterable[int]] = None) -> Dict[int, IndexedICD]:
+    """Load verified mappings (optionally for specific ICD ids) grouped per ICD, ordered by mapping id."""
+    q = (
+        db.query(Mapping)
+        .join(TraditionalTerm)
+        .options(joinedload(Mapping.traditional_term), joinedload(Mapping.icd11_code))
+        .filter(Mapping.status == 'verified')
+    )
+    if icd_ids is not None:
+        q = q.filter(Mapping.icd11_code_id.in_(list(icd_ids)))
+    grouped: Dict[int, Tuple[ICD11Code, List[IndexedTerm]]] = {}
+    for m in q.order_by(Mapping.id.asc()).all():
+        slot = grouped.setdefault(m.icd11_code_id, (m.icd11_code, []))
+        slot[1].append(IndexedTerm.from_mapping(m))
+    return {
+        icd_id: IndexedICD(icd_id=icd_id, icd_name=icd.icd_name, icd_code=icd.icd_code, terms=tuple(terms))
+        for icd_id, (icd, terms) in grouped.items()
+    }
+
+
+VERSION_NAME = "translation"
+MAX_AGE_SECONDS = 30
+
+_current: Optional[TranslationIndex] = None
+_built_version: Optional[int] = None
+_checked_at: float = 0.0
+_rebuild_lock = threading.Lock()
+_rebuild_pending = threading.Event()
+_peer_sync_pending = threading.Event()
+_pending_invalidations: set[str] = set()
+
+
+def _read_version(db: Session) -> int:
+    return db.query(IndexVersion.version).filter(IndexVersion.name == VERSION_NAME).scalar() or 0
+
+
+def bump_version() -> None:
+    """Record a write to the verified mappings so other workers rebuild their index."""
+    with SessionLocal() as db:
+        for _ in range(2):
+            bumped = db.execute(update(IndexVersion).where(IndexVersion.name == VERSION_NAME)
+                                .values(version=IndexVersion.version + 1)).rowcount
+            if not bumped:
+                db.add(IndexVersion(name=VERSION_NAME, version=1))
+            try:
+                db.commit()
+                return
+            except IntegrityError:
+                db.rollback()  # another worker created the row first: bump it
+
+
+def current() -> Optional[TranslationIndex]:
+    """The active index, or None before the first build (callers then fall back to the DB)."""
+    global _checked_at
+    if _current is not None and time.monotonic() - _checked_at >= MAX_AGE_SECONDS:
+        _checked_at = time.monotonic()
+        try:
+            with SessionLocal() as db:
+                if _read_version(db) != _built_version:
+                    _schedule_peer_sync()
+        except Exception as e:
+            print(f"[INDEX] Translation index version check failed: {e}", flush=True)
+    return _current
+
+
+def rebuild(db: Optional[Session] = None) -> TranslationIndex:
+    """Build a new index from the DB and swap it in atomically."""
+    global _current, _built_version, _checked_at
+    with _rebuild_lock:
+        if db is None:
+            with SessionLocal() as own:
+                version = _read_version(own)
+                index = _build(own)
+        else:
+            version = _read_version(db)
+            index = _build(db)
+        _current, _built_version = index, version
+        _checked_at = time.monotonic()
+    return index
+
+
+def _build(db: Session) -> TranslationIndex:
+    return TranslationIndex(release_registry.latest_version(db), load_icds(db).values())
+
+
+def _changed_icd_names(old: Optional[TranslationIndex], new: TranslationIndex) -> set[str]:
+    old_icds = old.by_icd_id if old else {}
+    names = {icd.icd_name for icd_id, icd in old_icds.items() if new.by_icd_id.get(icd_id) != icd}
+    names.update(icd.icd_name for icd_id, icd in new.by_icd_id.items() if old_icds.get(icd_id) != icd)
+    return names
+
+
+def _schedule_peer_sync():
+    """Rebuild after another worker's write; cached translations of every ICD that differs are
+    dropped and the typeahead index is rebuilt."""
+    if _peer_sync_pending.is_set():
+        return
+    _peer_sync_pending.set()
+
+    def _run():
+        try:
+            old = _current
+            new = rebuild()
+            translation_cache.invalidate_icd(_changed_icd_names(old, new))
+            print(f"[INDEX] Translation index rebuilt after a write in another worker: {new.stats()}", flush=True)
+            _rebuild_typeahead()
+        except Exception as e:
+            print(f"[INDEX] Translation index peer rebuild failed: {e}", flush=True)
+        finally:
+            _peer_sync_pending.clear()
+
+    threading.Thread(target=_run, daemon=True).start()
+
+
+def reset() -> TranslationIndex:
+    """After bulk deletes (curation / deep reset): rebuild this index and the typeahead index
+    now, drop every cached translation and tell the other workers to rebuild too."""
+    bump_version()
+    index = rebuild()
+    translation_cache.clear()
+    _rebuild_typeahead()
+    return index
+
+
+def _rebuild_typeahead():
+    """Full typeahead rebuild for changes this worker did not make itself (patching needs the ICD names)."""
+    if typeahead_index.current() is None:
+        return  # never built here (suggest is on the DB path)
+    try:
+        typeahead_index.rebuild()
+    except Exception as e:
+        print(f"[TYPEAHEAD] Rebuild failed: {e}", flush=True)
+
+
+def schedule_rebuild(icd_names: Iterable[str] = ()):
+    """Rebuild on a background thread after a curator write; bursts of writes coalesce into one rebuild.
+
+    Cached translations for icd_names are dropped now and again once the new index is
+    swapped in, so nothing answered from the old index in between survives the rebuild.
+    The shared version is bumped first, so other workers rebuild on their next check.
+    The typeahead index is patched for the same ICDs on that thread.
+    """
+    names = [n for n in icd_names if n]
+    if names:
+        translation_cache.invalidate_icd(names)
+        _pending_invalidations.update(names)
+    if _rebuild_pending.is_set():
+        return
+    _rebuild_pending.set()
+
+    def _run():
+        owned: list[str] = []
+        try:
+            _rebuild_pending.clear()
+            # Names queued after this point belong to the next rebuild
+            owned = list(_pending_invalidations)
+            _pending_invalidations.difference_update(owned)
+            bump_version()
+            rebuild()
+            translation_cache.invalidate_icd(owned)
+        except Exception as e:
+            print(f"[INDEX] Translation index rebuild failed: {e}", flush=True)
+        try:
+            typeahead_index.refresh(owned)
+        except Exception as e:
+            print(f"[TYPEAHEAD] Refresh failed: {e}", flush=True)
+
+    threading.Thread(target=_run, daemon=True).start()
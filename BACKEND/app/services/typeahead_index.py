@@ -0,0 +1,277 @@
+"""In-process typeahead index for /public/lookup/suggest.
+
+Covers verified mappings only: ICD names/codes plus each mapped traditional term, its code
+and its Devanagari/Tamil/Arabic forms. Every searchable string is lower-cased, interned and
+stored once as a "key"; keys are found through posting lists (array('i') of key numbers):
+  - "abc"  trigram postings, for queries of three or more characters (substring match);
+  - "^ab"  word-start postings of one or two characters, for shorter queries (prefix match).
+A query walks the shortest posting list it needs and confirms each key with a substring test.
+
+Built once at startup, then patched per ICD by refresh() when curators verify/unverify
+mappings in this worker (translation_index.schedule_rebuild calls it). Replaced keys are
+tombstoned in place; once tombstones outnumber live keys the next refresh rebuilds the
+index instead. Curation resets, and writes made by other workers (seen through the
+translation index's shared version), trigger a full rebuild via translation_index.
+Before the first build current() is None and the endpoint queries the DB instead.
+"""
+from array import array
+import heapq
+import re
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.db.models import Mapping, TraditionalTerm, ICD11Code
+from app.services.term_search import ICD_CODE_RE, TM_CODE_RE
+
+# Key kinds
+ICD_NAME, ICD_CODE, TERM_TEXT, TERM_CODE = 0, 1, 2, 3
+
+MAX_ICD_ANCHORS = 10  # same cap as the DB path
+
+_WORD_BREAKS = " -_/,.;:()[]"
+_WORD_SPLIT = re.compile(r"[\s\-_/,.;:()\[\]]+")
+
+# (mapping_id, system, term, code, is_primary, devanagari, tamil, arabic)
+MappingRow = Tuple[int, str, str, Optional[str], bool, Optional[str], Optional[str], Optional[str]]
+
+
+def _norm(value: str) -> str:
+    return value.strip().lower()
+
+
+class TypeaheadIndex:
+    def __init__(self):
+        self.keys: List[Optional[str]] = []  # None once tombstoned
+        self.kinds = array('b')
+        self.refs = array('i')  # ICD id for ICD keys, mapping id for term keys
+        self.grams: Dict[str, array] = {}
+        self.icds: Dict[int, Tuple[str, Optional[str], Tuple[int, ...], Tuple[int, ...]]] = {}  # id -> (name, code, mapping ids, key numbers)
+        self.mappings: Dict[int, Tuple[int, str, str, Optional[str], bool]] = {}  # id -> (icd id, system, term, code, is_primary)
+        self.dead = 0
+
+    # --- building ---
+    def _add_key(self, text: Optional[str], kind: int, ref: int) -> Optional[int]:
+        key = _norm(text or "")
+        if not key:
+            return None
+        key = sys.intern(key)
+        n = len(self.keys)
+        self.keys.append(key)
+        self.kinds.append(kind)
+        self.refs.append(ref)
+        grams = {key[i:i + 3] for i in range(len(key) - 2)}
+        for word in _WORD_SPLIT.split(key):
+            if word:
+                grams.add("^" + word[:1])
+                grams.add("^" + word[:2])
+        for g in grams:
+            posting = self.grams.get(g)
+            if posting is None:
+                posting = self.grams[sys.intern(g)] = array('i')
+            posting.append(n)
+        return n
+
+    def put_icd(self, icd_id: int, name: str, code: Optional[str], rows: Iterable[MappingRow]) -> None:
+        """(Re)index one ICD and its verified mappings; an ICD without mappings is dropped."""
+        self.drop_icd(icd_id)
+        rows = list(rows)
+        if not rows:
+            return
+        key_nums = [self._add_key(name, ICD_NAME, icd_id), self._add_key(code, ICD_CODE, icd_id)]
+        mapping_ids = []
+        for mapping_id, system, term, tcode, is_primary, devanagari, tamil, arabic in rows:
+            system = sys.intern(system)
+            self.mappings[mapping_id] = (icd_id, system, term, tcode, bool(is_primary))
+            mapping_ids.append(mapping_id)
+            key_nums.append(self._add_key(tcode, TERM_CODE, mapping_id))
+            for text in (term, devanagari, tamil, arabic):
+                key_nums.append(self._add_key(text, TERM_TEXT, mapping_id))
+        self.icds[icd_id] = (name, code, tuple(mapping_ids), tuple(k for k in key_nums if k is not None))
+
+    def drop_icd(self, icd_id: int) -> None:
+        entry = self.icds.get(icd_id)
+        if entry is None:
+            return
+        # Keys first, so concurrent readers stop matching before the entries disappear
+        for n in entry[3]:
+            self.keys[n] = None
+        self.dead += len(entry[3])
+        for mapping_id in entry[2]:
+            self.mappings.pop(mapping_id, None)
+        del self.icds[icd_id]
+
+    def needs_compaction(self) -> bool:
+        return self.dead > max(1024, len(self.keys) - self.dead)
+
+    # --- querying ---
+    def _posting(self, q: str) -> Optional[array]:
+        """The shortest posting list every key containing q is on (None when some gram is unknown)."""
+        grams = [q[i:i + 3] for i in range(len(q) - 2)] if len(q) >= 3 else ["^" + q]
+        posting = None
+        for g in grams:
+            found = self.grams.get(g)
+            if found is None:
+                return None
+            if posting is None or len(found) < len(posting):
+                posting = found
+        return posting
+
+    def suggest(self, q: str, system: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Suggestions in the same shape and order as the DB path: ICD anchors with all their
+        verified terms first, then matching traditional terms (filtered by system)."""
+        q = _norm(q)
+        posting = self._posting(q) if q else None
+        if posting is None:
+            return []
+        system = system.lower() if system else None
+        exact_icd = bool(ICD_CODE_RE.match(q))
+        exact_tm = bool(TM_CODE_RE.match(q))
+        keys, kinds, refs, mappings = self.keys, self.kinds, self.refs, self.mappings
+        # Score = (rank, key length, id): exact code, then prefix, word start, infix; shorter keys first
+        icd_best: Dict[int, tuple] = {}
+        term_best: Dict[int, tuple] = {}
+        for n in posting:
+            key = keys[n]
+            if key is None:
+                continue
+            kind = kinds[n]
+            if (kind == ICD_CODE and exact_icd) or (kind == TERM_CODE and exact_tm):
+                if key != q:
+                    continue
+                rank = -1
+            else:
+                pos = key.find(q)
+                if pos < 0:
+                    continue
+                rank = 0 if pos == 0 else 1 if key[pos - 1] in _WORD_BREAKS else 2
+            ref = refs[n]
+            if kind <= ICD_CODE:
+                target = icd_best
+            else:
+                if system:
+                    found = mappings.get(ref)
+                    if found is None or found[1] != system:
+                        continue
+                target = term_best
+            score = (rank, len(key), ref)
+            best = target.get(ref)
+            if best is None or score < best:
+                target[ref] = score
+
+        suggestions: List[dict] = []
+        for icd_id in heapq.nsmallest(MAX_ICD_ANCHORS, icd_best, key=icd_best.get):
+            entry = self.icds.get(icd_id)
+            if entry is None:  # dropped by a concurrent refresh
+                continue
+            name, _, mapping_ids, _ = entry
+            suggestions.append({"kind": "icd", "icd_name": name})
+            for mapping_id in mapping_ids:
+                found = self.mappings.get(mapping_id)
+                if found is None:
+                    continue
+                _, msys, term, code, is_primary = found
+                suggestions.append({"kind": "traditional", "icd_name": name, "system": msys, "term": term,
+                                    "code": code, "is_primary": is_primary})
+        if len(suggestions) >= limit:
+            return suggestions[:limit]
+
+        seen: set = set()
+        # Enough candidates for the limit even after duplicate (term, code, system) rows are skipped
+        for mapping_id in heapq.nsmallest(limit * 2, term_best, key=term_best.get):
+            found = self.mappings.get(mapping_id)
+            icd = self.icds.get(found[0]) if found else None
+            if icd is None:
+                continue
+            _, msys, term, code, is_primary = found
+            if (term, code, msys) in seen:
+                continue
+            seen.add((term, code, msys))
+            suggestions.append({"kind": "traditional", "icd_name": icd[0], "system": msys,
+                                "term": term, "code": code, "is_primary": is_primary})
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+    def stats(self) -> dict:
+        return {
+            "icds": len(self.icds),
+            "mappings": len(self.mappings),
+            "keys": len(self.keys) - self.dead,
+            "tombstones": self.dead,
+            "grams": len(self.grams),
+        }
+
+
+def load_rows(db: Session, icd_ids: Optional[Iterable[int]] = None) -> Dict[int, Tuple[str, Optional[str], List[MappingRow]]]:
+    """Verified mappings (optionally for specific ICD ids) grouped per ICD, ordered by mapping id."""
+    q = (
+        db.query(Mapping.icd11_code_id, ICD11Code.icd_name, ICD11Code.icd_code, Mapping.id, TraditionalTerm.system,
+                 TraditionalTerm.term, TraditionalTerm.code, Mapping.is_primary, TraditionalTerm.devanagari,
+                 TraditionalTerm.tamil, TraditionalTerm.arabic)
+        .join(TraditionalTerm, Mapping.traditional_term_id == TraditionalTerm.id)
+        .join(ICD11Code, Mapping.icd11_code_id == ICD11Code.id)
+        .filter(Mapping.status == 'verified')
+    )
+    if icd_ids is not None:
+        q = q.filter(Mapping.icd11_code_id.in_(list(icd_ids)))
+    grouped: Dict[int, Tuple[str, Optional[str], List[MappingRow]]] = {}
+    for icd_id, name, code, *row in q.order_by(Mapping.id.asc()).all():
+        grouped.setdefault(icd_id, (name, code, []))[2].append(tuple(row))
+    return grouped
+
+
+_current: Optional[TypeaheadIndex] = None
+_lock = threading.Lock()
+
+
+def current() -> Optional[TypeaheadIndex]:
+    """The active index, or None before the first build (the endpoint then queries the DB)."""
+    return _current
+
+
+def _build(db: Session) -> TypeaheadIndex:
+    index = TypeaheadIndex()
+    for icd_id, (name, code, rows) in load_rows(db).items():
+        index.put_icd(icd_id, name, code, rows)
+    return index
+
+
+def rebuild(db: Optional[Session] = None) -> TypeaheadIndex:
+    """Build the index from all verified mappings and swap it in."""
+    global _current
+    started = time.perf_counter()
+    with _lock:
+        if db is None:
+            with SessionLocal() as own:
+                index = _build(own)
+        else:
+            index = _build(db)
+        _current = index
+    print(f"[TYPEAHEAD] Built in {time.perf_counter() - started:.2f}s: {index.stats()}", flush=True)
+    return index
+
+
+def refresh(icd_names: Iterable[str]) -> None:
+    """Re-read the verified mappings of the given ICDs and patch them into the live index."""
+    global _current
+    names = {n for n in icd_names if n}
+    if not names or _current is None:
+        return
+    with _lock:
+        index = _current
+        with SessionLocal() as db:
+            if index.needs_compaction():
+                _current = _build(db)
+                return
+            ids = {r[0] for r in db.query(ICD11Code.id).filter(ICD11Code.icd_name.in_(names))}
+            # Also revisit indexed ICDs known by an old name
+            ids.update(icd_id for icd_id, entry in list(index.icds.items()) if entry[0] in names)
+            grouped = load_rows(db, ids)
+        for icd_id in ids:
+            name, code, rows = grouped.get(icd_id, (None, None, []))
+            index.put_icd(icd_id, name, code, rows)
@@ -0,0 +1,297 @@
+"""Native asyncio client for the WHO ICD-11 API (httpx).
+
+Async endpoints await these instead of pushing the blocking who_api_client calls onto a
+thread pool. Every lookup runs the same step generators as who_api_client and shares its
+caches, negative cache, token and counters, so a result fetched by either client serves
+the other. Only the transport differs: one httpx.AsyncClient per event loop with the
+same timeouts, pool size and 429/5xx retry policy as who_api_client._budgeted.
+
+who_sync and the admin tools keep using the blocking functions in who_api_client.
+Blocking local I/O (the durable response store, SQLite-backed caches, the release
+mirror) runs on worker threads via asyncio.to_thread, never on the event loop.
+"""
+import asyncio
+import ssl
+import weakref
+from typing import Optional
+
+import certifi
+import httpx
+import requests
+
+from app.services import cache_backends, who_api_client as _who, who_response_store
+from app.services.who_api_client import _MISSING, _cache_counters, _cache_lock, _cached_value, _remember
+
+# One client per event loop: httpx connections are bound to the loop that opened them.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+# In-flight lookups per event loop, keyed like the WHO caches.
+_flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def _verify():
+    if _who.WHO_ALLOW_INSECURE_ICDAPI:
+        return False
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def _client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = httpx.AsyncClient(
+            verify=_verify(),
+            timeout=httpx.Timeout(_who.WHO_READ_TIMEOUT_SECONDS, connect=_who.WHO_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=_who.WHO_POOL_MAXSIZE, max_keepalive_connections=_who.WHO_POOL_MAXSIZE),
+            follow_redirects=True,
+        )
+    return client
+
+
+async def aclose() -> None:
+    """Close the current loop's client (app shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class _Response:
+    """The slice of requests.Response the lookup steps use, over an httpx.Response."""
+    __slots__ = ("_r",)
+
+    def __init__(self, r: httpx.Response):
+        self._r = r
+
+    @property
+    def status_code(self) -> int:
+        return self._r.status_code
+
+    @property
+    def headers(self):
+        return self._r.headers
+
+    def json(self):
+        try:
+            return self._r.json()
+        except ValueError as e:
+            raise requests.exceptions.InvalidJSONError(str(e))
+
+    def raise_for_status(self):
+        if self._r.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self._r.status_code} Error for url: {self._r.url}")
+
+
+async def _send(req: "_who._Req"):
+    """One WHO request, answered or revalidated through the durable response store for GETs."""
+    store = who_response_store.current() if req.method == "GET" else None
+    if store is None:
+        return await _fetch(req)
+    # The store is SQLite: keep its reads and writes off the event loop
+    hit, conditional, entry = await asyncio.to_thread(store.lookup, req.url)
+    if hit is not None:
+        return hit
+    if conditional:
+        req = req._replace(kwargs=_who._with_headers(req.kwargs, conditional))
+    resp = await _fetch(req)
+    return await asyncio.to_thread(store.update, req.url, entry, resp)
+
+
+async def _fetch(req: "_who._Req") -> _Response:
+    """One WHO request with the session's retry policy; httpx errors surface as requests exceptions.
+
+    Connect failures and 429/5xx responses are retried up to WHO_MAX_RETRIES times with
+    jittered exponential backoff (Retry-After wins when present, up to its cap); read
+    timeouts are not. The same policy as who_api_client._budgeted.
+    Every attempt passes the host's circuit breaker and takes a slot from the shared WHO
+    budget in the caller's lane.
+    """
+    lane = _who._lane.get()
+    attempt = 0
+    while True:
+        breaker = _who.breakers.admit(req.url)
+        try:
+            await _who.budget.acquire_async(lane, _who.lane_max_wait(lane))
+        except BaseException:
+            breaker.record(None)
+            raise
+        resp, healthy = None, None
+        try:
+            resp = await _client().request(req.method, req.url, **req.kwargs)
+            healthy = resp.status_code < 500
+        except httpx.ConnectError as e:
+            healthy = False
+            if attempt >= _who.WHO_MAX_RETRIES:
+                _who._mark("failed")
+                raise requests.exceptions.ConnectionError(str(e)) from e
+        except httpx.TimeoutException as e:
+            healthy = False
+            _who._mark("failed")
+            raise requests.exceptions.Timeout(str(e)) from e
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            _who._mark("failed")
+            raise requests.exceptions.RequestException(str(e)) from e
+        finally:
+            if resp is None:
+                _who.budget.release()
+            else:
+                _who.budget.release(resp.status_code, resp.headers.get("Retry-After"))
+            breaker.record(healthy)
+        if resp is None:
+            retry_after = None  # connect failure, retried
+        elif resp.status_code in _who.RETRY_STATUS and attempt < _who.WHO_MAX_RETRIES:
+            retry_after = resp.headers.get("Retry-After")
+        else:
+            if not _who._definitive(resp.status_code):
+                _who._mark("failed")
+            return _Response(resp)
+        await asyncio.sleep(_who.retry_delay(attempt, retry_after))
+        attempt += 1
+
+
+async def _run_hedge(hedge: "_who._Hedge"):
+    """Race hedge.reqs[0] and, after hedge.delay without a success, hedge.reqs[1]; losers are cancelled."""
+    def ok(t):
+        return t.done() and not t.cancelled() and t.exception() is None and t.result().status_code < 400
+
+    tasks = [asyncio.create_task(_send(hedge.reqs[0]))]
+    try:
+        await asyncio.wait(tasks, timeout=hedge.delay)
+        if not ok(tasks[0]):
+            tasks.append(asyncio.create_task(_send(hedge.reqs[1])))
+        winner, pending = None, set(tasks)
+        while pending and winner is None:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((t.result() for t in tasks if ok(t)), None)
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+    outcomes = [(t.exception() or t.result()) if t.done() and not t.cancelled() else None for t in tasks]
+    return winner, outcomes + [None] * (len(hedge.reqs) - len(outcomes))
+
+
+async def _run(steps):
+    """Drive lookup steps on the event loop (async counterpart of who_api_client._run)."""
+    try:
+        req = next(steps)
+        while True:
+            if isinstance(req, _who._Hedge):
+                try:
+                    result = await _run_hedge(req)
+                except asyncio.CancelledError:
+                    steps.close()
+                    raise
+                req = steps.send(result)
+                continue
+            try:
+                if isinstance(req, _who._Local):
+                    resp = await asyncio.to_thread(req.fn, *req.args)
+                else:
+                    resp = await _send(req)
+            except asyncio.CancelledError:
+                steps.close()
+                raise
+            except Exception as e:
+                req = steps.throw(e)
+                continue
+            req = steps.send(resp)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _locked(fn, *args):
+    with _cache_lock:
+        return fn(*args)
+
+
+async def _cache_io(fn, *args):
+    """fn(*args) under the WHO cache lock; on a worker thread when the caches are SQLite-backed."""
+    if isinstance(_who.negative_cache, cache_backends.SharedTTLCache):
+        return await asyncio.to_thread(_locked, fn, *args)
+    return _locked(fn, *args)
+
+
+def _async_lookup(name: str):
+    """Async variant of who_api_client.<name>: same cache keys and caches, per-loop coalescing.
+
+    The blocking function is looked up on who_api_client at call time, so reassigning it
+    (or monkeypatching it in tests) changes the sync and async paths alike; a replacement
+    without a .lookup runs on a worker thread.
+    """
+    blocking_fn = getattr(_who, name)
+
+    async def wrapper(*args, **kwargs):
+        fn = getattr(_who, name)
+        lookup = getattr(fn, "lookup", None)
+        if lookup is None:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        key = lookup.key(*args, **kwargs)
+        cached_value = await _cache_io(_cached_value, key, lookup.positive_cache)
+        if cached_value is not _MISSING:
+            return cached_value
+        loop = asyncio.get_running_loop()
+        flights = _flights.setdefault(loop, {})
+        fut = flights.get(key)
+        if fut is not None:
+            _cache_counters.incr("coalesced")
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise
+                # The leader's caller went away; look it up ourselves
+                return await wrapper(*args, **kwargs)
+
+        fut = flights[key] = loop.create_future()
+        # Mark failures as retrieved so an unawaited future does not log "exception never retrieved"
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        _cache_counters.incr("misses")
+        try:
+            marks = _who._throttled.set([])
+            try:
+                result = await _run(lookup.steps(*args, **kwargs))
+                throttled = bool(_who._throttled.get())
+            finally:
+                _who._throttled.reset(marks)
+            await _cache_io(_remember, key, lookup.positive_cache, result, throttled)
+            fut.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            if flights.get(key) is fut:
+                del flights[key]
+
+    wrapper.__name__ = blocking_fn.__name__
+    wrapper.__qualname__ = blocking_fn.__qualname__
+    wrapper.__doc__ = blocking_fn.__doc__
+    return wrapper
+
+
+async def get_who_api_token():
+    return await _run(_who._token_steps())
+
+
+async def get_entity_details(entity_uri: str):
+    return await _run(_who._entity_details_steps(entity_uri))
+
+
+fetch_linearized_entity = _async_lookup("fetch_linearized_entity")
+mms_search_by_release = _async_lookup("mms_search_by_release")
+tm2_search_by_release = _async_lookup("tm2_search_by_release")
+search_and_fetch_entity = _async_lookup("search_and_fetch_entity")
+search_and_fetch_tm2 = _async_lookup("search_and_fetch_tm2")
+fetch_linearized_entity_by_release = _async_lookup("fetch_linearized_entity_by_release")
+search_foundation_uri = _async_lookup("search_foundation_uri")
+
+
+async def search_tm2_by_terms(terms: list[str]):
+    """Try TM2 search for a list of alternative terms; return first matching entity-like dict."""
+    for t in terms:
+        res = await search_and_fetch_tm2(t)
+        if res:
+            return res
+    return None
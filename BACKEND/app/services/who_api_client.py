@@ -1,9 +1,24 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 from fastapi import HTTPException
-from cachetools import cached, TTLCache
+from cachetools import TTLCache
 import certifi  # For SSL certificate verification
-from typing import Optional
+import asyncio
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from urllib.parse import urlsplit
+from typing import Any, Callable, Generator, NamedTuple, Optional
+
+from app.services import cache_backends, who_response_store
 
 # --- Configuration ---
 WHO_API_CLIENT_ID = os.getenv("WHO_API_CLIENT_ID")
@@ -13,6 +28,8 @@ WHO_ALLOW_INSECURE_ICDAPI = os.getenv("WHO_ALLOW_INSECURE_ICDAPI", "0").lower()
 WHO_LOCAL_NOAUTH = os.getenv("WHO_LOCAL_NOAUTH", "0").lower() in ("1", "true", "yes")
 WHO_ID_BASE = os.getenv("WHO_ID_BASE", "https://id.who.int").rstrip('/')
 WHO_ICD_BASE = os.getenv("WHO_ICD_BASE", "https://icd.who.int").rstrip('/')
+# Linearization release used when callers don't pin one
+WHO_DEFAULT_RELEASE = os.getenv("WHO_DEFAULT_RELEASE", "2025-01")
 
 
 def _verify_param():
@@ -21,56 +38,838 @@ def _verify_param():
     return False if WHO_ALLOW_INSECURE_ICDAPI else certifi.where()
 
 
+# --- Pooled HTTP client ---
+# One keep-alive session for all WHO traffic: connections to id.who.int / icd.who.int are
+# pooled per host and every call has connect/read timeouts. Connect failures and 429/5xx
+# responses are retried a bounded number of times with jittered exponential backoff
+# (honouring Retry-After up to WHO_MAX_RETRY_AFTER_SECONDS) by _budgeted, not by the
+# adapter, so every attempt passes the circuit breaker and takes a WHO budget slot.
+WHO_CONNECT_TIMEOUT_SECONDS = float(os.getenv("WHO_CONNECT_TIMEOUT_SECONDS", "5"))
+WHO_READ_TIMEOUT_SECONDS = float(os.getenv("WHO_READ_TIMEOUT_SECONDS", "15"))
+WHO_MAX_RETRIES = int(os.getenv("WHO_MAX_RETRIES", "2"))
+WHO_RETRY_BACKOFF_SECONDS = float(os.getenv("WHO_RETRY_BACKOFF_SECONDS", "0.5"))
+WHO_MAX_RETRY_AFTER_SECONDS = float(os.getenv("WHO_MAX_RETRY_AFTER_SECONDS", "30"))
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+WHO_POOL_MAXSIZE = int(os.getenv("WHO_POOL_MAXSIZE", "32"))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    # No retries in the adapter: they would bypass the budget and the breaker (see _budgeted)
+    retry = Retry(total=0, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=WHO_POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = _verify_param()
+    return session
+
+
+def _http() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+# --- Shared WHO budget ---
+# Every network call to WHO (sync session, async client, admin helpers) passes through one
+# per-process budget: a token bucket (WHO_RATE_PER_SECOND, bursts up to WHO_RATE_BURST) and
+# at most WHO_MAX_CONCURRENCY calls in flight. Callers queue in a priority lane: while any
+# interactive call (translate, curator actions) is waiting, background work (WHO sync,
+# deep reset) does not take a slot. A 429 halves the rate and pauses the bucket for its
+# Retry-After; successes restore the rate gradually. A call that cannot get a slot within
+# its lane's wait limit is rejected with WhoBudgetExceeded (a RequestException, so lookups
+# treat it like any other failed request).
+WHO_RATE_PER_SECOND = float(os.getenv("WHO_RATE_PER_SECOND", "10"))
+WHO_RATE_BURST = int(os.getenv("WHO_RATE_BURST", "20"))
+WHO_MAX_CONCURRENCY = int(os.getenv("WHO_MAX_CONCURRENCY", "8"))
+WHO_INTERACTIVE_MAX_WAIT_SECONDS = float(os.getenv("WHO_INTERACTIVE_MAX_WAIT_SECONDS", "10"))
+WHO_BACKGROUND_MAX_WAIT_SECONDS = float(os.getenv("WHO_BACKGROUND_MAX_WAIT_SECONDS", "120"))
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_lane: ContextVar[str] = ContextVar("who_lane", default=INTERACTIVE)
+# Set per lookup; records that a call was throttled, rejected, short-circuited or failed
+# (transport error, or an error status other than 404) so its None is not negative-cached
+_throttled: ContextVar[Optional[list]] = ContextVar("who_throttled", default=None)
+
+
+def _mark(reason: str) -> None:
+    """Note on the current lookup (if any) that its answer is not a definitive miss."""
+    marks = _throttled.get()
+    if marks is not None:
+        marks.append(reason)
+
+
+def _definitive(status_code: int) -> bool:
+    """Whether a WHO answer with this status says something about WHO's data."""
+    return status_code < 400 or status_code == 404
+
+
+class WhoBudgetExceeded(requests.exceptions.RequestException):
+    """No WHO call slot became available within the lane's wait limit."""
+
+
+@contextmanager
+def priority(lane: str):
+    """Run the enclosed WHO calls in the given lane (INTERACTIVE or BACKGROUND)."""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), capped at WHO_MAX_RETRY_AFTER_SECONDS."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), WHO_MAX_RETRY_AFTER_SECONDS)
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """How long to wait before retry number attempt + 1: Retry-After when given, else jittered backoff."""
+    delay = retry_after_seconds(retry_after)
+    if delay is not None:
+        return delay
+    base = WHO_RETRY_BACKOFF_SECONDS
+    return base * (2 ** attempt) + random.uniform(0, base)
+
+
+class _Budget:
+    _POLL_SECONDS = 0.05
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int):
+        self._cond = threading.Condition()
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.tokens = float(burst)
+        self._stamp = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.counters = {"granted": 0, "queued": 0, "throttled": 0, "rejected": 0}
+
+    def _try(self, lane: str) -> float:
+        """Take a slot (returns 0) or return how long to wait before trying again. Caller holds _cond."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if lane == BACKGROUND and self.waiting[INTERACTIVE]:
+            return self._POLL_SECONDS
+        if self.in_flight >= self.max_concurrency:
+            return self._POLL_SECONDS
+        self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.in_flight += 1
+        self.counters["granted"] += 1
+        return 0.0
+
+    def _enqueue(self, lane: str) -> float:
+        wait = self._try(lane)
+        if wait:
+            self.waiting[lane] += 1
+            self.counters["queued"] += 1
+        return wait
+
+    def _reject(self, lane: str):
+        self.counters["rejected"] += 1
+        _mark("rejected")
+        raise WhoBudgetExceeded(f"WHO call budget exhausted ({lane} lane waited too long)")
+
+    def acquire(self, lane: str, max_wait: float) -> None:
+        deadline = time.monotonic() + max_wait
+        with self._cond:
+            wait = self._enqueue(lane)
+            if not wait:
+                return
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(lane)
+                    self._cond.wait(min(wait, remaining))
+                    wait = self._try(lane)
+                    if not wait:
+                        return
+            finally:
+                self.waiting[lane] -= 1
+
+    async def acquire_async(self, lane: str, max_wait: float) -> None:
+        deadline = time.monotonic() + max_wait
+        with self._cond:
+            wait = self._enqueue(lane)
+        if not wait:
+            return
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._cond:
+                        self._reject(lane)
+                # Releases cannot wake a coroutine, so poll at least every _POLL_SECONDS
+                await asyncio.sleep(min(wait, remaining, self._POLL_SECONDS))
+                with self._cond:
+                    wait = self._try(lane)
+                if not wait:
+                    return
+        finally:
+            with self._cond:
+                self.waiting[lane] -= 1
+
+    def release(self, status_code: Optional[int] = None, retry_after: Optional[str] = None) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if status_code == 429:
+                self.counters["throttled"] += 1
+                self.rate = max(self.max_rate / 16, self.rate / 2)
+                pause = retry_after_seconds(retry_after)
+                self.paused_until = max(self.paused_until, time.monotonic() + (pause if pause is not None else 1 / self.rate))
+                _mark("throttled")
+            elif status_code is not None and status_code < 500:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self.counters,
+                "queued_now": dict(self.waiting),
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "rate_per_second": round(self.rate, 3),
+                "max_rate_per_second": self.max_rate,
+                "burst": self.burst,
+                "paused_for_seconds": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            }
+
+
+budget = _Budget(WHO_RATE_PER_SECOND, WHO_RATE_BURST, WHO_MAX_CONCURRENCY)
+
+
+def lane_max_wait(lane: str) -> float:
+    return WHO_BACKGROUND_MAX_WAIT_SECONDS if lane == BACKGROUND else WHO_INTERACTIVE_MAX_WAIT_SECONDS
+
+
+# --- Per-host circuit breakers ---
+# id.who.int and icd.who.int fail independently. After WHO_BREAKER_FAILURES consecutive
+# failures (connection errors, timeouts, 5xx) a host's circuit opens and calls to it fail
+# fast with WhoHostUnavailable for WHO_BREAKER_OPEN_SECONDS. Then it half-opens: one probe
+# call at a time goes through; a healthy answer closes the circuit, a failure reopens it.
+# 4xx answers (including 429, which the budget handles) count as healthy.
+WHO_BREAKER_FAILURES = int(os.getenv("WHO_BREAKER_FAILURES", "5"))
+WHO_BREAKER_OPEN_SECONDS = float(os.getenv("WHO_BREAKER_OPEN_SECONDS", "30"))
+
+
+class WhoHostUnavailable(requests.exceptions.ConnectionError):
+    """The host's circuit is open; the call was not attempted."""
+
+
+class _Breaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, host: str, failure_threshold: int, open_seconds: float):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.counters = {"opened": 0, "short_circuited": 0, "probes": 0, "recovered": 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                self.counters["probes"] += 1
+                return True
+            self.counters["short_circuited"] += 1
+            return False
+
+    def record(self, healthy: Optional[bool]) -> None:
+        """Outcome of an allowed call: True/False for a healthy/failed host, None for no verdict."""
+        with self._lock:
+            self._probing = False
+            if healthy is None:
+                return
+            if healthy:
+                if self.state != self.CLOSED:
+                    self.counters["recovered"] += 1
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.counters["opened"] += 1
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.open_seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, **self.counters}
+
+
+class _Breakers:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_host: dict = {}
+
+    def for_host(self, host: str) -> _Breaker:
+        with self._lock:
+            breaker = self._by_host.get(host)
+            if breaker is None:
+                breaker = self._by_host[host] = _Breaker(host, WHO_BREAKER_FAILURES, WHO_BREAKER_OPEN_SECONDS)
+            return breaker
+
+    def admit(self, url: str) -> _Breaker:
+        """The URL host's breaker if it lets this call through; raises WhoHostUnavailable otherwise."""
+        breaker = self.for_host(urlsplit(url).netloc.lower())
+        if not breaker.allow():
+            _mark("circuit_open")
+            raise WhoHostUnavailable(f"WHO host {breaker.host} is unavailable (circuit open)")
+        return breaker
+
+    def degraded(self) -> bool:
+        """True while the circuit of any WHO host translate depends on is open."""
+        return any(self.for_host(urlsplit(base).netloc.lower()).is_open() for base in (WHO_ID_BASE, WHO_ICD_BASE))
+
+    def all_open(self) -> bool:
+        return all(self.for_host(urlsplit(base).netloc.lower()).is_open() for base in (WHO_ID_BASE, WHO_ICD_BASE))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_host.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = list(self._by_host.values())
+        return {b.host: b.stats() for b in breakers}
+
+
+breakers = _Breakers()
+
+
+def _budgeted(send, url: str, kwargs: dict) -> requests.Response:
+    """One WHO call with the retry policy; every attempt passes the host's breaker and takes a budget slot.
+
+    Connect failures and 429/5xx responses are retried up to WHO_MAX_RETRIES times (see
+    retry_delay); read timeouts are not. The same policy as who_api_async._fetch.
+    """
+    lane = _lane.get()
+    attempt = 0
+    while True:
+        breaker = breakers.admit(url)
+        try:
+            budget.acquire(lane, lane_max_wait(lane))
+        except WhoBudgetExceeded:
+            breaker.record(None)
+            raise
+        resp, healthy = None, None
+        try:
+            resp = send(url, **kwargs)
+            healthy = resp.status_code < 500
+        except requests.exceptions.ConnectionError:
+            healthy = False
+            if attempt >= WHO_MAX_RETRIES:
+                _mark("failed")
+                raise
+        except requests.exceptions.Timeout:
+            healthy = False
+            _mark("failed")
+            raise
+        except requests.exceptions.RequestException:
+            _mark("failed")
+            raise
+        finally:
+            if resp is None:
+                budget.release()
+            else:
+                budget.release(resp.status_code, resp.headers.get("Retry-After"))
+            breaker.record(healthy)
+        if resp is None:
+            retry_after = None  # connect failure, retried
+        elif resp.status_code in RETRY_STATUS and attempt < WHO_MAX_RETRIES:
+            retry_after = resp.headers.get("Retry-After")
+        else:
+            if not _definitive(resp.status_code):
+                _mark("failed")
+            return resp
+        time.sleep(retry_delay(attempt, retry_after))
+        attempt += 1
+
+
+def who_get(url: str, **kwargs) -> requests.Response:
+    """GET through the pooled WHO session with default timeouts and retries, within the WHO budget."""
+    kwargs.setdefault("timeout", (WHO_CONNECT_TIMEOUT_SECONDS, WHO_READ_TIMEOUT_SECONDS))
+    return _budgeted(_http().get, url, kwargs)
+
+
+def who_post(url: str, **kwargs) -> requests.Response:
+    """POST through the pooled WHO session with default timeouts and retries, within the WHO budget."""
+    kwargs.setdefault("timeout", (WHO_CONNECT_TIMEOUT_SECONDS, WHO_READ_TIMEOUT_SECONDS))
+    return _budgeted(_http().post, url, kwargs)
+
+
+# --- Offline release mirror ---
+# Release-pinned lookups are answered from the locally imported WHO release files
+# (who_release_mirror) when the release is mirrored; WHO is only called on a miss.
+WHO_RELEASE_MIRROR = os.getenv("WHO_RELEASE_MIRROR", "1").lower() in ("1", "true", "yes")
+
+
+def _mirror():
+    """The release mirror module, or None when disabled."""
+    if not WHO_RELEASE_MIRROR:
+        return None
+    # Imported lazily: it needs the database, which scripts using this client may not configure
+    from app.services import who_release_mirror
+    return who_release_mirror
+
+
+def _mirror_steps(method: str, *args):
+    """Ask the release mirror (search/entity) as a _Local step; None when disabled or not mirrored."""
+    mirror = _mirror()
+    if mirror is None:
+        return None
+    return (yield _Local(getattr(mirror, method), args))
+
+
+# --- Transport-agnostic lookups ---
+# Each WHO operation below is written once as a generator of HTTP steps: it yields a
+# _Req and is sent back the response (or has the transport error thrown into it, so the
+# RequestException handling reads as before). _run drives the steps through the pooled
+# requests session; who_api_async drives the same steps through httpx on the event loop.
+# A step may also be a _Hedge: two requests raced as described on the class, or a _Local:
+# a blocking local call (the release mirror's DB queries) that _run makes inline and
+# who_api_async runs on a worker thread, so it never blocks the event loop.
+
+class _Req(NamedTuple):
+    method: str
+    url: str
+    kwargs: dict
+
+
+class _Hedge(NamedTuple):
+    """Send reqs[0]; if it has not succeeded within delay seconds, also send reqs[1].
+
+    The driver sends back (winner, outcomes): winner is the first response with a status
+    below 400 (or None), outcomes holds per request its response, its exception, or None
+    when it was never sent or was abandoned unfinished.
+    """
+    reqs: tuple
+    delay: float
+
+
+class _Local(NamedTuple):
+    """Call fn(*args); the driver sends back its result (or throws its exception in)."""
+    fn: Callable[..., Any]
+    args: tuple
+
+
+def _get(url: str, **kwargs) -> _Req:
+    return _Req("GET", url, kwargs)
+
+
+def _send(req: _Req):
+    send = who_get if req.method == "GET" else who_post
+    store = who_response_store.current() if req.method == "GET" else None
+    if store is None:
+        return send(req.url, **req.kwargs)
+    hit, conditional, entry = store.lookup(req.url)
+    if hit is not None:
+        return hit
+    return store.update(req.url, entry, send(req.url, **_with_headers(req.kwargs, conditional)))
+
+
+def _with_headers(kwargs: dict, extra: dict) -> dict:
+    if not extra:
+        return kwargs
+    return {**kwargs, "headers": {**(kwargs.get("headers") or {}), **extra}}
+
+
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _run_hedge(hedge: _Hedge):
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _session_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=WHO_POOL_MAXSIZE, thread_name_prefix="who-hedge")
+
+    def ok(f):
+        return f.done() and f.exception() is None and f.result().status_code < 400
+
+    # Worker threads inherit the caller's lane and throttle marks
+    futures = [_hedge_pool.submit(copy_context().run, _send, hedge.reqs[0])]
+    wait(futures, timeout=hedge.delay)
+    if not ok(futures[0]):
+        futures.append(_hedge_pool.submit(copy_context().run, _send, hedge.reqs[1]))
+    winner = None
+    for f in as_completed(futures):
+        if ok(f):
+            winner = f.result()
+            break
+    outcomes = [(f.exception() or f.result()) if f.done() else None for f in futures]
+    return winner, outcomes + [None] * (len(hedge.reqs) - len(outcomes))
+
+
+def _run(steps: Generator[Any, Any, Any]):
+    """Drive lookup steps synchronously through who_get/who_post."""
+    try:
+        req = next(steps)
+        while True:
+            if isinstance(req, _Hedge):
+                req = steps.send(_run_hedge(req))
+                continue
+            try:
+                resp = req.fn(*req.args) if isinstance(req, _Local) else _send(req)
+            except Exception as e:
+                req = steps.throw(e)
+                continue
+            req = steps.send(resp)
+    except StopIteration as stop:
+        return stop.value
+
+
 # --- In-memory Cache Configuration ---
 token_cache = TTLCache(maxsize=1, ttl=3000)
-entity_cache = TTLCache(maxsize=500, ttl=86400)
-tm2_entity_cache = TTLCache(maxsize=500, ttl=86400)
-foundation_search_cache = TTLCache(maxsize=500, ttl=86400)
+_TOKEN_KEY = "token"
+# Lookup caches follow CACHE_BACKEND (see cache_backends): per-process by default, or one
+# SQLite file shared by all workers on the host. The token stays per-process.
+entity_cache = cache_backends.ttl_cache("who:entity", maxsize=500, ttl=86400)
+tm2_entity_cache = cache_backends.ttl_cache("who:tm2_entity", maxsize=500, ttl=86400)
+foundation_search_cache = cache_backends.ttl_cache("who:foundation_search", maxsize=500, ttl=86400)
+release_search_cache = cache_backends.ttl_cache("who:release_search", maxsize=2000, ttl=86400)
+linearized_entity_cache = cache_backends.ttl_cache("who:linearized_entity", maxsize=2000, ttl=86400)
+# WHO misses (None results) live here, keyed by (operation, normalized term, release, linearization),
+# with a shorter TTL so concepts that gain a WHO counterpart (or transient failures) recover.
+WHO_NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("WHO_NEGATIVE_CACHE_TTL_SECONDS", "900"))
+negative_cache = cache_backends.ttl_cache("who:negative", maxsize=5000, ttl=WHO_NEGATIVE_CACHE_TTL_SECONDS)
+_cache_lock = threading.Lock()
+_cache_counters = cache_backends.counters("who", ("hits", "misses", "negative_hits", "negative_stores", "coalesced", "throttled_misses"))
+_MISSING = object()
 
 
-@cached(token_cache)
-def get_who_api_token():
-    """Fetch an OAuth2 token, or return None when WHO_LOCAL_NOAUTH is enabled or creds are missing (local dev)."""
-    if WHO_LOCAL_NOAUTH or not all([WHO_API_CLIENT_ID, WHO_API_CLIENT_SECRET, WHO_TOKEN_URL]):
+class _Flight:
+    """One in-progress WHO lookup that concurrent callers for the same key wait on."""
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: dict = {}
+
+
+def _normalize_term(term: Optional[str]) -> str:
+    return " ".join((term or "").split()).lower()
+
+
+def _cached_value(key: tuple, positive_cache):
+    """Cached result for key (None for a remembered miss) or _MISSING. Caller holds _cache_lock."""
+    if negative_cache.get(key, _MISSING) is not _MISSING:
+        _cache_counters.incr("negative_hits")
         return None
+    value = positive_cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _cache_counters.incr("hits")
+    return value
 
-    payload = {
-        'client_id': WHO_API_CLIENT_ID,
-        'client_secret': WHO_API_CLIENT_SECRET,
-        'grant_type': 'client_credentials',
-        'scope': 'icdapi_access'
-    }
-    try:
-        r = requests.post(
-            WHO_TOKEN_URL,
-            data=payload,
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            verify=_verify_param()
-        )
-        r.raise_for_status()
-        return r.json().get('access_token')
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching WHO API token: {e}")
-        raise HTTPException(status_code=503, detail="Could not authenticate with WHO API.")
 
+def _remember(key: tuple, positive_cache, result, throttled: bool = False) -> None:
+    """Store a lookup result: hits in positive_cache, None in negative_cache. Caller holds _cache_lock.
 
-def get_entity_details(entity_uri: str):
-    """Fetch the full details for a given ICD-11 entity URI (supports optional auth)."""
-    token = get_who_api_token()
+    A None from a lookup that was throttled or rejected by the WHO budget, cut short by an
+    open circuit, or that hit a timeout, connection error or 5xx (after retries) says
+    nothing about WHO's data, so it is not negative-cached: only definitive answers are.
+    """
+    if result is None:
+        if throttled:
+            _cache_counters.incr("throttled_misses")
+            return
+        negative_cache[key] = True
+        _cache_counters.incr("negative_stores")
+    else:
+        positive_cache[key] = result
+
+
+class _Lookup(NamedTuple):
+    """What a cached WHO operation is made of; shared by the sync and async clients."""
+    operation: str
+    positive_cache: Any
+    key_fn: Callable
+    steps: Callable
+
+    def key(self, *args, **kwargs) -> tuple:
+        term, release, linearization = self.key_fn(*args, **kwargs)
+        return (self.operation, _normalize_term(term), release, linearization)
+
+    def cached_steps(self, *args, **kwargs):
+        """The lookup's steps behind the cache, for use inside another lookup (no coalescing)."""
+        key = self.key(*args, **kwargs)
+        with _cache_lock:
+            value = _cached_value(key, self.positive_cache)
+            if value is _MISSING:
+                _cache_counters.incr("misses")
+        if value is not _MISSING:
+            return value
+        result = yield from self.steps(*args, **kwargs)
+        with _cache_lock:
+            _remember(key, self.positive_cache, result, bool(_throttled.get()))
+        return result
+
+
+def _who_lookup(operation: str, positive_cache: TTLCache, key_fn):
+    """Cache a WHO lookup: hits in positive_cache, misses (None) in negative_cache.
+
+    Decorates a steps generator and returns the blocking function; the lookup spec is
+    kept on it as .lookup for who_api_async. key_fn maps the call arguments to (term,
+    release, linearization). Concurrent cache misses for the same key are coalesced:
+    one thread calls WHO, the rest wait for it.
+    """
+    def decorator(fn):
+        lookup = _Lookup(operation, positive_cache, key_fn, fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = lookup.key(*args, **kwargs)
+            with _cache_lock:
+                cached_value = _cached_value(key, positive_cache)
+                if cached_value is not _MISSING:
+                    return cached_value
+                flight = _flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _flights[key] = _Flight()
+                    _cache_counters.incr("misses")
+                else:
+                    _cache_counters.incr("coalesced")
+            if not leader:
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+            try:
+                marks = _throttled.set([])
+                try:
+                    result = _run(fn(*args, **kwargs))
+                    throttled = bool(_throttled.get())
+                finally:
+                    _throttled.reset(marks)
+                with _cache_lock:
+                    _remember(key, positive_cache, result, throttled)
+                flight.result = result
+                return result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with _cache_lock:
+                    _flights.pop(key, None)
+                flight.done.set()
+
+        wrapper.lookup = lookup
+        return wrapper
+    return decorator
+
+
+def cache_stats() -> dict:
+    """Counters and sizes for the WHO lookup caches (positive and negative) and the response store."""
+    store = who_response_store.current()
+    with _cache_lock:
+        return {
+            **_cache_counters.snapshot(),
+            "backend": cache_backends.CACHE_BACKEND,
+            "negative_entries": len(negative_cache),
+            "negative_ttl_seconds": WHO_NEGATIVE_CACHE_TTL_SECONDS,
+            "positive_entries": {
+                "entity": len(entity_cache),
+                "tm2_entity": len(tm2_entity_cache),
+                "foundation_search": len(foundation_search_cache),
+                "release_search": len(release_search_cache),
+                "linearized_entity": len(linearized_entity_cache),
+            },
+            "response_store": store.stats() if store is not None else None,
+        }
+
+
+
+# --- Learned URL-variant ordering ---
+# The linearized fetches know several URL shapes for the same entity, but a deployment
+# answers on the same one every time. Each operation remembers the template that last
+# succeeded and tries it first, then the rest by hit count (declared order breaks ties).
+# With WHO_HEDGE_DELAY_SECONDS > 0 the top two are hedged: the runner-up is sent too if
+# the first has not answered successfully within that delay.
+WHO_HEDGE_DELAY_SECONDS = float(os.getenv("WHO_HEDGE_DELAY_SECONDS", "0"))
+
+
+class _VariantStats:
+    """Per operation: which URL template last succeeded, and attempts/hits per template."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._preferred: dict = {}
+        self._stats: dict = {}
+
+    def order(self, operation: str, templates) -> list:
+        with self._lock:
+            preferred = self._preferred.get(operation)
+            stats = self._stats.get(operation, {})
+            ranked = sorted(templates, key=lambda t: -stats.get(t, {}).get("hits", 0))
+        if preferred in ranked:
+            ranked.remove(preferred)
+            ranked.insert(0, preferred)
+        return ranked
+
+    def record(self, operation: str, template: str, url: str, ok: bool) -> None:
+        with self._lock:
+            st = self._stats.setdefault(operation, {}).setdefault(
+                template, {"host": urlsplit(url).netloc, "attempts": 0, "hits": 0, "last_hit_at": None})
+            st["attempts"] += 1
+            if ok:
+                st["hits"] += 1
+                st["last_hit_at"] = time.time()
+                self._preferred[operation] = template
+            elif self._preferred.get(operation) == template:
+                self._preferred.pop(operation)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                op: {"preferred": self._preferred.get(op), "templates": {t: dict(st) for t, st in stats.items()}}
+                for op, stats in self._stats.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._preferred.clear()
+            self._stats.clear()
+
+
+variant_stats = _VariantStats()
+
+
+def _first_ok_variant(operation: str, templates, headers: dict, **fields):
+    """GET the templates (formatted with fields) in learned order; JSON of the first success or None."""
+    urls = {t: t.format(**fields) for t in templates}
+    queue = variant_stats.order(operation, templates)
+    if WHO_HEDGE_DELAY_SECONDS > 0 and len(queue) >= 2:
+        pair, queue = queue[:2], queue[2:]
+        winner, outcomes = yield _Hedge(tuple(_get(urls[t], headers=headers) for t in pair), WHO_HEDGE_DELAY_SECONDS)
+        data = None
+        if winner is not None:
+            try:
+                data = winner.json()
+            except requests.exceptions.RequestException:
+                winner = None
+        for t, outcome in zip(pair, outcomes):
+            if outcome is not None:
+                variant_stats.record(operation, t, urls[t], ok=winner is not None and outcome is winner)
+        if winner is not None:
+            return data
+    for t in queue:
+        try:
+            r = yield _get(urls[t], headers=headers)
+            if r.status_code >= 400:
+                variant_stats.record(operation, t, urls[t], ok=False)
+                continue
+            data = r.json()
+        except requests.exceptions.RequestException:
+            variant_stats.record(operation, t, urls[t], ok=False)
+            continue
+        variant_stats.record(operation, t, urls[t], ok=True)
+        return data
+    return None
+
+def _token_steps():
+    """OAuth2 token (cached), or None when WHO_LOCAL_NOAUTH is enabled or creds are missing (local dev)."""
+    token = token_cache.get(_TOKEN_KEY, _MISSING)
+    if token is not _MISSING:
+        return token
+    if WHO_LOCAL_NOAUTH or not all([WHO_API_CLIENT_ID, WHO_API_CLIENT_SECRET, WHO_TOKEN_URL]):
+        token = None
+    else:
+        payload = {
+            'client_id': WHO_API_CLIENT_ID,
+            'client_secret': WHO_API_CLIENT_SECRET,
+            'grant_type': 'client_credentials',
+            'scope': 'icdapi_access'
+        }
+        try:
+            r = yield _Req("POST", WHO_TOKEN_URL, dict(
+                data=payload,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            ))
+            r.raise_for_status()
+            token = r.json().get('access_token')
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching WHO API token: {e}")
+            raise HTTPException(status_code=503, detail="Could not authenticate with WHO API.")
+    token_cache[_TOKEN_KEY] = token
+    return token
+
+
+def _headers_steps():
+    token = yield from _token_steps()
     headers = {'Accept': 'application/json', 'API-Version': 'v2', 'Accept-Language': 'en'}
     if token:
         headers['Authorization'] = f'Bearer {token}'
+    return headers
+
+
+def get_who_api_token():
+    """Fetch an OAuth2 token, or return None when WHO_LOCAL_NOAUTH is enabled or creds are missing (local dev)."""
+    return _run(_token_steps())
+
+
+def _entity_details_steps(entity_uri: str):
+    headers = yield from _headers_steps()
     try:
         # Prefer https only for who.int URIs to avoid breaking local http
         if entity_uri.startswith("http://") and ("who.int" in entity_uri):
             entity_uri = "https://" + entity_uri[len("http://"):]
-        r = requests.get(entity_uri, headers=headers, verify=_verify_param())
+        r = yield _get(entity_uri, headers=headers)
         r.raise_for_status()
         return r.json()
     except requests.exceptions.RequestException:
         return None
 
 
+def get_entity_details(entity_uri: str):
+    """Fetch the full details for a given ICD-11 entity URI (supports optional auth)."""
+    return _run(_entity_details_steps(entity_uri))
+
+
 def _entity_id_from_uri(entity_uri: str) -> Optional[str]:
     try:
         return entity_uri.rstrip('/').split('/')[-1]
@@ -78,36 +877,43 @@ def _entity_id_from_uri(entity_uri: str) -> Optional[str]:
         return None
 
 
+_LINEARIZED_TEMPLATES = (
+    "{icd}/icdapi/release/11/{lin}/entity/{entity}",
+    "{icd}/icdapi/release/11/{lin}/entities/{entity}",
+    "{id}/icd/release/11/{lin}/entity/{entity}",
+    "{id}/icd/release/11/{lin}/entities/{entity}",
+    # Query-style linearization on id base
+    "{id}/icd/entity/{entity}?linearizationName={lin}",
+    "{id}/icd/entity/{entity}?releaseId=2024-01&linearizationName={lin}",
+    "{id}/icd/entity/{entity}?linearizationName={lin}&releaseId=2024-01",
+)
+
+_LINEARIZED_RELEASE_TEMPLATES = (
+    # icdapi entity/entities variants
+    "{icd}/icdapi/release/11/{rel}/{lin}/entity/{entity}",
+    "{icd}/icdapi/release/11/{rel}/{lin}/entities/{entity}",
+    # Short-path variants (no 'entity') often used by ECT 'uri'
+    "{icd}/icdapi/release/11/{rel}/{lin}/{entity}",
+    "{icd}/icdapi/release/11/{rel}/{lin}/{entity}/unspecified",
+    # id.who.int aliases
+    "{id}/icd/release/11/{rel}/{lin}/entity/{entity}",
+    "{id}/icd/release/11/{rel}/{lin}/entities/{entity}",
+    "{id}/icd/release/11/{rel}/{lin}/{entity}",
+    "{id}/icd/release/11/{rel}/{lin}/{entity}/unspecified",
+)
+
+
+@_who_lookup("fetch_linearized_entity", linearized_entity_cache, lambda entity_id, linearization: (entity_id, None, linearization))
 def fetch_linearized_entity(entity_id: str, linearization: str):
     """
     Fetches a linearized entity (e.g., MMS or TM2) by foundation entity id.
     Example: https://icd.who.int/icdapi/release/11/mms/entity/{id}
              https://icd.who.int/icdapi/release/11/tm2/entity/{id}
     """
-    token = get_who_api_token()
-    headers = {'Accept': 'application/json', 'API-Version': 'v2', 'Accept-Language': 'en'}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
+    headers = yield from _headers_steps()
     # Try multiple URL patterns for better compatibility across WHO deployments
-    url_variants = [
-        f"{WHO_ICD_BASE}/icdapi/release/11/{linearization}/entity/{entity_id}",
-        f"{WHO_ICD_BASE}/icdapi/release/11/{linearization}/entities/{entity_id}",
-        f"{WHO_ID_BASE}/icd/release/11/{linearization}/entity/{entity_id}",
-        f"{WHO_ID_BASE}/icd/release/11/{linearization}/entities/{entity_id}",
-        # Query-style linearization on id base
-        f"{WHO_ID_BASE}/icd/entity/{entity_id}?linearizationName={linearization}",
-        f"{WHO_ID_BASE}/icd/entity/{entity_id}?releaseId=2024-01&linearizationName={linearization}",
-        f"{WHO_ID_BASE}/icd/entity/{entity_id}?linearizationName={linearization}&releaseId=2024-01",
-    ]
-    for url in url_variants:
-        try:
-            r = requests.get(url, headers=headers, verify=_verify_param())
-            if r.status_code >= 400:
-                continue
-            return r.json()
-        except requests.exceptions.RequestException:
-            continue
-    return None
+    return (yield from _first_ok_variant("fetch_linearized_entity", _LINEARIZED_TEMPLATES, headers,
+                                         icd=WHO_ICD_BASE, id=WHO_ID_BASE, lin=linearization, entity=entity_id))
 
 
 def _normalize_search_entity(ent: dict) -> Optional[dict]:
@@ -126,13 +932,14 @@ def _normalize_search_entity(ent: dict) -> Optional[dict]:
     return {'code': code, 'title': title_obj, '@id': ent_id}
 
 
+@_who_lookup("mms_search_by_release", release_search_cache, lambda term, release=None: (term, release or WHO_DEFAULT_RELEASE, 'mms'))
 def mms_search_by_release(term: str, release: Optional[str] = None) -> Optional[dict]:
     """Search MMS for a term at a specific release and return first normalized entity with code if available."""
-    token = get_who_api_token()
-    headers = {'Accept': 'application/json', 'API-Version': 'v2', 'Accept-Language': 'en'}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
-    rel = release or "2025-01"
+    rel = release or WHO_DEFAULT_RELEASE
+    local = yield from _mirror_steps('search', term, rel, 'mms')
+    if local is not None:
+        return local
+    headers = yield from _headers_steps()
     urls = [
         f"{WHO_ICD_BASE}/icdapi/release/11/{rel}/mms/search?q={term}",
         f"{WHO_ID_BASE}/icd/release/11/{rel}/mms/search?q={term}",
@@ -141,7 +948,7 @@ def mms_search_by_release(term: str, release: Optional[str] = None) -> Optional[
     ]
     for url in urls:
         try:
-            r = requests.get(url, headers=headers, verify=_verify_param())
+            r = yield _get(url, headers=headers)
             if r.status_code >= 400:
                 continue
             data = r.json()
@@ -157,7 +964,7 @@ def mms_search_by_release(term: str, release: Optional[str] = None) -> Optional[
             ent_id_url = ents[0].get('id') if ents else None
             if ent_id_url:
                 try:
-                    rr = requests.get(ent_id_url, headers=headers, verify=_verify_param())
+                    rr = yield _get(ent_id_url, headers=headers)
                     if rr.status_code < 400:
                         d = rr.json()
                         code = d.get('code')
@@ -171,13 +978,14 @@ def mms_search_by_release(term: str, release: Optional[str] = None) -> Optional[
     return None
 
 
+@_who_lookup("tm2_search_by_release", release_search_cache, lambda term, release=None: (term, release or WHO_DEFAULT_RELEASE, 'tm2'))
 def tm2_search_by_release(term: str, release: Optional[str] = None) -> Optional[dict]:
     """Search TM2 for a term at a specific release and return first normalized entity with code if available."""
-    token = get_who_api_token()
-    headers = {'Accept': 'application/json', 'API-Version': 'v2', 'Accept-Language': 'en'}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
-    rel = release or "2025-01"
+    rel = release or WHO_DEFAULT_RELEASE
+    local = yield from _mirror_steps('search', term, rel, 'tm2')
+    if local is not None:
+        return local
+    headers = yield from _headers_steps()
     urls = [
         f"{WHO_ICD_BASE}/icdapi/release/11/{rel}/tm2/search?q={term}",
         f"{WHO_ID_BASE}/icd/release/11/{rel}/tm2/search?q={term}",
@@ -185,7 +993,7 @@ def tm2_search_by_release(term: str, release: Optional[str] = None) -> Optional[
     ]
     for url in urls:
         try:
-            r = requests.get(url, headers=headers, verify=_verify_param())
+            r = yield _get(url, headers=headers)
             if r.status_code >= 400:
                 continue
             data = r.json()
@@ -199,7 +1007,7 @@ def tm2_search_by_release(term: str, release: Optional[str] = None) -> Optional[
             ent_id_url = ents[0].get('id') if ents else None
             if ent_id_url:
                 try:
-                    rr = requests.get(ent_id_url, headers=headers, verify=_verify_param())
+                    rr = yield _get(ent_id_url, headers=headers)
                     if rr.status_code < 400:
                         d = rr.json()
                         code = d.get('code')
@@ -212,7 +1020,7 @@ def tm2_search_by_release(term: str, release: Optional[str] = None) -> Optional[
             continue
     return None
 
-@cached(entity_cache)
+@_who_lookup("search_and_fetch_entity", entity_cache, lambda icd_name: (icd_name, None, 'mms'))
 def search_and_fetch_entity(icd_name: str):
     """
     Searches for an ICD-11 entity and fetches its details.
@@ -220,10 +1028,7 @@ def search_and_fetch_entity(icd_name: str):
     2) Fallback to icd.who.int mms-sl search
     Returns the full entity details JSON or None.
     """
-    token = get_who_api_token()
-    headers = {'Accept': 'application/json', 'API-Version': 'v2', 'Accept-Language': 'en'}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
+    headers = yield from _headers_steps()
 
     search_urls = [
         f"{WHO_ID_BASE}/icd/entity/search?q={icd_name}",
@@ -232,7 +1037,7 @@ def search_and_fetch_entity(icd_name: str):
 
     for url in search_urls:
         try:
-            r = requests.get(url, headers=headers, verify=_verify_param())
+            r = yield _get(url, headers=headers)
             r.raise_for_status()
             data = r.json()
             entities = data.get('destinationEntities', [])
@@ -244,16 +1049,16 @@ def search_and_fetch_entity(icd_name: str):
             # Try MMS linearized form first to get an MMS code if available
             ent_id = _entity_id_from_uri(entity_uri)
             if ent_id:
-                mms_data = fetch_linearized_entity(ent_id, 'mms')
+                mms_data = yield from fetch_linearized_entity.lookup.cached_steps(ent_id, 'mms')
                 if mms_data and (mms_data.get('code') or mms_data.get('title')):
                     return mms_data
             # Fallback to foundation entity details
-            entity = get_entity_details(entity_uri)
+            entity = yield from _entity_details_steps(entity_uri)
             if entity and (entity.get('code') or entity.get('title')):
                 return entity
             # As a last resort, try the MMS search endpoint that often includes codes in results
             try:
-                rr = requests.get(f"{WHO_ICD_BASE}/icdapi/release/11/mms-sl/search?q={icd_name}", headers=headers, verify=_verify_param())
+                rr = yield _get(f"{WHO_ICD_BASE}/icdapi/release/11/mms-sl/search?q={icd_name}", headers=headers)
                 rr.raise_for_status()
                 d2 = rr.json()
                 ents2 = d2.get('destinationEntities', [])
@@ -273,7 +1078,7 @@ def search_and_fetch_entity(icd_name: str):
     return None
 
 
-@cached(tm2_entity_cache)
+@_who_lookup("search_and_fetch_tm2", tm2_entity_cache, lambda term: (term, None, 'tm2'))
 def search_and_fetch_tm2(term: str):
     """
     Best-effort TM2 fetch:
@@ -281,14 +1086,11 @@ def search_and_fetch_tm2(term: str):
     2) Fetch TM2 linearized entity by id (to get codes like SM31)
     3) Fallbacks are silently ignored if not available
     """
-    token = get_who_api_token()
-    headers = {'Accept': 'application/json', 'API-Version': 'v2', 'Accept-Language': 'en'}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
+    headers = yield from _headers_steps()
 
     # Step 1: Foundation search
     try:
-        r = requests.get(f"{WHO_ID_BASE}/icd/entity/search?q={term}", headers=headers, verify=_verify_param())
+        r = yield _get(f"{WHO_ID_BASE}/icd/entity/search?q={term}", headers=headers)
         r.raise_for_status()
         data = r.json()
         entities = data.get('destinationEntities', [])
@@ -299,7 +1101,7 @@ def search_and_fetch_tm2(term: str):
                 f"{WHO_ICD_BASE}/icdapi/release/11/tm2/search?q={term}",
             ]:
                 try:
-                    rr = requests.get(url, headers=headers, verify=_verify_param())
+                    rr = yield _get(url, headers=headers)
                     rr.raise_for_status()
                     d2 = rr.json()
                     ents2 = d2.get('destinationEntities', [])
@@ -309,7 +1111,7 @@ def search_and_fetch_tm2(term: str):
                     ent_id2 = _entity_id_from_uri(ent_uri2 or '')
                     if not ent_id2:
                         continue
-                    tm2_data2 = fetch_linearized_entity(ent_id2, 'tm2')
+                    tm2_data2 = yield from fetch_linearized_entity.lookup.cached_steps(ent_id2, 'tm2')
                     if tm2_data2 and (tm2_data2.get('code') or tm2_data2.get('title')):
                         return tm2_data2
                 except requests.exceptions.RequestException:
@@ -320,7 +1122,7 @@ def search_and_fetch_tm2(term: str):
         if not ent_id:
             return None
         # Step 2: Fetch TM2 linearized
-        tm2_data = fetch_linearized_entity(ent_id, 'tm2')
+        tm2_data = yield from fetch_linearized_entity.lookup.cached_steps(ent_id, 'tm2')
         if tm2_data and (tm2_data.get('code') or tm2_data.get('title')):
             return tm2_data
         # If linearized fetch didn't work, try tm2 search endpoints for a code
@@ -329,7 +1131,7 @@ def search_and_fetch_tm2(term: str):
             f"{WHO_ICD_BASE}/icdapi/release/11/tm2/search?q={term}",
         ]:
             try:
-                rr = requests.get(url, headers=headers, verify=_verify_param())
+                rr = yield _get(url, headers=headers)
                 rr.raise_for_status()
                 d2 = rr.json()
                 ents2 = d2.get('destinationEntities', [])
@@ -357,49 +1159,28 @@ def search_tm2_by_terms(terms: list[str]):
     return None
 
 
+@_who_lookup("fetch_linearized_entity_by_release", linearized_entity_cache,
+             lambda entity_id, linearization, release=None: (entity_id, release or WHO_DEFAULT_RELEASE, linearization))
 def fetch_linearized_entity_by_release(entity_id: str, linearization: str, release: Optional[str] = None):
     """
     Fetch a linearized entity (MMS/TM2) for a specific release by foundation entity id.
     Example: https://icd.who.int/icdapi/release/11/2025-01/mms/entity/{id}
     """
-    token = get_who_api_token()
-    headers = {'Accept': 'application/json', 'API-Version': 'v2', 'Accept-Language': 'en'}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
-    rel = release or "2025-01"
-    url_variants = [
-        # icdapi entity/entities variants
-        f"{WHO_ICD_BASE}/icdapi/release/11/{rel}/{linearization}/entity/{entity_id}",
-        f"{WHO_ICD_BASE}/icdapi/release/11/{rel}/{linearization}/entities/{entity_id}",
-        # Short-path variants (no 'entity') often used by ECT 'uri'
-        f"{WHO_ICD_BASE}/icdapi/release/11/{rel}/{linearization}/{entity_id}",
-        f"{WHO_ICD_BASE}/icdapi/release/11/{rel}/{linearization}/{entity_id}/unspecified",
-        # id.who.int aliases
-        f"{WHO_ID_BASE}/icd/release/11/{rel}/{linearization}/entity/{entity_id}",
-        f"{WHO_ID_BASE}/icd/release/11/{rel}/{linearization}/entities/{entity_id}",
-        f"{WHO_ID_BASE}/icd/release/11/{rel}/{linearization}/{entity_id}",
-        f"{WHO_ID_BASE}/icd/release/11/{rel}/{linearization}/{entity_id}/unspecified",
-    ]
-    for url in url_variants:
-        try:
-            r = requests.get(url, headers=headers, verify=_verify_param())
-            if r.status_code >= 400:
-                continue
-            return r.json()
-        except requests.exceptions.RequestException:
-            continue
-    return None
+    rel = release or WHO_DEFAULT_RELEASE
+    local = yield from _mirror_steps('entity', entity_id, rel, linearization)
+    if local is not None:
+        return local
+    headers = yield from _headers_steps()
+    return (yield from _first_ok_variant("fetch_linearized_entity_by_release", _LINEARIZED_RELEASE_TEMPLATES, headers,
+                                         icd=WHO_ICD_BASE, id=WHO_ID_BASE, lin=linearization, entity=entity_id, rel=rel))
 
 
-@cached(foundation_search_cache)
+@_who_lookup("search_foundation_uri", foundation_search_cache, lambda term: (term, None, 'foundation'))
 def search_foundation_uri(term: str) -> Optional[str]:
     """Return the first foundation entity URI for a search term (id base, optional auth)."""
-    token = get_who_api_token()
-    headers = {'Accept': 'application/json', 'API-Version': 'v2', 'Accept-Language': 'en'}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
+    headers = yield from _headers_steps()
     try:
-        r = requests.get(f"{WHO_ID_BASE}/icd/entity/search?q={term}", headers=headers, verify=_verify_param())
+        r = yield _get(f"{WHO_ID_BASE}/icd/entity/search?q={term}", headers=headers)
         r.raise_for_status()
         data = r.json()
         entities = data.get('destinationEntities', [])
@@ -407,4 +1188,4 @@ def search_foundation_uri(term: str) -> Optional[str]:
             return None
         return entities[0].get('id')
     except requests.exceptions.RequestException:
-        return None
\ No newline at end of file
+        return None
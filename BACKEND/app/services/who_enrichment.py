@@ -0,0 +1,317 @@
+"""Bulk WHO enrichment of icd11_codes (MMS code/definition and TM2) as a resumable background job.
+
+start() creates a job over every ICD row missing its WHO code, definition or TM2 data
+that has not been attempted for the release yet (force=True retries those as well). A
+worker thread walks the rows in id order, WHO_ENRICHMENT_BATCH_SIZE at a time: a chunk is
+resolved through the blocking WHO client in the BACKGROUND lane by a pool of
+WHO_ENRICHMENT_CONCURRENCY threads, written back with one executemany UPDATE, and the
+job row (who_enrichment_jobs) is checkpointed in the same commit. resume() restarts a job
+a restart interrupted from its last checkpoint. The "who-enrichment" LeaderLock keeps a
+job to one worker process even when every worker tries to resume it. Each chunk drops the
+cached translations of the rows it enriched; the translation index, which every worker
+rebuilds when it changes, is rebuilt once when the job ends.
+
+Rows WHO has nothing for are marked who_enrich_failed, as translate does. A row that
+misses while a WHO circuit is open is left alone and counted as deferred; while every
+WHO circuit is open the job waits instead of burning through rows.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models import ICD11Code, Mapping, TraditionalTerm, WhoEnrichmentJob
+from app.services import who_api_client, translation_index, leader_lock
+from app.services.cache_service import translation_cache
+
+RUNNING, COMPLETED, ERROR = "running", "completed", "error"
+
+_FIELDS = ("icd_code", "description", "icd_uri", "tm2_code", "tm2_title", "tm2_definition", "tm2_uri")
+
+_worker: Optional[threading.Thread] = None
+_lock = threading.Lock()
+_job_lock = leader_lock.LeaderLock("who-enrichment")
+
+
+class EnrichmentJobRunning(RuntimeError):
+    def __init__(self, job: Optional[dict]):
+        super().__init__(f"WHO enrichment job {job['id']} is already running" if job
+                         else "A WHO enrichment job is already running in another process")
+        self.job = job
+
+
+def _val(x) -> Optional[str]:
+    if isinstance(x, dict):
+        x = x.get("@value") or x.get("value")
+    return x or None
+
+
+def _first(*lookups):
+    """Result of the first lookup that returns something; failures count as misses."""
+    for lookup in lookups:
+        try:
+            res = lookup()
+        except Exception:
+            continue
+        if res:
+            return res
+    return None
+
+
+def _resolve_mms(icd_name: str, release: str) -> Optional[dict]:
+    def foundation_linearized():
+        ent_uri = who_api_client.search_foundation_uri(icd_name)
+        if not ent_uri:
+            return None
+        return who_api_client.fetch_linearized_entity_by_release(ent_uri.rstrip('/').split('/')[-1], 'mms', release)
+
+    data = _first(
+        lambda: who_api_client.mms_search_by_release(icd_name, release),
+        foundation_linearized,
+        lambda: who_api_client.search_and_fetch_entity(icd_name),
+    )
+    ent_id = data and (data.get("@id") or data.get("id"))
+    if data and not _val(data.get("definition")) and ent_id:
+        # Search hits rarely carry the definition; the entity itself does
+        full_ent = _first(lambda: who_api_client.get_entity_details(ent_id))
+        if full_ent:
+            data = {**data, "title": full_ent.get("title") or data.get("title"),
+                    "definition": full_ent.get("definition"), "code": full_ent.get("code") or data.get("code")}
+    return data
+
+
+def _resolve_tm2(icd_name: str, alt_terms: List[str], release: str) -> Optional[dict]:
+    return _first(
+        lambda: who_api_client.search_and_fetch_tm2(icd_name),
+        lambda: who_api_client.tm2_search_by_release(icd_name, release),
+        lambda: who_api_client.search_tm2_by_terms(alt_terms) if alt_terms else None,
+    )
+
+
+def _enrich_row(row, alt_terms: List[str], release: str) -> Optional[dict]:
+    """UPDATE parameters for one ICD row, or None when the miss is down to a WHO outage."""
+    with who_api_client.priority(who_api_client.BACKGROUND):
+        mms = _resolve_mms(row.icd_name, release)
+        tm2 = _resolve_tm2(row.icd_name, alt_terms, release)
+    if not (mms and tm2) and who_api_client.breakers.degraded():
+        return None
+    values = {"id": row.id, **{f: getattr(row, f) for f in _FIELDS}}
+    if mms:
+        values["icd_code"] = mms.get("code") or values["icd_code"]
+        values["description"] = _val(mms.get("definition")) or values["description"]
+        values["icd_uri"] = mms.get("@id") or mms.get("id") or values["icd_uri"]
+    if tm2:
+        values["tm2_code"] = tm2.get("code") or values["tm2_code"]
+        values["tm2_title"] = _val(tm2.get("title")) or values["tm2_title"]
+        values["tm2_definition"] = _val(tm2.get("definition")) or values["tm2_definition"]
+        values["tm2_uri"] = tm2.get("@id") or tm2.get("id") or values["tm2_uri"]
+    values.update(who_enriched_at=datetime.now(timezone.utc), who_release=release,
+                  who_enrich_failed=not (mms or tm2))
+    return values
+
+
+def _pending_filter(release: str, force: bool):
+    missing = or_(ICD11Code.icd_code.is_(None), ICD11Code.description.is_(None), ICD11Code.description == '',
+                  ICD11Code.tm2_code.is_(None))
+    if force:
+        return missing
+    attempted = (ICD11Code.who_enriched_at.is_not(None)) & (ICD11Code.who_release == release)
+    return missing & ~attempted
+
+
+def _alt_terms(db: Session, icd_ids: List[int]) -> Dict[int, List[str]]:
+    """Mapped traditional term names per ICD (primary mappings first), capped to 10 variants."""
+    terms: Dict[int, List[str]] = {}
+    rows = db.execute(
+        select(Mapping.icd11_code_id, TraditionalTerm.term)
+        .join(TraditionalTerm, Mapping.traditional_term_id == TraditionalTerm.id)
+        .where(Mapping.icd11_code_id.in_(icd_ids))
+        .order_by(Mapping.is_primary.desc(), Mapping.id)
+    ).all()
+    for icd_id, term in rows:
+        names = terms.setdefault(icd_id, [])
+        if term and term not in names and len(names) < 10:
+            names.append(term)
+    return terms
+
+
+def _wait_for_who():
+    while who_api_client.breakers.all_open():
+        print("[WHO-ENRICH] Every WHO circuit is open; waiting", flush=True)
+        time.sleep(who_api_client.WHO_BREAKER_OPEN_SECONDS)
+
+
+def _process_chunk(db: Session, job: WhoEnrichmentJob, pool: ThreadPoolExecutor, enriched_names: set) -> bool:
+    """Enrich and checkpoint the next chunk after job.last_icd_id; False once nothing is left.
+
+    The names of rows WHO enriched are added to enriched_names for the rebuild at job end.
+    """
+    rows = db.execute(
+        select(ICD11Code.id, ICD11Code.icd_name, *[getattr(ICD11Code, f) for f in _FIELDS])
+        .where(ICD11Code.id > job.last_icd_id, _pending_filter(job.release, job.force))
+        .order_by(ICD11Code.id)
+        .limit(settings.WHO_ENRICHMENT_BATCH_SIZE)
+    ).all()
+    if not rows:
+        return False
+    _wait_for_who()
+    alt_terms = _alt_terms(db, [r.id for r in rows])
+    results = list(pool.map(lambda r: _enrich_row(r, alt_terms.get(r.id, []), job.release), rows))
+    updates = [v for v in results if v is not None]
+    if updates:
+        db.execute(update(ICD11Code), updates)
+    job.last_icd_id = rows[-1].id
+    job.processed += len(rows)
+    job.enriched += sum(1 for v in updates if not v["who_enrich_failed"])
+    job.not_found += sum(1 for v in updates if v["who_enrich_failed"])
+    job.deferred += len(rows) - len(updates)
+    job.updated_at = datetime.now(timezone.utc)
+    db.commit()
+    # Cached translate answers for these ICDs carry the old (empty) codes; the index is
+    # rebuilt once when the job ends rather than per chunk
+    by_id = {r.id: r.icd_name for r in rows}
+    names = [by_id[v["id"]] for v in updates if not v["who_enrich_failed"]]
+    if names:
+        translation_cache.invalidate_icd(names)
+        enriched_names.update(names)
+    return True
+
+
+def _run(job_id: int):
+    enriched_names: set = set()
+    try:
+        with SessionLocal() as db:
+            job = db.get(WhoEnrichmentJob, job_id)
+            try:
+                with ThreadPoolExecutor(max_workers=job.concurrency, thread_name_prefix="who-enrich") as pool:
+                    while _process_chunk(db, job, pool, enriched_names):
+                        pass
+                job.state = COMPLETED
+                print(f"[WHO-ENRICH] Job {job.id} completed: {job.enriched} enriched, {job.not_found} not found, "
+                      f"{job.deferred} deferred", flush=True)
+            except Exception as e:
+                db.rollback()
+                job = db.get(WhoEnrichmentJob, job_id)
+                job.state = ERROR
+                job.error = str(e)
+                print(f"[WHO-ENRICH] Job {job.id} failed at icd id {job.last_icd_id}: {e}", flush=True)
+            job.finished_at = job.updated_at = datetime.now(timezone.utc)
+            db.commit()
+    finally:
+        # One rebuild for every chunk committed, including those before a failure
+        if enriched_names:
+            translation_index.schedule_rebuild(enriched_names)
+        _job_lock.release()
+
+
+def _spawn(job_id: int):
+    global _worker
+    _worker = threading.Thread(target=_run, args=(job_id,), name=f"who-enrich-{job_id}", daemon=True)
+    _worker.start()
+
+
+def _as_dict(job: WhoEnrichmentJob) -> dict:
+    def ts(v):
+        return v.isoformat() if v else None
+    return {
+        "id": job.id, "state": job.state, "release": job.release, "force": job.force,
+        "concurrency": job.concurrency, "last_icd_id": job.last_icd_id, "total": job.total,
+        "processed": job.processed, "enriched": job.enriched, "not_found": job.not_found,
+        "deferred": job.deferred, "error": job.error, "started_at": ts(job.started_at),
+        "updated_at": ts(job.updated_at), "finished_at": ts(job.finished_at),
+    }
+
+
+def _latest(db: Session, job_id: Optional[int] = None, state: Optional[str] = None) -> Optional[WhoEnrichmentJob]:
+    query = select(WhoEnrichmentJob).order_by(WhoEnrichmentJob.id.desc()).limit(1)
+    if job_id is not None:
+        query = query.where(WhoEnrichmentJob.id == job_id)
+    if state is not None:
+        query = query.where(WhoEnrichmentJob.state == state)
+    return db.execute(query).scalar_one_or_none()
+
+
+def start(release: Optional[str] = None, force: bool = False, concurrency: Optional[int] = None) -> dict:
+    """Start a job (or resume an interrupted one); raises EnrichmentJobRunning if any process runs one."""
+    with _lock:
+        if _job_lock.held() or not _job_lock.acquire():
+            with SessionLocal() as db:
+                running = _latest(db, state=RUNNING)
+                raise EnrichmentJobRunning(_as_dict(running) if running else None)
+        try:
+            job = _open_job(release, force, concurrency)
+        except Exception:
+            _job_lock.release()
+            raise
+        _spawn(job["id"])
+        return job
+
+
+def _open_job(release: Optional[str], force: bool, concurrency: Optional[int]) -> dict:
+    """The interrupted job to resume, else a new one over the rows pending for the release."""
+    with SessionLocal() as db:
+        running = _latest(db, state=RUNNING)
+        if running is None:
+            release = release or who_api_client.WHO_DEFAULT_RELEASE
+            running = WhoEnrichmentJob(
+                state=RUNNING, release=release, force=force,
+                concurrency=max(1, concurrency or settings.WHO_ENRICHMENT_CONCURRENCY),
+                last_icd_id=0, processed=0, enriched=0, not_found=0, deferred=0,
+                total=db.query(ICD11Code).filter(_pending_filter(release, force)).count(),
+            )
+            db.add(running)
+            db.commit()
+            print(f"[WHO-ENRICH] Job {running.id} started: {running.total} ICD rows for release {release}", flush=True)
+        else:
+            print(f"[WHO-ENRICH] Resuming job {running.id} after icd id {running.last_icd_id}", flush=True)
+        return _as_dict(running)
+
+
+def resume() -> Optional[dict]:
+    """Pick up a job a restart interrupted (startup hook); None when there is nothing to resume."""
+    with SessionLocal() as db:
+        if _latest(db, state=RUNNING) is None:
+            return None
+    try:
+        return start()
+    except EnrichmentJobRunning:
+        return None  # another worker owns it
+
+
+def status(job_id: Optional[int] = None) -> Optional[dict]:
+    """The job (latest when job_id is None) as stored, or None."""
+    with SessionLocal() as db:
+        job = _latest(db, job_id)
+        return _as_dict(job) if job else None
+
+
+def progress(job_id: Optional[int] = None) -> Optional[dict]:
+    """Completion, throughput and ETA of the job (latest when job_id is None), or None."""
+    job = status(job_id)
+    if job is None:
+        return None
+    started = datetime.fromisoformat(job["started_at"]) if job["started_at"] else None
+    until = datetime.fromisoformat(job["finished_at"]) if job["finished_at"] else datetime.now(timezone.utc)
+    if started is not None and started.tzinfo is None:
+        started = started.replace(tzinfo=timezone.utc)
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    elapsed = (until - started).total_seconds() if started else 0.0
+    rate = job["processed"] / elapsed if elapsed > 0 else None
+    remaining = max(job["total"] - job["processed"], 0)
+    return {
+        "id": job["id"],
+        "state": job["state"],
+        "processed": job["processed"],
+        "total": job["total"],
+        "percent": round(100.0 * job["processed"] / job["total"], 1) if job["total"] else 100.0,
+        "rows_per_minute": round(rate * 60, 1) if rate else None,
+        "eta_seconds": int(remaining / rate) if rate and job["state"] == RUNNING else None,
+        "last_icd_id": job["last_icd_id"],
+    }
@@ -0,0 +1,211 @@
+"""Local mirror of WHO ICD-11 releases (MMS / TM2) for resolution without the live API.
+
+import_release() loads a WHO release file into who_release_entities / who_release_terms:
+  - a linearization tabulation (LinearizationMiniOutput-*.txt / .tsv, tab-separated, the
+    "Foundation URI", "Linearization URI", "Code" and "Title" columns are used), or
+  - an entity dump (.json array or .jsonl), one object per entity with a foundation id or
+    URI ("id" / "@id" / "source" / "foundationUri"), "code", "title", optional "definition",
+    "uri" and "synonyms" / "indexTerms".
+Importing a (release, linearization) again replaces it.
+
+who_api_client asks search() / entity() before calling WHO for a release-pinned lookup
+and only goes to the network on a miss. search() is an exact match on the normalized
+title or synonym; anything fuzzier is left to WHO.
+"""
+import csv
+import json
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.db.models import WhoReleaseEntity, WhoReleaseTerm
+
+BATCH_SIZE = 1000
+# How long the set of mirrored (release, linearization) pairs is trusted before re-reading it
+MAX_AGE_SECONDS = 60
+
+_available: frozenset = frozenset()
+_loaded_at: float = 0.0
+_lock = threading.Lock()
+
+
+def _normalize(term: Optional[str]) -> str:
+    return " ".join((term or "").split()).lower()
+
+
+def _val(x) -> Optional[str]:
+    if isinstance(x, dict):
+        x = x.get("@value") or x.get("value") or _val(x.get("label"))
+    return x.strip() if isinstance(x, str) and x.strip() else None
+
+
+def _entity_id(uri: Optional[str]) -> Optional[str]:
+    return uri.rstrip('/').split('/')[-1] if uri else None
+
+
+def _iter_tabulation(path: str) -> Iterator[dict]:
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        for row in csv.DictReader(fh, delimiter='\t'):
+            foundation_uri = (row.get("Foundation URI") or "").strip()
+            lin_uri = (row.get("Linearization URI") or "").strip()
+            # Chapters/blocks have no foundation entity; residual categories reuse their parent's
+            if not foundation_uri or lin_uri.endswith(("/other", "/unspecified")):
+                continue
+            yield {
+                "entity_id": _entity_id(foundation_uri),
+                "foundation_uri": foundation_uri,
+                "uri": lin_uri or None,
+                "code": (row.get("Code") or "").strip() or None,
+                # Tabulation titles carry their depth as leading "- " markers
+                "title": (row.get("Title") or "").lstrip("- ").strip() or None,
+                "definition": None,
+                "synonyms": [],
+            }
+
+
+def _iter_entity_dump(path: str) -> Iterator[dict]:
+    with open(path, encoding='utf-8') as fh:
+        if path.endswith(".jsonl"):
+            items = (json.loads(line) for line in fh if line.strip())
+        else:
+            items = json.load(fh)
+        for item in items:
+            foundation_uri = item.get("foundationUri") or item.get("source") or item.get("@id") or item.get("id")
+            if not foundation_uri:
+                continue
+            synonyms = item.get("synonyms") or item.get("indexTerms") or item.get("synonym") or []
+            yield {
+                "entity_id": _entity_id(str(foundation_uri)),
+                "foundation_uri": str(foundation_uri) if "/" in str(foundation_uri) else None,
+                "uri": item.get("uri"),
+                "code": item.get("code") or None,
+                "title": _val(item.get("title")),
+                "definition": _val(item.get("definition")),
+                "synonyms": [s for s in (_val(x) for x in synonyms) if s],
+            }
+
+
+def iter_release_file(path: str) -> Iterator[dict]:
+    """Parsed entities of a release file, chosen by extension (.json/.jsonl dump, else tabulation)."""
+    if path.endswith((".json", ".jsonl")):
+        return _iter_entity_dump(path)
+    return _iter_tabulation(path)
+
+
+def import_release(db: Session, path: str, release: str, linearization: str) -> Dict[str, int]:
+    """Replace the mirrored (release, linearization) with the entities in path; returns counts."""
+    linearization = linearization.lower()
+    scope = dict(release=release, linearization=linearization)
+    db.execute(delete(WhoReleaseTerm).filter_by(**scope))
+    db.execute(delete(WhoReleaseEntity).filter_by(**scope))
+    seen: set = set()
+    entities: list = []
+    terms: list = []
+    counts = {"entities": 0, "terms": 0}
+
+    def flush():
+        if entities:
+            db.execute(insert(WhoReleaseEntity), entities)
+        if terms:
+            db.execute(insert(WhoReleaseTerm), terms)
+        counts["entities"] += len(entities)
+        counts["terms"] += len(terms)
+        entities.clear()
+        terms.clear()
+
+    for ent in iter_release_file(path):
+        if not ent["entity_id"] or ent["entity_id"] in seen:
+            continue
+        seen.add(ent["entity_id"])
+        synonyms = ent.pop("synonyms")
+        entities.append({**scope, **ent})
+        for term_norm in {_normalize(t)[:255] for t in [ent["title"], *synonyms] if t}:
+            terms.append({**scope, "entity_id": ent["entity_id"], "term_norm": term_norm})
+        if len(entities) >= BATCH_SIZE:
+            flush()
+    flush()
+    db.commit()
+    refresh(db)
+    return counts
+
+
+def refresh(db: Optional[Session] = None) -> frozenset:
+    """Re-read which (release, linearization) pairs are mirrored; call after an import."""
+    global _available, _loaded_at
+    with _lock:
+        try:
+            if db is None:
+                with SessionLocal() as own:
+                    rows = own.execute(select(WhoReleaseEntity.release, WhoReleaseEntity.linearization).distinct()).all()
+            else:
+                rows = db.execute(select(WhoReleaseEntity.release, WhoReleaseEntity.linearization).distinct()).all()
+            _available = frozenset((r.release, r.linearization) for r in rows)
+        except Exception as e:
+            # Mirror tables missing (not migrated yet): behave as an empty mirror
+            print(f"[WHO-MIRROR] Could not read mirrored releases: {e}", flush=True)
+            _available = frozenset()
+        _loaded_at = time.monotonic()
+        return _available
+
+
+def has(release: str, linearization: str) -> bool:
+    available = _available
+    if not _loaded_at or time.monotonic() - _loaded_at >= MAX_AGE_SECONDS:
+        available = refresh()
+    return (release, linearization) in available
+
+
+def _as_who_entity(ent: WhoReleaseEntity) -> dict:
+    """Shape a mirrored row like the WHO API's linearized entity JSON."""
+    data = {
+        "@id": ent.uri or ent.foundation_uri,
+        "code": ent.code,
+        "title": {"@language": "en", "@value": ent.title} if ent.title else None,
+        "source": ent.foundation_uri,
+    }
+    if ent.definition:
+        data["definition"] = {"@language": "en", "@value": ent.definition}
+    return data
+
+
+def _first(query) -> Optional[dict]:
+    try:
+        with SessionLocal() as db:
+            ent = db.execute(query.limit(1)).scalar_one_or_none()
+            return _as_who_entity(ent) if ent else None
+    except Exception as e:
+        # A mirror read failure must not fail the lookup; the caller falls back to WHO
+        print(f"[WHO-MIRROR] Local lookup failed: {e}", flush=True)
+        return None
+
+
+def search(term: str, release: str, linearization: str) -> Optional[dict]:
+    """Mirrored entity whose title or synonym equals term (coded entities first), or None."""
+    if not has(release, linearization):
+        return None
+    return _first(
+        select(WhoReleaseEntity)
+        .join(WhoReleaseTerm, (WhoReleaseTerm.release == WhoReleaseEntity.release)
+              & (WhoReleaseTerm.linearization == WhoReleaseEntity.linearization)
+              & (WhoReleaseTerm.entity_id == WhoReleaseEntity.entity_id))
+        .where(WhoReleaseTerm.release == release, WhoReleaseTerm.linearization == linearization,
+               WhoReleaseTerm.term_norm == _normalize(term)[:255])
+        .order_by(WhoReleaseEntity.code.is_(None), WhoReleaseEntity.id)
+    )
+
+
+def entity(entity_id: str, release: str, linearization: str) -> Optional[dict]:
+    """Mirrored entity by foundation entity id, or None."""
+    if not has(release, linearization):
+        return None
+    return _first(select(WhoReleaseEntity).filter_by(release=release, linearization=linearization, entity_id=str(entity_id)))
+
+
+def stats() -> Dict[str, list]:
+    """Mirrored releases as 'release/linearization' strings."""
+    return {"releases": sorted(f"{rel}/{lin}" for rel, lin in _available)}
+
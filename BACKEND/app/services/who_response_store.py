@@ -0,0 +1,133 @@
+"""Durable store of WHO API GET responses, shared by the sync and async WHO clients.
+
+The lookup caches in who_api_client are the in-memory L1; this SQLite file is the L2
+underneath them, so a restart or deploy comes up warm: a lookup that misses L1 replays
+its WHO requests and they are answered from disk instead of the network.
+
+Entries are keyed by normalized URL (the search term and release are part of it). An
+entry is served as-is for WHO_RESPONSE_TTL_SECONDS; after that it is revalidated with
+If-None-Match / If-Modified-Since when WHO sent an ETag / Last-Modified (a 304 renews it
+without a body), otherwise refetched. Entries unused for WHO_RESPONSE_RETAIN_SECONDS are
+dropped, and the least recently used go first beyond WHO_RESPONSE_MAX_ENTRIES. Only 200
+JSON responses are stored; misses stay with who_api_client's negative cache.
+
+Set WHO_RESPONSE_STORE_PATH to an empty string to disable the store.
+"""
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from app.services import cache_backends
+
+WHO_RESPONSE_STORE_PATH = os.getenv("WHO_RESPONSE_STORE_PATH", os.path.join("data", "cache", "who_responses.sqlite3"))
+WHO_RESPONSE_TTL_SECONDS = int(os.getenv("WHO_RESPONSE_TTL_SECONDS", "86400"))
+WHO_RESPONSE_RETAIN_SECONDS = int(os.getenv("WHO_RESPONSE_RETAIN_SECONDS", str(30 * 86400)))
+WHO_RESPONSE_MAX_ENTRIES = int(os.getenv("WHO_RESPONSE_MAX_ENTRIES", "50000"))
+
+
+def normalize_url(url: str) -> str:
+    """Case-insensitive scheme/host, and search terms (q=) with collapsed whitespace and case."""
+    parts = urlsplit(url)
+    query = [(k, " ".join(v.split()).lower() if k == "q" else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+class StoredResponse:
+    """A stored 200 response, answering the same calls the lookup steps make on a live one."""
+    status_code = 200
+
+    def __init__(self, entry: dict):
+        self._entry = entry
+        self.headers = {k: v for k, v in (("ETag", entry.get("etag")), ("Last-Modified", entry.get("last_modified"))) if v}
+
+    def json(self):
+        return self._entry["body"]
+
+    def raise_for_status(self):
+        return None
+
+
+class ResponseStore:
+    NS = "who:responses"
+
+    def __init__(self, store: cache_backends.SqliteStore, ttl_seconds: int = WHO_RESPONSE_TTL_SECONDS,
+                 retain_seconds: int = WHO_RESPONSE_RETAIN_SECONDS, max_entries: int = WHO_RESPONSE_MAX_ENTRIES):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.retain_seconds = retain_seconds
+        self.max_entries = max_entries
+        self.counters = cache_backends.Counters(self.NS, ("hits", "misses", "revalidated", "refreshed", "stores"))
+
+    def lookup(self, url: str):
+        """(fresh response or None, conditional headers for the request, stored entry or None)."""
+        found, entry = self.store.get(self.NS, normalize_url(url))
+        if not found:
+            self.counters.incr("misses")
+            return None, {}, None
+        if entry["fresh_until"] > time.time():
+            self.counters.incr("hits")
+            return StoredResponse(entry), {}, entry
+        conditional = {}
+        if entry.get("etag"):
+            conditional["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            conditional["If-Modified-Since"] = entry["last_modified"]
+        return None, conditional, entry
+
+    def update(self, url: str, entry: Optional[dict], resp):
+        """Record WHO's answer to a lookup() miss; returns the response the caller should use."""
+        if resp.status_code == 304 and entry is not None:
+            entry = {**entry, "fresh_until": time.time() + self.ttl_seconds}
+            self._put(url, entry)
+            self.counters.incr("revalidated")
+            return StoredResponse(entry)
+        if resp.status_code != 200 or "no-store" in (resp.headers.get("Cache-Control") or ""):
+            return resp
+        try:
+            body = resp.json()
+        except (ValueError, requests.exceptions.RequestException):
+            return resp
+        self._put(url, {
+            "body": body,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fresh_until": time.time() + self.ttl_seconds,
+        })
+        self.counters.incr("refreshed" if entry is not None else "stores")
+        return resp
+
+    def _put(self, url: str, entry: dict):
+        self.store.set(self.NS, normalize_url(url), entry, self.retain_seconds, max_entries=self.max_entries)
+
+    def clear(self):
+        self.store.clear(self.NS)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters.snapshot(),
+            "path": self.store.path,
+            "entries": self.store.count(self.NS),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "retain_seconds": self.retain_seconds,
+        }
+
+
+_store: Optional[ResponseStore] = None
+_store_lock = threading.Lock()
+
+
+def current() -> Optional[ResponseStore]:
+    """The process's response store (opened on first use), or None when disabled."""
+    global _store
+    if not WHO_RESPONSE_STORE_PATH:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResponseStore(cache_backends.SqliteStore(WHO_RESPONSE_STORE_PATH))
+    return _store
@@ -1,15 +1,37 @@
 """Background WHO sync scheduler.
-Simplified: periodically re-fetch WHO data for known ICD names and update definitions/codes.
+Periodically re-fetch WHO data for known ICD names and update definitions/codes.
 If changes exceed threshold, creates a new ConceptMapRelease and rebuilds elements.
+
+Each cycle is incremental: only rows not checked for WHO_SYNC_STALE_HOURS are visited,
+stalest first and at most WHO_SYNC_MAX_ROWS_PER_CYCLE of them, in chunks of
+WHO_SYNC_BATCH_SIZE looked up WHO_SYNC_CONCURRENCY at a time. Every chunk is written with
+one bulk UPDATE in its own short session and commit. A row records when it was checked
+(who_synced_at) and a hash of the WHO payload (who_sync_hash), so an unchanged answer
+costs no write beyond the timestamp. Rows whose lookup failed stay stale for next cycle.
+
+Every worker process starts the scheduler thread, but only the one holding the
+"who-sync" LeaderLock runs cycles; the others retry the lock every LEADER_RETRY_SECONDS
+and take over if the leader goes away. The status lives in who_sync_status so any
+worker answers /admin/who-sync/status with the leader's view.
+
+enqueue_job() is the on-demand full refresh behind /admin/who-sync/trigger: a job
+(who_sync_jobs) that walks every ICD row in id order, JOB_PAGE_SIZE rows per page, and
+commits its continuation cursor and counts after each page. It runs on a background
+thread in whichever worker holds the "who-sync-job" LeaderLock; resume_job() continues
+an interrupted one from its cursor at startup. The scheduler leader takes the same lock
+for each cycle, so a cycle and a job never run at once (in any worker) and cannot both
+cut a release.
 """
-from datetime import datetime, timezone
-import threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import hashlib, json, threading, time
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, update, or_
 from app.db.session import SessionLocal
 from app.db import models
 from app.core.config import settings
-from app.services import who_api_client
+from app.services import who_api_client, translation_index, release_registry, leader_lock
 
 _running_flag = False
 _last_status = {
@@ -17,9 +39,17 @@ _last_status = {
     "changes": 0,
     "created_release": None,
     "next_run_eta_minutes": None,
+    "last_cycle": None,
 }
+_recent_cycles: deque = deque(maxlen=10)
+_leader = leader_lock.LeaderLock("who-sync")
+# A second handle on the job lock (see enqueue_job), held by the leader for each cycle
+_cycle_guard = leader_lock.LeaderLock("who-sync-job")
 
 THRESHOLD_NEW_OR_CHANGED = 10
+JOB_PAGE_SIZE = 200  # ICD rows per page of an on-demand sync job
+LEADER_RETRY_SECONDS = 60  # how often a standby worker tries to become the leader
+HEARTBEAT_SECONDS = 60  # how often the leader re-checks its lock and records a heartbeat
 
 
 def _rebuild_release(db: Session, version: str):
@@ -41,61 +71,204 @@ def _rebuild_release(db: Session, version: str):
             is_primary=m.is_primary
         ))
     db.commit()
+    release_registry.notify(db)
+    translation_index.bump_version()  # the other workers rebuild on their next check
+    translation_index.rebuild(db)
     return rel.version
 
 
+_FAILED = object()
+
+
+def _val(x):
+    if isinstance(x, dict):
+        return x.get('@value')
+    return x
+
+
+def _payload_hash(code, title, definition) -> str:
+    """Content hash of the WHO fields the sync tracks."""
+    return hashlib.sha256(json.dumps([code, title, definition], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _check(icd_name: str):
+    """WHO's current entity for an ICD name, None when WHO has none, _FAILED when unknown."""
+    try:
+        with who_api_client.priority(who_api_client.BACKGROUND):
+            norm = who_api_client.search_and_fetch_entity(icd_name)
+    except Exception:
+        return _FAILED
+    if not norm and who_api_client.breakers.degraded():
+        return _FAILED  # a miss during a WHO outage says nothing about the row
+    return norm
+
+
+def _stale_filter(stale_before: datetime):
+    return or_(models.ICD11Code.who_synced_at.is_(None), models.ICD11Code.who_synced_at < stale_before)
+
+
+def _sync_chunk(rows, pool: ThreadPoolExecutor, totals: dict, failed_ids: set) -> list:
+    """Look up one chunk concurrently and write it back; returns the ICD names whose data changed.
+
+    Rows whose lookup failed are left untouched and added to failed_ids.
+    """
+    now = datetime.now(timezone.utc)
+    updates, changed_names = [], []
+    for row, norm in zip(rows, pool.map(lambda r: _check(r.icd_name), rows)):
+        if norm is _FAILED:
+            totals["failed"] += 1
+            failed_ids.add(row.id)
+            continue
+        values = {"id": row.id, "icd_code": row.icd_code, "description": row.description,
+                  "who_sync_hash": row.who_sync_hash, "who_synced_at": now}
+        updates.append(values)
+        if not norm:
+            totals["not_found"] += 1
+            continue
+        definition, code_val = _val(norm.get('definition')), norm.get('code')
+        digest = _payload_hash(code_val, _val(norm.get('title')), definition)
+        if digest == row.who_sync_hash:
+            totals["unchanged"] += 1
+            continue
+        values["who_sync_hash"] = digest
+        dirty = False
+        if definition and definition != row.description:
+            values["description"] = definition
+            dirty = True
+        if code_val and code_val != row.icd_code:
+            values["icd_code"] = code_val
+            dirty = True
+        if dirty:
+            totals["changes"] += 1
+            changed_names.append(row.icd_name)
+        else:
+            totals["unchanged"] += 1
+    if updates:
+        with SessionLocal() as db:
+            db.execute(update(models.ICD11Code), updates)
+            db.commit()
+    totals["checked"] += len(rows)
+    totals["chunks"] += 1
+    return changed_names
+
+
+def _release_if_changed(changes: int):
+    """Cut a new ConceptMap release when a pass changed enough rows; returns its version or None."""
+    if changes < THRESHOLD_NEW_OR_CHANGED:
+        return None
+    with SessionLocal() as db:
+        version = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M')
+        return _rebuild_release(db, version)
+
+
+def _run_cycle(max_rows: int | None = None) -> dict:
+    """One incremental pass over stale rows; returns the cycle's counts and throughput."""
+    started = time.time()
+    max_rows = settings.WHO_SYNC_MAX_ROWS_PER_CYCLE if max_rows is None else max_rows
+    stale_before = datetime.now(timezone.utc) - timedelta(hours=settings.WHO_SYNC_STALE_HOURS)
+    totals = {"checked": 0, "changes": 0, "unchanged": 0, "not_found": 0, "failed": 0, "chunks": 0}
+    failed_ids: set = set()
+    icd = models.ICD11Code
+    with ThreadPoolExecutor(max_workers=max(1, settings.WHO_SYNC_CONCURRENCY), thread_name_prefix="who-sync") as pool:
+        while totals["checked"] < max_rows:
+            with SessionLocal() as db:
+                query = (select(icd.id, icd.icd_name, icd.icd_code, icd.description, icd.who_sync_hash)
+                         .where(_stale_filter(stale_before))
+                         .order_by(icd.who_synced_at.is_(None).desc(), icd.who_synced_at, icd.id)
+                         .limit(min(settings.WHO_SYNC_BATCH_SIZE, max_rows - totals["checked"])))
+                if failed_ids:
+                    query = query.where(icd.id.not_in(failed_ids))
+                rows = db.execute(query).all()
+            if not rows:
+                break
+            changed_names = _sync_chunk(rows, pool, totals, failed_ids)
+            if changed_names:
+                translation_index.schedule_rebuild(changed_names)
+    created_release = _release_if_changed(totals["changes"])
+    with SessionLocal() as db:
+        stale_remaining = db.query(icd).filter(_stale_filter(stale_before)).count()
+    duration = time.time() - started
+    cycle = {
+        **totals,
+        "created_release": created_release,
+        "started_at": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+        "duration_seconds": round(duration, 2),
+        "rows_per_second": round(totals["checked"] / duration, 2) if duration > 0 else None,
+        "stale_remaining": stale_remaining,
+    }
+    _recent_cycles.append(cycle)
+    _save_status(cycle=cycle)
+    return cycle
+
+
+def _save_status(cycle: dict | None = None, **fields):
+    """Upsert fields (and a finished cycle) into the persisted status row.
+
+    Best effort: status() falls back to this process's memory when the row is unreadable.
+    """
+    try:
+        with SessionLocal() as db:
+            row = db.get(models.WhoSyncStatus, 1)
+            if row is None:
+                row = models.WhoSyncStatus(id=1, changes=0)
+                db.add(row)
+            for key, value in fields.items():
+                setattr(row, key, value)
+            if cycle is not None:
+                # Any worker's manual trigger lands in the same history as the leader's cycles
+                recent = json.loads(row.recent_cycles) if row.recent_cycles else []
+                row.recent_cycles = json.dumps((recent + [cycle])[-_recent_cycles.maxlen:])
+                row.last_cycle = json.dumps(cycle)
+            db.commit()
+    except Exception as e:
+        print(f"[WHO-SYNC] Could not persist sync status: {e}", flush=True)
+
+
 def _sync_cycle():
     global _running_flag, _last_status
     interval = max(settings.WHO_SYNC_INTERVAL_MINUTES, 15)
+    leading = False
     while _running_flag:
+        if not (_leader.held() or _leader.acquire()):
+            if leading:
+                print("[WHO-SYNC] Lost the scheduler leader lock; standing by", flush=True)
+            leading = False
+            time.sleep(LEADER_RETRY_SECONDS)
+            continue
+        if not leading:
+            leading = True
+            now = datetime.now(timezone.utc)
+            _save_status(leader=leader_lock.identity(), leader_since=now, heartbeat_at=now)
+            print(f"[WHO-SYNC] {leader_lock.identity()} is the scheduler leader", flush=True)
         start = time.time()
-        changes = 0
-        created_release = None
-        try:
-            with SessionLocal() as db:
-                icd_rows = db.query(models.ICD11Code).all()
-                for icd in icd_rows:
-                    try:
-                        norm = who_api_client.search_and_fetch_entity(icd.icd_name)
-                        if not norm:
-                            continue
-                        title = norm.get('title')
-                        definition = norm.get('definition')
-                        if isinstance(title, dict):
-                            title = title.get('@value')
-                        if isinstance(definition, dict):
-                            definition = definition.get('@value')
-                        dirty = False
-                        if definition and definition != icd.description:
-                            icd.description = definition
-                            dirty = True
-                        code_val = norm.get('code')
-                        if code_val and code_val != icd.icd_code:
-                            icd.icd_code = code_val
-                            dirty = True
-                        if dirty:
-                            db.add(icd)
-                            changes += 1
-                    except Exception:
-                        continue
-                if changes:
-                    db.commit()
-                if changes >= THRESHOLD_NEW_OR_CHANGED:
-                    version = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M')
-                    created_release = _rebuild_release(db, version)
-        except Exception:
-            pass
+        cycle = None
+        if not _cycle_guard.acquire():
+            print("[WHO-SYNC] A sync job is running; skipping this cycle", flush=True)
+        else:
+            try:
+                cycle = _run_cycle()
+            except Exception as e:
+                print(f"[WHO-SYNC] Sync cycle failed: {e}", flush=True)
+            finally:
+                _cycle_guard.release()
+        now = datetime.now(timezone.utc)
         _last_status.update({
-            "last_run": datetime.now(timezone.utc).isoformat(),
-            "changes": changes,
-            "created_release": created_release,
+            "last_run": now.isoformat(),
+            "changes": cycle["changes"] if cycle else 0,
+            "created_release": cycle["created_release"] if cycle else None,
             "next_run_eta_minutes": interval,
+            "last_cycle": cycle,
         })
-        # Sleep remaining interval
-        elapsed = time.time() - start
-        remaining = interval * 60 - elapsed
-        if remaining > 0:
-            time.sleep(remaining)
+        _save_status(last_run=now, changes=_last_status["changes"], created_release=_last_status["created_release"],
+                     next_run_eta_minutes=interval, heartbeat_at=now)
+        # Sleep remaining interval, re-checking leadership and recording a heartbeat as we go
+        remaining = interval * 60 - (time.time() - start)
+        while remaining > 0 and _running_flag:
+            time.sleep(min(remaining, HEARTBEAT_SECONDS))
+            remaining -= HEARTBEAT_SECONDS
+            if not _leader.held():
+                break
+            _save_status(heartbeat_at=datetime.now(timezone.utc))
 
 
 def start_scheduler():
@@ -108,39 +281,158 @@ def start_scheduler():
 
 
 def status():
-    return _last_status
+    """The leader's last persisted status, read from who_sync_status (this process's view if unreadable)."""
+    fallback = {**_last_status, "recent_cycles": list(_recent_cycles), "leader": None, "heartbeat_at": None}
+    try:
+        with SessionLocal() as db:
+            row = db.get(models.WhoSyncStatus, 1)
+    except Exception as e:
+        print(f"[WHO-SYNC] Could not read sync status: {e}", flush=True)
+        return {**fallback, "is_leader": _leader.held()}
+    if row is None:
+        return {**fallback, "is_leader": _leader.held()}
 
+    def ts(v):
+        return v.isoformat() if v else None
+    return {
+        "last_run": ts(row.last_run),
+        "changes": row.changes,
+        "created_release": row.created_release,
+        "next_run_eta_minutes": row.next_run_eta_minutes,
+        "last_cycle": json.loads(row.last_cycle) if row.last_cycle else None,
+        "recent_cycles": json.loads(row.recent_cycles) if row.recent_cycles else [],
+        "leader": row.leader,
+        "leader_since": ts(row.leader_since),
+        "heartbeat_at": ts(row.heartbeat_at),
+        "is_leader": _leader.held(),
+    }
 
-def trigger_once():
-    # Run one immediate cycle in foreground (short path)
-    with SessionLocal() as db:
-        changes = 0
-        created_release = None
-        icd_rows = db.query(models.ICD11Code).limit(25).all()  # sample size to keep fast
-        for icd in icd_rows:
+
+# --- On-demand full sync jobs ---
+_job_lock = leader_lock.LeaderLock("who-sync-job")
+_job_start_lock = threading.Lock()
+_job_worker: threading.Thread | None = None
+
+
+class SyncJobRunning(RuntimeError):
+    def __init__(self, job: dict | None):
+        super().__init__(f"WHO sync job {job['id']} is already running" if job
+                         else "A WHO sync job or scheduled sync cycle is already running")
+        self.job = job
+
+
+def _job_dict(job: models.WhoSyncJob) -> dict:
+    def ts(v):
+        return v.isoformat() if v else None
+    return {
+        "id": job.id, "state": job.state, "page_size": job.page_size, "cursor": job.cursor,
+        "total": job.total, "processed": job.processed,
+        "percent": round(100.0 * job.processed / job.total, 1) if job.total else 100.0,
+        "changes": job.changes, "unchanged": job.unchanged, "not_found": job.not_found, "failed": job.failed,
+        "created_release": job.created_release, "error": job.error, "started_at": ts(job.started_at),
+        "updated_at": ts(job.updated_at), "finished_at": ts(job.finished_at),
+    }
+
+
+def _running_job(db: Session):
+    return db.query(models.WhoSyncJob).filter(models.WhoSyncJob.state == "running") \
+        .order_by(models.WhoSyncJob.id.desc()).first()
+
+
+def _run_job(job_id: int):
+    icd = models.ICD11Code
+    try:
+        with SessionLocal() as db:
+            job = db.get(models.WhoSyncJob, job_id)
+            started = time.time()
             try:
-                norm = who_api_client.search_and_fetch_entity(icd.icd_name)
-                if not norm:
-                    continue
-                title = norm.get('title')
-                definition = norm.get('definition')
-                if isinstance(title, dict):
-                    title = title.get('@value')
-                if isinstance(definition, dict):
-                    definition = definition.get('@value')
-                dirty = False
-                if definition and definition != icd.description:
-                    icd.description = definition
-                    dirty = True
-                code_val = norm.get('code')
-                if code_val and code_val != icd.icd_code:
-                    icd.icd_code = code_val
-                    dirty = True
-                if dirty:
-                    db.add(icd)
-                    changes += 1
-            except Exception:
-                continue
-        if changes:
+                with ThreadPoolExecutor(max_workers=max(1, settings.WHO_SYNC_CONCURRENCY), thread_name_prefix="who-sync-job") as pool:
+                    while True:
+                        rows = db.execute(
+                            select(icd.id, icd.icd_name, icd.icd_code, icd.description, icd.who_sync_hash)
+                            .where(icd.id > job.cursor).order_by(icd.id).limit(job.page_size)
+                        ).all()
+                        if not rows:
+                            break
+                        totals = {"checked": 0, "changes": 0, "unchanged": 0, "not_found": 0, "failed": 0, "chunks": 0}
+                        changed_names = _sync_chunk(rows, pool, totals, set())
+                        job.cursor = rows[-1].id
+                        job.processed += totals["checked"]
+                        for key in ("changes", "unchanged", "not_found", "failed"):
+                            setattr(job, key, getattr(job, key) + totals[key])
+                        job.updated_at = datetime.now(timezone.utc)
+                        db.commit()
+                        if changed_names:
+                            translation_index.schedule_rebuild(changed_names)
+                job.created_release = _release_if_changed(job.changes)
+                job.state = "completed"
+                duration = time.time() - started
+                _save_status(cycle={
+                    "trigger": f"job {job.id}", "checked": job.processed, "changes": job.changes,
+                    "unchanged": job.unchanged, "not_found": job.not_found, "failed": job.failed,
+                    "created_release": job.created_release,
+                    "started_at": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+                    "duration_seconds": round(duration, 2),
+                    "rows_per_second": round(job.processed / duration, 2) if duration > 0 else None,
+                })
+            except Exception as e:
+                db.rollback()
+                job = db.get(models.WhoSyncJob, job_id)
+                job.state = "error"
+                job.error = str(e)
+                print(f"[WHO-SYNC] Job {job.id} failed after icd id {job.cursor}: {e}", flush=True)
+            job.finished_at = job.updated_at = datetime.now(timezone.utc)
             db.commit()
-        return {"changes": changes, "sample": len(icd_rows)}
+    finally:
+        _job_lock.release()
+
+
+def enqueue_job(page_size: int | None = None, cursor: int = 0) -> dict:
+    """Start a full sync job after cursor (or resume an interrupted one) and return it at once.
+
+    Raises SyncJobRunning while any worker is running one.
+    """
+    global _job_worker
+    with _job_start_lock:
+        if _job_lock.held() or not _job_lock.acquire():
+            with SessionLocal() as db:
+                running = _running_job(db)
+                raise SyncJobRunning(_job_dict(running) if running else None)
+        try:
+            with SessionLocal() as db:
+                job = _running_job(db)
+                if job is None:
+                    job = models.WhoSyncJob(
+                        state="running", page_size=max(1, page_size or JOB_PAGE_SIZE), cursor=cursor,
+                        total=db.query(models.ICD11Code).filter(models.ICD11Code.id > cursor).count(),
+                        processed=0, changes=0, unchanged=0, not_found=0, failed=0,
+                    )
+                    db.add(job)
+                    db.commit()
+                    print(f"[WHO-SYNC] Job {job.id} queued: {job.total} ICD rows after id {cursor}", flush=True)
+                else:
+                    print(f"[WHO-SYNC] Resuming job {job.id} after icd id {job.cursor}", flush=True)
+                result = _job_dict(job)
+        except Exception:
+            _job_lock.release()
+            raise
+        _job_worker = threading.Thread(target=_run_job, args=(result["id"],), name=f"who-sync-job-{result['id']}", daemon=True)
+        _job_worker.start()
+        return result
+
+
+def resume_job() -> dict | None:
+    """Continue a sync job a restart interrupted (startup hook); None when there is none to take."""
+    with SessionLocal() as db:
+        if _running_job(db) is None:
+            return None
+    try:
+        return enqueue_job()
+    except SyncJobRunning:
+        return None  # another worker owns it
+
+
+def job_status(job_id: int) -> dict | None:
+    with SessionLocal() as db:
+        job = db.get(models.WhoSyncJob, job_id)
+        return _job_dict(job) if job else None
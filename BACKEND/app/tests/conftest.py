@@ -3,3 +3,15 @@ import sys, os
 root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
 if root not in sys.path:
     sys.path.insert(0, root)
+
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _who_response_store_in_tmp(monkeypatch, tmp_path):
+    """Keep the durable WHO response store out of the working tree, and empty for every test."""
+    who_response_store = sys.modules.get('app.services.who_response_store')
+    if who_response_store is not None:
+        monkeypatch.setattr(who_response_store, 'WHO_RESPONSE_STORE_PATH', str(tmp_path / 'who_responses.sqlite3'))
+        monkeypatch.setattr(who_response_store, '_store', None)
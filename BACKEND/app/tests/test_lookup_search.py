@@ -0,0 +1,191 @@
+import os, uuid
+from datetime import timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test_unified.db')
+os.environ.setdefault('SECRET_KEY', 'a_very_secret_key_for_development_change_me')
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_ID', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_SECRET', 'dummy')
+os.environ.setdefault('WHO_TOKEN_URL', 'https://example.org/token')
+os.environ.setdefault('WHO_API_BASE_URL', 'https://example.org/api')
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.security import create_access_token
+from app.db.models import Base, ICD11Code, TraditionalTerm, Mapping
+from app.db.session import engine, SessionLocal
+from app.services import term_search
+
+Base.metadata.create_all(bind=engine)
+client = TestClient(app)
+
+
+def auth_headers():
+    token = create_access_token({'sub': 'lookup_tester'}, expires_delta=timedelta(hours=1))
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _seed(suffix):
+    """Two verified ICDs: a short-named one with a Devanagari term, and a longer one matched only by a term."""
+    with SessionLocal() as db:
+        near = ICD11Code(icd_name=f'Fever {suffix}', icd_code=f'Z{suffix[:2].upper()}', status='verified')
+        far = ICD11Code(icd_name=f'Unrelated disorder {uuid.uuid4().hex[:8]}', status='verified')
+        db.add_all([near, far]); db.flush()
+        jvara = TraditionalTerm(system='ayurveda', term=f'Jvara {suffix}', code=f'JV-{suffix}', devanagari=f'ज्वर {suffix}')
+        other = TraditionalTerm(system='unani', term=f'Humma of a very long description {suffix}', code=f'HU-{suffix}')
+        db.add_all([jvara, other]); db.flush()
+        db.add(Mapping(icd11_code_id=near.id, traditional_term_id=jvara.id, status='verified', is_primary=True))
+        db.add(Mapping(icd11_code_id=far.id, traditional_term_id=other.id, status='verified', is_primary=True))
+        db.commit()
+        return near.id, far.id, jvara.id, other.id
+
+
+def test_lookup_matches_terms_vernacular_and_icd_best_first():
+    suffix = uuid.uuid4().hex[:8]
+    near, far, jvara, other = _seed(suffix)
+    with SessionLocal() as db:
+        assert term_search.backend(db) == 'fts5'
+        assert term_search.term_matches(db, suffix)[:2] == [jvara, other]  # shorter, tighter match first
+        assert term_search.term_matches(db, suffix, system='unani') == [other]
+        assert term_search.term_matches(db, f'ज्वर {suffix}') == [jvara]
+        assert term_search.term_matches(db, f'jv-{suffix}') == [jvara]  # code-shaped query: exact code
+
+    r = client.get('/api/public/lookup', params={'query': suffix}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    names = [x['icd_name'] for x in r.json()]
+    assert names[0] == f'Fever {suffix}' and len(names) == 2
+    assert names[1].startswith('Unrelated disorder')
+
+    r = client.get('/api/public/lookup/suggest', params={'q': f'Fever {suffix}'}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    kinds = [(s['kind'], s['term']) for s in r.json()]
+    assert kinds[:2] == [('icd', None), ('traditional', f'Jvara {suffix}')]
+
+
+def test_lookup_caps_only_verified_matches():
+    suffix = uuid.uuid4().hex[:8]
+    _, _, jvara, _ = _seed(f'{suffix} verified mapping')
+    with SessionLocal() as db:
+        # More (and better ranked) unverified matches than the lookup's cap
+        unverified = TraditionalTerm(system='ayurveda', term=f'{suffix}', code=None)
+        db.add(unverified); db.flush()
+        icd = db.query(ICD11Code).filter(ICD11Code.icd_name == f'Fever {suffix} verified mapping').one()
+        db.add(Mapping(icd11_code_id=icd.id, traditional_term_id=unverified.id, status='suggested'))
+        db.add_all([TraditionalTerm(system='ayurveda', term=f'{suffix} {i}') for i in range(205)])
+        db.commit()
+        assert term_search.term_matches(db, suffix, limit=1, verified_only=True) == [jvara]
+        assert jvara not in term_search.term_matches(db, suffix)
+
+    r = client.get('/api/public/lookup', params={'query': suffix, 'system': 'ayurveda'}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    assert [x['icd_name'] for x in r.json()] == [f'Fever {suffix} verified mapping']
+    assert r.headers['X-Result-Truncated'] == 'false'
+
+
+def test_lookup_limit_is_explicit_and_reports_truncation():
+    suffix = uuid.uuid4().hex[:8]
+    _seed(suffix)
+    r = client.get('/api/public/lookup', params={'query': suffix, 'limit': 1}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    assert [x['icd_name'] for x in r.json()] == [f'Fever {suffix}']  # the best match is kept
+    assert r.headers['X-Result-Truncated'] == 'true'
+
+    r = client.get('/api/public/lookup', params={'query': suffix, 'limit': 2}, headers=auth_headers())
+    assert len(r.json()) == 2 and r.headers['X-Result-Truncated'] == 'false'
+
+
+def test_search_index_follows_updates_and_deletes():
+    suffix = uuid.uuid4().hex[:8]
+    _, _, jvara, other = _seed(suffix)
+    with SessionLocal() as db:
+        db.get(TraditionalTerm, jvara).term = f'Renamed {suffix}'
+        db.query(Mapping).filter(Mapping.traditional_term_id == other).delete()
+        db.delete(db.get(TraditionalTerm, other))
+        db.commit()
+        assert term_search.term_matches(db, f'Jvara {suffix}') == []
+        assert term_search.term_matches(db, f'Renamed {suffix}') == [jvara]
+        assert term_search.term_matches(db, f'Humma of a very long description {suffix}') == []
+        # Too short for trigrams: served by the LIKE fallback
+        assert term_search.icd_matches(db, 'Fe', limit=10000)
+
+
+def test_typeahead_index_ranks_prefixes_vernacular_and_codes():
+    from app.services.typeahead_index import TypeaheadIndex
+    index = TypeaheadIndex()
+    index.put_icd(1, 'Fever', 'MG26', [(10, 'ayurveda', 'Jvara', 'AAA-1', True, 'ज्वर', None, None),
+                                       (11, 'siddha', 'Suram', 'SS-7', True, None, 'சுரம்', None)])
+    index.put_icd(2, 'Intermittent fever', None, [(20, 'unani', 'Humma', 'HU-3', True, None, None, 'حمى')])
+
+    # Prefix beats word-start beats infix; each anchor is followed by all its verified terms
+    assert [s['icd_name'] for s in index.suggest('fe') if s['kind'] == 'icd'] == ['Fever', 'Intermittent fever']
+    assert index.suggest('fev', limit=2) == [
+        {'kind': 'icd', 'icd_name': 'Fever'},
+        {'kind': 'traditional', 'icd_name': 'Fever', 'system': 'ayurveda', 'term': 'Jvara', 'code': 'AAA-1', 'is_primary': True},
+    ]
+    assert index.suggest('ज्व')[0]['term'] == 'Jvara'
+    assert index.suggest('சுர')[0]['term'] == 'Suram'
+    assert index.suggest('mg26')[0] == {'kind': 'icd', 'icd_name': 'Fever'}
+    assert index.suggest('ss-7')[0]['term'] == 'Suram'
+    assert index.suggest('ss-')[0]['term'] == 'Suram'  # not code-shaped yet: substring
+    assert index.suggest('hum', system='ayurveda') == []
+
+    # Re-indexing an ICD tombstones its old keys
+    index.put_icd(1, 'Fever', 'MG26', [(10, 'ayurveda', 'Jvara', 'AAA-1', True, 'ज्वर', None, None)])
+    assert index.suggest('suram') == [] and index.stats()['tombstones'] > 0
+    index.put_icd(2, 'Intermittent fever', None, [])
+    assert index.suggest('humma') == [] and index.stats()['icds'] == 1
+
+
+def test_suggest_is_served_from_the_typeahead_index_and_follows_curation():
+    import time
+    from app.api.endpoints.lookup import _db_suggestions
+    from app.services import translation_index, typeahead_index
+    suffix = uuid.uuid4().hex[:8]
+    near, _, jvara, _ = _seed(suffix)
+    typeahead_index.rebuild()
+
+    r = client.get('/api/public/lookup/suggest', params={'q': f'Fever {suffix}'}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    with SessionLocal() as db:
+        assert r.json() == [s.model_dump() for s in _db_suggestions(db, f'Fever {suffix}', None, 20)]
+
+    def wait_for(q, expect_hits):
+        for _ in range(100):
+            if bool(typeahead_index.current().suggest(q)) == expect_hits:
+                return True
+            time.sleep(0.05)
+        return False
+
+    with SessionLocal() as db:
+        db.query(Mapping).filter(Mapping.traditional_term_id == jvara).update({'status': 'suggested'})
+        db.commit()
+    translation_index.schedule_rebuild([f'Fever {suffix}'])
+    assert wait_for(f'Jvara {suffix}', False) and not typeahead_index.current().suggest(f'Fever {suffix}')
+
+    with SessionLocal() as db:
+        db.query(Mapping).filter(Mapping.traditional_term_id == jvara).update({'status': 'verified'})
+        db.commit()
+    translation_index.schedule_rebuild([f'Fever {suffix}'])
+    assert wait_for(f'Jvara {suffix}', True)
+
+
+def test_typeahead_follows_other_workers_and_resets():
+    import time
+    from app.services import translation_index, typeahead_index
+    translation_index.rebuild()
+    typeahead_index.rebuild()
+    suffix = uuid.uuid4().hex[:8]
+    _seed(suffix)  # written by "another worker": nothing patched locally
+    translation_index.bump_version()
+    assert typeahead_index.current().suggest(f'Jvara {suffix}') == []
+    translation_index._checked_at = 0
+    translation_index.current()
+    for _ in range(100):
+        if typeahead_index.current().suggest(f'Jvara {suffix}'):
+            break
+        time.sleep(0.05)
+    assert typeahead_index.current().suggest(f'Jvara {suffix}')[0]['term'] == f'Jvara {suffix}'
+
+    r = client.post('/api/admin/reset-curation', headers=auth_headers())
+    assert r.status_code == 200, r.text
+    assert typeahead_index.current().suggest(f'Jvara {suffix}') == []
@@ -0,0 +1,570 @@
+import asyncio, os, threading, time, uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ.pop('DEV_MODE', None)
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test_unified.db')
+os.environ.setdefault('SECRET_KEY', 'a_very_secret_key_for_development_change_me')
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_ID', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_SECRET', 'dummy')
+os.environ.setdefault('WHO_TOKEN_URL', 'https://example.org/token')
+os.environ.setdefault('WHO_API_BASE_URL', 'https://example.org/api')
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.security import create_access_token
+from app.db.models import Base, ICD11Code, TraditionalTerm, Mapping
+from app.db.session import engine, SessionLocal
+from app.services import who_api_client, who_api_async
+
+Base.metadata.create_all(bind=engine)
+client = TestClient(app)
+
+
+def auth_headers():
+    token = create_access_token({'sub': 'translate_tester'}, expires_delta=timedelta(hours=1))
+    return {'Authorization': f'Bearer {token}'}
+
+
+def seed_verified(system='ayurveda'):
+    """Insert one verified ICD with a primary + alias term; returns (icd_name, code)."""
+    suffix = uuid.uuid4().hex[:8]
+    icd_name = f"Translate Test ICD {suffix}"
+    code = f"TT-{suffix}"
+    with SessionLocal() as db:
+        icd = ICD11Code(icd_name=icd_name, status='verified')
+        db.add(icd); db.flush()
+        primary = TraditionalTerm(system=system, term=f"Primary {suffix}", code=code)
+        alias = TraditionalTerm(system=system, term=f"Alias {suffix}", code=f"{code}-A")
+        db.add_all([primary, alias]); db.flush()
+        db.add(Mapping(icd11_code_id=icd.id, traditional_term_id=primary.id, status='verified', is_primary=True))
+        db.add(Mapping(icd11_code_id=icd.id, traditional_term_id=alias.id, status='verified', is_primary=False))
+        db.commit()
+    return icd_name, code
+
+
+def _async(fn):
+    async def wrapper(*a, **k):
+        return fn(*a, **k)
+    return wrapper
+
+
+@pytest.fixture
+def offline_who(monkeypatch):
+    """Stub every WHO call translate can reach with a miss; tests override what they need."""
+    for fn in ('mms_search_by_release', 'tm2_search_by_release', 'fetch_linearized_entity_by_release'):
+        monkeypatch.setattr(who_api_async, fn, _async(lambda *a, **k: None))
+    for fn in ('search_foundation_uri', 'search_and_fetch_entity', 'search_and_fetch_tm2', 'get_entity_details', 'search_tm2_by_terms'):
+        monkeypatch.setattr(who_api_async, fn, _async(lambda *a, **k: None))
+    return monkeypatch
+
+
+def test_translate_first_usable_branch_wins(offline_who):
+    icd_name, code = seed_verified()
+
+    cancelled, finished = threading.Event(), threading.Event()
+
+    async def slow_entity(name):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        finished.set()
+        return {'code': 'SLOW', 'title': {'@value': 'slow'}}
+
+    offline_who.setattr(who_api_async, 'search_and_fetch_entity', slow_entity)
+    offline_who.setattr(who_api_async, 'mms_search_by_release',
+                        _async(lambda term, release=None: {'code': 'ME01', 'title': {'@value': term}, 'definition': 'Defined', '@id': 'http://id.who.int/icd/entity/1'}))
+    offline_who.setattr(who_api_async, 'tm2_search_by_release',
+                        _async(lambda term, release=None: {'code': 'SM31', 'title': {'@value': 'TM2 ' + term}, '@id': 'http://id.who.int/icd/entity/2'} if term.startswith('Alias') else None))
+
+    r = client.get('/api/public/translate', params={'system': 'ayurveda', 'code': code}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    js = r.json()
+    assert js['icd']['code'] == 'ME01'
+    assert js['tm2']['code'] == 'SM31'
+    assert js['ayurveda']['primary']['code'] == code
+    assert len(js['ayurveda']['aliases']) == 1
+    # The slow losing branch did not hold the response
+    assert cancelled.wait(5) and not finished.is_set()
+
+    with SessionLocal() as db:
+        icd = db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).one()
+        assert icd.icd_code == 'ME01'
+        assert icd.description == 'Defined'
+
+
+def test_first_usable_cancels_the_losing_branches():
+    from app.api.endpoints.translate import _first_usable
+    seen = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            seen.append('cancelled')
+            raise
+        seen.append('finished')
+
+    async def fast():
+        return {'code': 'ME01'}
+
+    async def main():
+        winner = await _first_usable([slow(), fast()])
+        await asyncio.sleep(0)  # let the cancellation land before the loop closes
+        return winner, list(seen)
+
+    winner, seen_before_close = asyncio.run(main())
+    assert winner == {'code': 'ME01'}
+    assert seen_before_close == ['cancelled']
+
+
+def test_translate_without_who_match_still_returns_mappings(offline_who):
+    icd_name, code = seed_verified('siddha')
+    r = client.get('/api/public/translate', params={'icd_name': icd_name}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    js = r.json()
+    assert js['icd'] is None and js['tm2'] is None
+    assert js['siddha']['primary']['code'] == code
+
+
+def test_translate_batch_dedupes_who_and_reports_item_errors(offline_who):
+    icd_name, code = seed_verified()
+    other_icd, other_code = seed_verified('unani')
+    calls = []
+
+    def mms(term, release=None):
+        calls.append(term)
+        return {'code': 'BATCH1', 'title': {'@value': term}, 'definition': 'Batch def'}
+
+    offline_who.setattr(who_api_async, 'mms_search_by_release', _async(mms))
+    r = client.post('/api/public/translate/batch', json={'items': [
+        {'system': 'ayurveda', 'code': code},
+        {'icd_name': icd_name},
+        {'system': 'unani', 'code': other_code},
+        {'system': 'ayurveda', 'code': 'NOPE-404'},
+        {'code': 'missing-system'},
+    ]}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    js = r.json()
+    assert js['count'] == 5 and js['errors'] == 2
+    res = [e['result'] for e in js['results']]
+    assert res[0]['icd']['code'] == 'BATCH1'
+    assert res[0]['ayurveda']['primary']['code'] == code
+    assert res[1]['ayurveda']['primary']['code'] == code
+    assert res[2]['unani']['primary']['code'] == other_code
+    assert res[3]['resourceType'] == 'OperationOutcome'
+    assert res[4]['issue'][0]['code'] == 'invalid'
+    # One WHO MMS lookup per distinct ICD, not per item
+    assert sorted(calls) == sorted([icd_name, other_icd])
+
+    # Single-item endpoint now hits the cache populated by the batch
+    calls.clear()
+    r = client.get('/api/public/translate', params={'system': 'ayurveda', 'code': code}, headers=auth_headers())
+    assert r.json()['icd']['code'] == 'BATCH1'
+    assert calls == []
+
+    r = client.post('/api/public/translate/batch', json={'items': [{'icd_name': icd_name}], 'fhir': True}, headers=auth_headers())
+    assert r.json()['results'][0]['result']['resourceType'] == 'Parameters'
+
+
+def _set_enrichment(icd_name, age, **fields):
+    with SessionLocal() as db:
+        icd = db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).one()
+        icd.who_enriched_at = datetime.now(timezone.utc) - age
+        icd.who_release = who_api_client.WHO_DEFAULT_RELEASE
+        for k, v in fields.items():
+            setattr(icd, k, v)
+        db.commit()
+
+
+def test_translate_serves_fresh_enrichment_from_db(offline_who):
+    icd_name, code = seed_verified()
+    _set_enrichment(icd_name, timedelta(minutes=5), icd_code='DB01', description='Stored def', tm2_code='SM99', tm2_title='Stored TM2')
+
+    def boom(*a, **k):
+        raise AssertionError('WHO must not be called for fresh rows')
+
+    offline_who.setattr(who_api_async, 'mms_search_by_release', _async(boom))
+    offline_who.setattr(who_api_async, 'search_and_fetch_tm2', _async(boom))
+    r = client.get('/api/public/translate', params={'system': 'ayurveda', 'code': code}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    js = r.json()
+    assert js['icd']['code'] == 'DB01' and js['icd']['description'] == 'Stored def'
+    assert js['tm2']['code'] == 'SM99'
+
+
+def test_translate_stale_enrichment_answers_then_revalidates(offline_who):
+    icd_name, code = seed_verified()
+    _set_enrichment(icd_name, timedelta(days=30), icd_code='OLD1', description='Old def')
+    offline_who.setattr(who_api_async, 'mms_search_by_release',
+                        _async(lambda term, release=None: {'code': 'NEW1', 'title': {'@value': term}, 'definition': 'New def'}))
+    offline_who.setattr(who_api_async, 'search_and_fetch_tm2',
+                        _async(lambda term: {'code': 'SM01', 'title': {'@value': 'TM2 title'}, 'definition': 'TM2 def'}))
+
+    r = client.get('/api/public/translate', params={'icd_name': icd_name}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    assert r.json()['icd']['code'] == 'OLD1'  # answered from the DB immediately
+
+    # TestClient runs background tasks before returning, so the row is refreshed by now
+    with SessionLocal() as db:
+        icd = db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).one()
+        assert icd.icd_code == 'NEW1' and icd.description == 'New def'
+        assert icd.tm2_code == 'SM01' and icd.tm2_definition == 'TM2 def'
+        assert icd.who_enrich_failed is False
+
+    r = client.get('/api/public/translate', params={'icd_name': icd_name}, headers=auth_headers())
+    assert r.json()['icd']['code'] == 'NEW1'
+    assert r.json()['tm2']['code'] == 'SM01'
+
+
+def test_who_code_written_back_by_translate_reaches_the_index(offline_who):
+    from app.services import translation_index
+    icd_name, code = seed_verified()
+    translation_index.rebuild()
+    assert translation_index.current().by_icd_name[icd_name].icd_code is None
+    suffix = uuid.uuid4().hex[:6].upper()
+    offline_who.setattr(who_api_async, 'mms_search_by_release',
+                        _async(lambda term, release=None: {'code': f'WB{suffix}', 'title': {'@value': term}}))
+
+    r = client.get('/api/public/translate', params={'system': 'ayurveda', 'code': code}, headers=auth_headers())
+    assert r.json()['icd']['code'] == f'WB{suffix}'
+    for _ in range(100):
+        if f'WB{suffix}' in translation_index.current().by_icd_code:
+            break
+        time.sleep(0.05)
+    assert translation_index.current().by_icd_code[f'WB{suffix}'][0].icd_name == icd_name
+    r = client.get('/api/public/translate/reverse', params={'icd_code': f'WB{suffix}'}, headers=auth_headers())
+    assert r.json()['ayurveda']['primary']['code'] == code
+
+
+def test_translate_pinned_release_does_not_overwrite_default_enrichment(offline_who):
+    icd_name, code = seed_verified()
+    _set_enrichment(icd_name, timedelta(days=30), icd_code='DEF1', description='Default def')
+    offline_who.setattr(who_api_async, 'mms_search_by_release',
+                        _async(lambda term, release=None: {'code': f'PIN-{release}', 'title': {'@value': term}, 'definition': 'Pinned def'}))
+
+    r = client.get('/api/public/translate', params={'icd_name': icd_name, 'release': '2019-04'}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    assert r.json()['icd']['code'] == 'PIN-2019-04'  # answered live for the pinned release
+    with SessionLocal() as db:
+        icd = db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).one()
+        # Neither persisted nor refreshed: the row still belongs to the default release
+        assert icd.icd_code == 'DEF1' and icd.who_release == who_api_client.WHO_DEFAULT_RELEASE
+
+
+def test_translate_degrades_to_stored_codes_while_who_circuit_is_open(offline_who):
+    icd_name, code = seed_verified()
+    with SessionLocal() as db:
+        icd = db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).one()
+        icd.icd_code, icd.description = 'KEEP1', 'Kept def'  # never enriched for the active release
+        db.commit()
+
+    def boom(*a, **k):
+        raise AssertionError('WHO must not be called while every circuit is open')
+
+    offline_who.setattr(who_api_async, 'mms_search_by_release', _async(boom))
+    offline_who.setattr(who_api_client.breakers, 'all_open', lambda: True)
+    r = client.get('/api/public/translate', params={'system': 'ayurveda', 'code': code}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    js = r.json()
+    assert js['icd']['code'] == 'KEEP1' and js['enrichment'] == 'degraded'
+    with SessionLocal() as db:
+        assert db.query(ICD11Code).filter(ICD11Code.icd_name == icd_name).one().who_enriched_at is None
+
+    r = client.post('/api/public/translate/batch', json={'items': [{'icd_name': icd_name}], 'fhir': True}, headers=auth_headers())
+    params = {p['name']: p.get('valueString') for p in r.json()['results'][0]['result']['parameter']}
+    assert params['enrichment'] == 'degraded'
+
+    # Once WHO is back the answer is live again, not a cached degraded one
+    offline_who.setattr(who_api_client.breakers, 'all_open', lambda: False)
+    offline_who.setattr(who_api_async, 'mms_search_by_release',
+                        _async(lambda term, release=None: {'code': 'LIVE1', 'title': {'@value': term}, 'definition': 'Live def'}))
+    r = client.get('/api/public/translate', params={'system': 'ayurveda', 'code': code}, headers=auth_headers())
+    assert r.json()['icd']['code'] == 'LIVE1' and r.json()['enrichment'] is None
+
+
+def test_translate_index_serves_reads_and_falls_back_to_db(offline_who):
+    from app.services import translation_index
+    icd_name, code = seed_verified()
+    translation_index.rebuild()
+    index = translation_index.current()
+    assert icd_name in index.verified_icd_names
+    icd, term = index.primary_for_code('ayurveda', code)
+    assert icd.icd_name == icd_name and term.is_primary
+
+    r = client.get('/api/public/verified-icd')
+    assert icd_name in r.json()['icd_names']
+    r = client.get('/api/public/translate/reverse', params={'icd_name': icd_name}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    assert r.json()['ayurveda']['primary']['code'] == code
+
+    # Mappings verified after the last rebuild are still found through the DB path
+    late_icd, late_code = seed_verified('unani')
+    assert translation_index.current().primary_for_code('unani', late_code) is None
+    r = client.get('/api/public/translate', params={'system': 'unani', 'code': late_code}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    assert r.json()['unani']['primary']['code'] == late_code
+    assert client.get('/api/public/translate/cache/stats').json()['index']['icds'] >= 1
+
+
+def test_translate_index_follows_writes_from_other_workers(offline_who):
+    from app.services import translation_index
+    translation_index.rebuild()
+    icd_name, code = seed_verified()  # written by "another worker": no local rebuild scheduled
+    translation_index.bump_version()
+    assert translation_index.current().primary_for_code('ayurveda', code) is None  # checked on MAX_AGE only
+    translation_index._checked_at = 0
+    translation_index.current()
+    for _ in range(100):
+        if translation_index.current().primary_for_code('ayurveda', code):
+            break
+        time.sleep(0.05)
+    assert translation_index.current().primary_for_code('ayurveda', code)[0].icd_name == icd_name
+
+
+def test_reset_curation_stops_serving_deleted_mappings(offline_who):
+    from app.services import translation_index
+    icd_name, code = seed_verified()
+    translation_index.rebuild()
+    assert icd_name in client.get('/api/public/verified-icd').json()['icd_names']
+    r = client.get('/api/public/translate/reverse', params={'icd_name': icd_name}, headers=auth_headers())
+    assert r.json()['ayurveda']['primary']['code'] == code
+
+    r = client.post('/api/admin/reset-curation', headers=auth_headers())
+    assert r.status_code == 200, r.text
+    assert icd_name not in client.get('/api/public/verified-icd').json()['icd_names']
+    r = client.get('/api/public/translate/reverse', params={'icd_name': icd_name}, headers=auth_headers())
+    assert r.json()['ayurveda'] is None
+
+
+def test_translation_cache_bounds_expiry_and_invalidation():
+    from app.services.cache_service import TranslationCache
+    cache = TranslationCache(max_entries=2, ttl_seconds=60)
+    cache.set('v1', 'forward', 'a', 'A', icd_name='Fever')
+    cache.set('v1', 'forward', 'b', 'B', icd_name='Cough')
+    assert cache.get('v1', 'forward', 'a') == 'A'  # 'a' becomes most recent
+    cache.set('v2', 'forward', 'c', 'C', icd_name='Fever')
+    assert cache.get('v1', 'forward', 'b') is None  # least recently used was evicted
+    assert cache.stats()['evictions'] == 1
+
+    assert cache.invalidate_icd('fever') == 2
+    assert cache.get('v1', 'forward', 'a') is None and cache.get('v2', 'forward', 'c') is None
+
+    cache.set('v1', 'reverse', 'x', 'X')
+    cache.set('v2', 'reverse', 'y', 'Y')
+    assert cache.invalidate_release('v1') == 1
+    assert cache.get('v2', 'reverse', 'y') == 'Y'
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.expire() == 1
+    stats = cache.stats()
+    assert stats['entries'] == 0 and stats['invalidations'] == 3 and stats['expirations'] == 1
+
+    # A read moves an entry behind newer writes; it must still expire on its own write time
+    cache.ttl_seconds = 60
+    cache.set('v1', 'forward', 'old', 'O')
+    cache.set('v1', 'forward', 'new', 'N')
+    k = cache._key('v1', 'forward', 'old')
+    ts, val, icd = cache._store[k]
+    cache._store[k] = (ts - 120, val, icd)
+    cache._store.move_to_end(k)  # as a hit just before it went stale would leave it
+    assert cache.expire() == 1
+    assert cache.get('v1', 'forward', 'new') == 'N'
+
+
+def test_undo_verification_drops_cached_translation(offline_who):
+    from app.services import translation_index
+    icd_name, code = seed_verified()
+    translation_index.rebuild()
+    r = client.get('/api/public/translate/reverse', params={'icd_name': icd_name}, headers=auth_headers())
+    assert r.json()['ayurveda']['primary']['code'] == code
+
+    r = client.post('/api/admin/undo-verification', json={'icd_name': icd_name}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    translation_index.rebuild()  # what the scheduled background rebuild does
+    r = client.get('/api/public/translate/reverse', params={'icd_name': icd_name}, headers=auth_headers())
+    assert r.json()['ayurveda'] is None  # "Disease not verified", not the cached mapping
+
+
+def test_release_registry_follows_refresh():
+    from app.services import release_registry, translation_index
+    version = f"vt-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        before = translation_index._read_version(db)
+    r = client.post(f'/api/admin/conceptmap/releases/{version}/refresh', headers=auth_headers())
+    assert r.status_code == 200, r.text
+    # Other workers see the refresh through the shared index version
+    with SessionLocal() as db:
+        assert translation_index._read_version(db) == before + 1 == translation_index._built_version
+    assert translation_index.current().release_version == version
+    assert release_registry.latest_version() == version
+    assert client.get('/api/status').json()['current_release'] == version
+    r = client.get('/api/public/translate/reverse', params={'icd_name': seed_verified()[0]}, headers=auth_headers())
+    assert r.json()['release_version'] == version
+
+
+def test_translate_export_streams_ndjson_live_and_pinned():
+    import json
+    icd_name, code = seed_verified()
+    _set_enrichment(icd_name, timedelta(minutes=1), icd_code='EX01', tm2_code='SM77', tm2_title='Export TM2')
+
+    with client.stream('GET', '/api/public/translate/export', headers=auth_headers()) as r:
+        assert r.status_code == 200
+        assert r.headers['content-type'].startswith('application/x-ndjson')
+        lines = [json.loads(l) for l in r.iter_lines() if l]
+    row = next(l for l in lines if l['icd_name'] == icd_name)
+    assert row['ayurveda']['primary']['code'] == code
+    assert [a['code'] for a in row['ayurveda']['aliases']] == [f'{code}-A']
+    assert row['icd']['code'] == 'EX01' and row['tm2']['code'] == 'SM77'
+    assert len({l['icd_name'] for l in lines}) == len(lines)
+
+    version = f"vx-{uuid.uuid4().hex[:8]}"
+    client.post(f'/api/admin/conceptmap/releases/{version}/refresh', headers=auth_headers())
+    r = client.get('/api/public/translate/export', params={'release': version}, headers=auth_headers())
+    pinned = [json.loads(l) for l in r.text.splitlines() if l]
+    row = next(l for l in pinned if l['icd_name'] == icd_name)
+    assert row['release_version'] == version
+    assert row['ayurveda']['primary']['code'] == code
+
+    r = client.get('/api/public/translate/export', params={'release': 'no-such-release'}, headers=auth_headers())
+    assert r.json()['resourceType'] == 'OperationOutcome'
+
+
+def test_shared_translation_cache_is_seen_by_every_worker(tmp_path):
+    from app.services.cache_backends import SqliteStore, SharedTTLCache
+    from app.services.cache_service import SharedTranslationCache
+    path = str(tmp_path / 'shared.sqlite3')
+    # Two stores on one file stand in for two uvicorn worker processes
+    worker_a = SharedTranslationCache(SqliteStore(path), max_entries=2, ttl_seconds=60)
+    worker_b = SharedTranslationCache(SqliteStore(path), max_entries=2, ttl_seconds=60)
+
+    worker_a.set('v1', 'forward', 'ayurveda:X1', {'code': 'X1'}, icd_name='Fever')
+    assert worker_b.get('v1', 'forward', 'ayurveda:x1') == {'code': 'X1'}
+    assert worker_b.get('v1', 'forward', 'missing') is None
+    worker_b.set('v1', 'reverse', 'Cough', 'C', icd_name='Cough')
+    worker_a.set('v2', 'reverse', 'Cold', 'D')
+    assert worker_a.get('v1', 'forward', 'ayurveda:X1') is None  # LRU entry evicted by worker_a's write
+
+    assert worker_a.invalidate_icd('COUGH') == 1
+    assert worker_b.get('v1', 'reverse', 'Cough') is None
+    worker_a.counters.flush()  # worker_a's batched counts reach the file within the flush interval
+    stats = worker_b.stats()
+    assert stats['backend'] == 'sqlite'
+    assert stats['hits'] == 1 and stats['misses'] == 3
+    assert stats['evictions'] == 1 and stats['invalidations'] == 1 and stats['entries'] == 1
+
+    who_a = SharedTTLCache('who:test', maxsize=10, ttl=60, store=SqliteStore(path))
+    who_b = SharedTTLCache('who:test', maxsize=10, ttl=60, store=SqliteStore(path))
+    who_a[('op', 'term', None, 'tm2')] = {'code': 'SM1'}
+    assert who_b.get(('op', 'term', None, 'tm2')) == {'code': 'SM1'} and len(who_b) == 1
+
+
+def test_sqlite_translation_cache_is_used_off_the_event_loop(offline_who, tmp_path):
+    from app.api.endpoints import translate as translate_ep
+    from app.services.cache_backends import SqliteStore
+    from app.services.cache_service import SharedTranslationCache
+    cache = SharedTranslationCache(SqliteStore(str(tmp_path / 'shared.sqlite3')), max_entries=100, ttl_seconds=60)
+    on_loop = []
+    for name in ('get', 'set'):
+        def record(*a, _f=getattr(cache, name), _n=name, **k):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(_n)
+            except RuntimeError:
+                pass
+            return _f(*a, **k)
+        offline_who.setattr(cache, name, record)
+    offline_who.setattr(translate_ep, 'translation_cache', cache)
+
+    icd_name, code = seed_verified()
+    for _ in range(2):
+        r = client.get('/api/public/translate', params={'system': 'ayurveda', 'code': code}, headers=auth_headers())
+        assert r.status_code == 200, r.text
+        r = client.get('/api/public/translate/reverse', params={'icd_name': icd_name}, headers=auth_headers())
+        assert r.status_code == 200, r.text
+    r = client.post('/api/public/translate/batch', json={'items': [{'icd_name': icd_name}]}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    stats = cache.stats()
+    assert stats['hits'] >= 2 and stats['entries'] >= 3 and on_loop == []
+
+
+def test_shared_cache_counters_are_batched(tmp_path):
+    from app.services.cache_backends import Counters, SqliteStore
+    store = SqliteStore(str(tmp_path / 'shared.sqlite3'))
+    counters = Counters('translation', ('hits', 'misses'), store, flush_seconds=60)
+    for _ in range(100):
+        counters.incr('hits')
+    counters.incr('misses')
+    assert store.counters('translation') == {}  # nothing written per read
+    assert counters.snapshot() == {'hits': 100, 'misses': 1}
+    counters.flush_seconds = 0
+    counters.incr('hits')
+    assert store.counters('translation')['hits'] == 101
+
+
+def test_reverse_translate_by_icd_code_and_bulk():
+    icd_name, code = seed_verified()
+    other_icd, other_code = seed_verified('siddha')
+    suffix = uuid.uuid4().hex[:4].upper()
+    _set_enrichment(icd_name, timedelta(minutes=1), icd_code=f'RV{suffix}')
+    _set_enrichment(other_icd, timedelta(minutes=1), icd_code=f'RW{suffix}')
+    with SessionLocal() as db:
+        db.add(ICD11Code(icd_name=f"Unverified {suffix}", icd_code=f'RX{suffix}'))
+        db.commit()
+
+    r = client.get('/api/public/translate/reverse', params={'icd_code': f'rv{suffix}'}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    js = r.json()
+    assert js['ayurveda']['primary']['code'] == code and js['icd']['name'] == icd_name
+
+    r = client.post('/api/public/translate/reverse/batch', json={'icd_codes': [
+        f'RV{suffix}', f'RW{suffix}', f'RX{suffix}', 'NOPE99', f'RV{suffix}',
+    ]}, headers=auth_headers())
+    assert r.status_code == 200, r.text
+    js = r.json()
+    assert js['count'] == 5 and js['errors'] == 2
+    res = [e['result'] for e in js['results']]
+    assert res[0]['ayurveda']['primary']['code'] == code
+    assert res[1]['siddha']['primary']['code'] == other_code
+    assert res[2]['issue'][0]['details']['text'] == 'Disease not verified'
+    assert res[3]['issue'][0]['code'] == 'not-found'
+    assert res[4] == res[0]
+
+
+def test_cached_translate_serves_preserialized_json_and_fhir(offline_who):
+    icd_name, code = seed_verified()
+    params = {'system': 'ayurveda', 'code': code}
+    first = client.get('/api/public/translate', params=params, headers=auth_headers())
+    fhir_first = client.get('/api/public/translate', params={**params, 'fhir': True}, headers=auth_headers())
+    hits_before = client.get('/api/public/translate/cache/stats').json()['hits']
+    second = client.get('/api/public/translate', params=params, headers=auth_headers())
+    fhir_second = client.get('/api/public/translate', params={**params, 'fhir': True}, headers=auth_headers())
+    assert client.get('/api/public/translate/cache/stats').json()['hits'] == hits_before + 2
+
+    assert first.content == second.content
+    assert second.json()['ayurveda']['primary']['code'] == code
+    assert fhir_first.content == fhir_second.content
+    assert fhir_second.json()['resourceType'] == 'Parameters'
+
+
+def test_single_flight_coalesces_concurrent_resolutions():
+    import asyncio
+    from app.api.endpoints import translate
+    calls = []
+
+    async def resolve():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'resolved': len(calls)}
+
+    async def run():
+        return await asyncio.gather(*(translate._single_flight('k|forward|x', resolve) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == [1]
+    assert results == [{'resolved': 1}] * 5
+    assert 'k|forward|x' not in translate._flights
@@ -0,0 +1,392 @@
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test_unified.db')
+os.environ.setdefault('SECRET_KEY', 'a_very_secret_key_for_development_change_me')
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_ID', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_SECRET', 'dummy')
+os.environ.setdefault('WHO_TOKEN_URL', 'https://example.org/token')
+os.environ.setdefault('WHO_API_BASE_URL', 'https://example.org/api')
+
+import pytest
+from app.services import who_api_client, who_response_store
+
+
+class _Resp:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise who_api_client.requests.exceptions.HTTPError(f"{self.status_code}")
+
+
+@pytest.fixture
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(who_api_client, 'WHO_LOCAL_NOAUTH', True)
+    monkeypatch.setattr(who_response_store, 'WHO_RESPONSE_STORE_PATH', '')
+    monkeypatch.setattr(who_api_client, 'WHO_RELEASE_MIRROR', False)
+    who_api_client.token_cache.clear()
+    for cache in (who_api_client.negative_cache, who_api_client.release_search_cache, who_api_client.entity_cache,
+                  who_api_client.tm2_entity_cache, who_api_client.linearized_entity_cache,
+                  who_api_client.foundation_search_cache):
+        cache.clear()
+    who_api_client.variant_stats.clear()
+    who_api_client.breakers.reset()
+    yield
+    who_api_client.negative_cache.clear()
+
+
+def test_who_miss_is_negatively_cached_per_release(fresh_caches, monkeypatch):
+    calls = []
+
+    def fake_get(url, **kw):
+        calls.append(url)
+        return _Resp(200, {'destinationEntities': []})
+
+    monkeypatch.setattr(who_api_client, 'who_get', fake_get)
+    assert who_api_client.tm2_search_by_release('Vataja Jvara', '2025-01') is None
+    first = len(calls)
+    assert first == 3  # every URL variant tried once
+    # Same term modulo case/whitespace and release: served from the negative cache
+    assert who_api_client.tm2_search_by_release('  vataja   JVARA ', '2025-01') is None
+    assert len(calls) == first
+    # A different release is a different key
+    assert who_api_client.tm2_search_by_release('Vataja Jvara', '2024-01') is None
+    assert len(calls) == 2 * first
+
+    stats = who_api_client.cache_stats()
+    assert stats['negative_hits'] >= 1 and stats['negative_entries'] == 2
+
+
+def test_who_hit_is_cached_and_not_negative(fresh_caches, monkeypatch):
+    calls = []
+
+    def fake_get(url, **kw):
+        calls.append(url)
+        return _Resp(200, {'destinationEntities': [{'code': 'SM31', 'title': 'Fever', 'id': 'http://id.who.int/icd/entity/9'}]})
+
+    monkeypatch.setattr(who_api_client, 'who_get', fake_get)
+    hit = who_api_client.mms_search_by_release('Fever')
+    assert hit['code'] == 'SM31'
+    assert who_api_client.mms_search_by_release('fever', who_api_client.WHO_DEFAULT_RELEASE)['code'] == 'SM31'
+    assert len(calls) == 1
+    assert who_api_client.cache_stats()['negative_entries'] == 0
+
+
+def test_concurrent_identical_lookups_call_who_once(fresh_caches, monkeypatch):
+    import threading, time
+    calls = []
+
+    def slow_get(url, **kw):
+        calls.append(url)
+        time.sleep(0.2)
+        return _Resp(200, {'destinationEntities': [{'code': 'SM31', 'title': 'Fever', 'id': 'http://id.who.int/icd/entity/9'}]})
+
+    monkeypatch.setattr(who_api_client, 'who_get', slow_get)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(who_api_client.tm2_search_by_release('Jvara'))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert [r['code'] for r in results] == ['SM31'] * 5
+    assert who_api_client.cache_stats()['coalesced'] >= 4
+
+
+def test_session_pools_and_retries_with_timeouts(monkeypatch):
+    session = who_api_client._build_session()
+    adapter = session.get_adapter('https://id.who.int/icd/entity/search')
+    assert adapter is session.get_adapter('https://icd.who.int/icdapi/release/11/mms')
+    retry = adapter.max_retries
+    assert retry.total == 0 and not retry.status_forcelist  # retried by _budgeted, within the budget
+    assert session.verify == who_api_client._verify_param()
+
+    seen = {}
+
+    class _Session:
+        def get(self, url, **kw):
+            seen.update(kw)
+            return _Resp(200, {})
+
+    monkeypatch.setattr(who_api_client, '_session', _Session())
+    who_api_client.who_get('https://id.who.int/x')
+    assert seen['timeout'] == (who_api_client.WHO_CONNECT_TIMEOUT_SECONDS, who_api_client.WHO_READ_TIMEOUT_SECONDS)
+
+
+def test_sync_retries_take_a_budget_slot_per_attempt_and_cap_retry_after(fresh_caches, monkeypatch):
+    budget = who_api_client._Budget(rate=10, burst=10, max_concurrency=4)
+    monkeypatch.setattr(who_api_client, 'budget', budget)
+    monkeypatch.setattr(who_api_client, 'WHO_MAX_RETRY_AFTER_SECONDS', 0.01)
+    answers = [_Resp(429, headers={'Retry-After': '3600'}), _Resp(503), _Resp(200, {})]
+    sleeps = []
+
+    class _Session:
+        def get(self, url, **kw):
+            return answers.pop(0)
+
+    monkeypatch.setattr(who_api_client, '_session', _Session())
+    monkeypatch.setattr(who_api_client, 'retry_delay', lambda attempt, retry_after=None: sleeps.append(
+        who_api_client.retry_after_seconds(retry_after)) or 0)
+    assert who_api_client.who_get('https://id.who.int/x').status_code == 200
+    stats = budget.stats()
+    assert stats['granted'] == 3 and stats['throttled'] == 1 and stats['in_flight'] == 0
+    assert sleeps == [0.01, None]  # the server's hour-long Retry-After is capped
+    assert stats['paused_for_seconds'] <= 0.01
+
+
+def test_async_client_shares_caches_with_sync_client(fresh_caches, monkeypatch):
+    import asyncio, httpx
+    from app.services import who_api_async
+    calls = []
+
+    def handler(request):
+        calls.append(str(request.url))
+        if len(calls) == 1:
+            return httpx.Response(503, headers={'Retry-After': '0'})
+        return httpx.Response(200, json={'destinationEntities': [{'code': 'SM31', 'title': 'Fever', 'id': 'http://id.who.int/icd/entity/9'}]})
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setitem(who_api_async._clients, asyncio.get_running_loop(), client)
+        results = await asyncio.gather(*[who_api_async.tm2_search_by_release('Jvara', '2025-01') for _ in range(3)])
+        await who_api_async.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert [r['code'] for r in results] == ['SM31'] * 3
+    assert len(calls) == 2  # one 503 retried, then a single coalesced lookup
+    # The blocking client is served from the same cache entry
+    monkeypatch.setattr(who_api_client, 'who_get', lambda *a, **k: pytest.fail('cache should answer'))
+    assert who_api_client.tm2_search_by_release('jvara', '2025-01')['code'] == 'SM31'
+
+
+def test_async_lookup_follows_a_replaced_blocking_function(monkeypatch):
+    import asyncio
+    from app.services import who_api_async
+    # Replaced after who_api_async was imported: the async path must use the replacement too
+    monkeypatch.setattr(who_api_client, 'search_and_fetch_entity', lambda term: {'code': 'ST01', 'title': term})
+    assert asyncio.run(who_api_async.search_and_fetch_entity('Jvara')) == {'code': 'ST01', 'title': 'Jvara'}
+
+
+def test_linearized_fetch_learns_the_working_url_variant(fresh_caches, monkeypatch):
+    calls = []
+
+    def fake_get(url, **kw):
+        calls.append(url)
+        return _Resp(200, {'code': 'SM31'}) if '/icd/release/11/tm2/entities/' in url else _Resp(404)
+
+    monkeypatch.setattr(who_api_client, 'who_get', fake_get)
+    assert who_api_client.fetch_linearized_entity('111', 'tm2')['code'] == 'SM31'
+    assert len(calls) == 4  # walked the declared order up to the working shape
+    calls.clear()
+    assert who_api_client.fetch_linearized_entity('222', 'tm2')['code'] == 'SM31'
+    assert len(calls) == 1 and calls[0].endswith('/icd/release/11/tm2/entities/222')
+
+    stats = who_api_client.variant_stats.snapshot()['fetch_linearized_entity']
+    assert stats['preferred'] == '{id}/icd/release/11/{lin}/entities/{entity}'
+    assert stats['templates'][stats['preferred']] | {'last_hit_at': None} == {
+        'host': 'id.who.int', 'attempts': 2, 'hits': 2, 'last_hit_at': None}
+
+
+def test_hedged_variants_return_the_faster_success(fresh_caches, monkeypatch):
+    import time
+    monkeypatch.setattr(who_api_client, 'WHO_HEDGE_DELAY_SECONDS', 0.05)
+
+    def fake_get(url, **kw):
+        if url.endswith('/entity/7'):
+            time.sleep(0.5)
+            return _Resp(200, {'code': 'SLOW'})
+        return _Resp(200, {'code': 'FAST'})
+
+    monkeypatch.setattr(who_api_client, 'who_get', fake_get)
+    start = time.perf_counter()
+    assert who_api_client.fetch_linearized_entity_by_release('7', 'mms', '2025-01')['code'] == 'FAST'
+    assert time.perf_counter() - start < 0.4
+    assert who_api_client.variant_stats.snapshot()['fetch_linearized_entity_by_release']['preferred'] == \
+        '{icd}/icdapi/release/11/{rel}/{lin}/entities/{entity}'
+
+
+def test_response_store_survives_restart_and_revalidates(fresh_caches, monkeypatch, tmp_path):
+    from app.services import cache_backends
+    store = who_response_store.ResponseStore(cache_backends.SqliteStore(str(tmp_path / 'who.sqlite3')))
+    monkeypatch.setattr(who_response_store, 'WHO_RESPONSE_STORE_PATH', str(tmp_path / 'who.sqlite3'))
+    monkeypatch.setattr(who_response_store, '_store', store)
+    sent = []
+
+    def fake_get(url, **kw):
+        sent.append(kw['headers'])
+        if kw['headers'].get('If-None-Match') == '"v1"':
+            return _Resp(304)
+        return _Resp(200, {'destinationEntities': [{'id': 'http://id.who.int/icd/entity/5'}]}, {'ETag': '"v1"'})
+
+    monkeypatch.setattr(who_api_client, 'who_get', fake_get)
+    assert who_api_client.search_foundation_uri('Jvara').endswith('/5')
+    # A restart empties L1; the durable store answers without calling WHO
+    who_api_client.foundation_search_cache.clear()
+    assert who_api_client.search_foundation_uri('  JVARA ').endswith('/5')
+    assert len(sent) == 1
+
+    # Past its TTL the entry is revalidated with its ETag; a 304 keeps the stored body
+    url = f"{who_api_client.WHO_ID_BASE}/icd/entity/search?q=Jvara"
+    _, entry = store.store.get(store.NS, who_response_store.normalize_url(url))
+    store._put(url, {**entry, 'fresh_until': 0})
+    who_api_client.foundation_search_cache.clear()
+    assert who_api_client.search_foundation_uri('jvara').endswith('/5')
+    assert sent[-1]['If-None-Match'] == '"v1"'
+    stats = who_api_client.cache_stats()['response_store']
+    assert stats['stores'] == 1 and stats['hits'] == 1 and stats['revalidated'] == 1 and stats['entries'] == 1
+
+
+def test_async_client_keeps_sqlite_io_off_the_event_loop(fresh_caches, monkeypatch, tmp_path):
+    import asyncio, httpx, threading
+    from app.services import cache_backends, who_api_async
+    store = who_response_store.ResponseStore(cache_backends.SqliteStore(str(tmp_path / 'who.sqlite3')))
+    monkeypatch.setattr(who_response_store, 'WHO_RESPONSE_STORE_PATH', str(tmp_path / 'who.sqlite3'))
+    monkeypatch.setattr(who_response_store, '_store', store)
+    # SQLite-backed lookup caches, as with CACHE_BACKEND=sqlite
+    shared = cache_backends.SqliteStore(str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setattr(who_api_client, 'negative_cache', cache_backends.SharedTTLCache('who:negative', 10, 60, shared))
+    lookup = who_api_client.search_foundation_uri.lookup
+    monkeypatch.setattr(who_api_client.search_foundation_uri, 'lookup',
+                        lookup._replace(positive_cache=cache_backends.SharedTTLCache('who:fs', 10, 60, shared)))
+    io_threads = []
+    for obj, name in ((store, 'lookup'), (store, 'update'), (shared, 'get'), (shared, 'set')):
+        original = getattr(obj, name)
+        monkeypatch.setattr(obj, name, lambda *a, _f=original, _n=name, **k: io_threads.append((_n, threading.get_ident())) or _f(*a, **k))
+
+    def handler(request):
+        return httpx.Response(200, json={'destinationEntities': [{'id': 'http://id.who.int/icd/entity/5'}]})
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setitem(who_api_async._clients, asyncio.get_running_loop(), client)
+        found = await who_api_async.search_foundation_uri('Jvara')
+        await who_api_async.aclose()
+        return threading.get_ident(), found
+
+    loop_thread, found = asyncio.run(run())
+    assert found.endswith('/5')
+    assert sorted({n for n, _ in io_threads}) == ['get', 'lookup', 'set', 'update']
+    assert loop_thread not in {t for _, t in io_threads}
+
+
+def test_budget_prefers_interactive_lane_and_rejects_after_max_wait():
+    import threading, time
+    budget = who_api_client._Budget(rate=1000, burst=10, max_concurrency=1)
+    budget.acquire(who_api_client.INTERACTIVE, 1)  # the only slot is now taken
+    order = []
+
+    def caller(lane, delay):
+        time.sleep(delay)
+        budget.acquire(lane, 2)
+        order.append(lane)
+        time.sleep(0.05)
+        budget.release(200)
+
+    threads = [threading.Thread(target=caller, args=(who_api_client.BACKGROUND, 0)),
+               threading.Thread(target=caller, args=(who_api_client.INTERACTIVE, 0.05))]
+    for t in threads:
+        t.start()
+    time.sleep(0.15)
+    budget.release(200)
+    for t in threads:
+        t.join()
+    # Background queued first, but the interactive caller got the freed slot
+    assert order == [who_api_client.INTERACTIVE, who_api_client.BACKGROUND]
+
+    budget.acquire(who_api_client.INTERACTIVE, 1)
+    with pytest.raises(who_api_client.WhoBudgetExceeded):
+        budget.acquire(who_api_client.BACKGROUND, 0.1)
+    stats = budget.stats()
+    assert stats['queued'] == 3 and stats['rejected'] == 1 and stats['in_flight'] == 1
+
+
+def test_429_slows_the_budget_and_is_not_negative_cached(fresh_caches, monkeypatch):
+    budget = who_api_client._Budget(rate=10, burst=10, max_concurrency=4)
+    monkeypatch.setattr(who_api_client, 'budget', budget)
+
+    class _Session:
+        def get(self, url, **kw):
+            return _Resp(429, headers={'Retry-After': '0'})
+
+    monkeypatch.setattr(who_api_client, '_session', _Session())
+    assert who_api_client.search_foundation_uri('Jvara') is None
+    stats = budget.stats()
+    # Every attempt, retries included, was counted and halved the rate
+    attempts = who_api_client.WHO_MAX_RETRIES + 1
+    assert stats['granted'] == stats['throttled'] == attempts and stats['in_flight'] == 0
+    assert stats['rate_per_second'] == max(10 / 16, 10 / 2 ** attempts)
+    assert who_api_client.cache_stats()['negative_entries'] == 0
+    assert who_api_client.cache_stats()['throttled_misses'] >= 1
+
+
+def test_transport_failures_are_not_negative_cached(fresh_caches, monkeypatch):
+    import asyncio, httpx
+    from app.services import who_api_async
+    monkeypatch.setattr(who_api_client, 'WHO_MAX_RETRIES', 0)
+    answers = [who_api_client.requests.exceptions.ReadTimeout('slow'), _Resp(503), _Resp(200, {})]
+
+    class _Session:
+        def get(self, url, **kw):
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+    monkeypatch.setattr(who_api_client, '_session', _Session())
+    assert who_api_client.search_foundation_uri('Jvara') is None  # timeout
+    assert who_api_client.search_foundation_uri('Jvara') is None  # 5xx after retries
+    assert who_api_client.cache_stats()['negative_entries'] == 0
+    assert who_api_client.search_foundation_uri('Jvara') is None  # WHO has nothing: remembered
+    assert who_api_client.cache_stats()['negative_entries'] == 1 and not answers
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+        monkeypatch.setitem(who_api_async._clients, asyncio.get_running_loop(), client)
+        found = await who_api_async.search_foundation_uri('Suram')
+        await who_api_async.aclose()
+        return found
+
+    assert asyncio.run(run()) is None
+    assert who_api_client.cache_stats()['negative_entries'] == 1
+
+
+def test_circuit_opens_after_failures_and_recovers_through_a_probe(fresh_caches, monkeypatch):
+    import time
+    monkeypatch.setattr(who_api_client, 'WHO_BREAKER_FAILURES', 2)
+    monkeypatch.setattr(who_api_client, 'WHO_BREAKER_OPEN_SECONDS', 0.1)
+    monkeypatch.setattr(who_api_client, 'WHO_MAX_RETRIES', 0)  # one attempt per call
+    sent = []
+    healthy = {'up': False}
+
+    class _Session:
+        def get(self, url, **kw):
+            sent.append(url)
+            if not healthy['up']:
+                raise who_api_client.requests.exceptions.ConnectionError('down')
+            return _Resp(200, {})
+
+    monkeypatch.setattr(who_api_client, '_session', _Session())
+    url = f"{who_api_client.WHO_ID_BASE}/icd/entity/1"
+    for _ in range(2):
+        with pytest.raises(who_api_client.requests.exceptions.ConnectionError):
+            who_api_client.who_get(url)
+    # Open: fails fast without touching the network; other hosts are unaffected
+    with pytest.raises(who_api_client.WhoHostUnavailable):
+        who_api_client.who_get(url)
+    assert len(sent) == 2
+    assert who_api_client.breakers.degraded() and not who_api_client.breakers.all_open()
+
+    time.sleep(0.15)
+    healthy['up'] = True
+    assert who_api_client.who_get(url).status_code == 200  # the half-open probe
+    assert not who_api_client.breakers.degraded()
+    stats = who_api_client.breakers.stats()[who_api_client.urlsplit(url).netloc]
+    assert stats['state'] == 'closed' and stats['opened'] == 1 and stats['short_circuited'] == 1 and stats['recovered'] == 1
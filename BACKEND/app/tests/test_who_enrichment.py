@@ -0,0 +1,108 @@
+import os, uuid
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test_unified.db')
+os.environ.setdefault('SECRET_KEY', 'a_very_secret_key_for_development_change_me')
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_ID', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_SECRET', 'dummy')
+os.environ.setdefault('WHO_TOKEN_URL', 'https://example.org/token')
+os.environ.setdefault('WHO_API_BASE_URL', 'https://example.org/api')
+
+import pytest
+from app.core.config import settings
+from app.db.models import Base, ICD11Code, WhoEnrichmentJob
+from app.db.session import engine, SessionLocal
+from app.services import who_api_client, who_enrichment
+
+Base.metadata.create_all(bind=engine)
+
+RELEASE = 'bulk-01'
+
+
+@pytest.fixture
+def stub_who(monkeypatch):
+    """WHO answers MMS for every name and TM2 only for names containing 'Jvara'."""
+    calls = []
+
+    def mms(term, release=None):
+        calls.append(term)
+        return {'code': 'BK01', 'title': {'@value': term}, 'definition': f'Def of {term}', '@id': 'http://id.who.int/icd/entity/77'}
+
+    def tm2(term):
+        return {'code': 'SM01', 'title': {'@value': 'Jvara (TM2)'}, 'definition': 'TM2 def'} if 'Jvara' in term else None
+
+    monkeypatch.setattr(who_api_client, 'mms_search_by_release', mms)
+    monkeypatch.setattr(who_api_client, 'search_and_fetch_tm2', tm2)
+    for fn in ('tm2_search_by_release', 'search_foundation_uri', 'search_and_fetch_entity', 'search_tm2_by_terms'):
+        monkeypatch.setattr(who_api_client, fn, lambda *a, **k: None)
+    monkeypatch.setattr(settings, 'WHO_ENRICHMENT_BATCH_SIZE', 2)
+    who_api_client.breakers.reset()
+    return calls
+
+
+def _seed(*names):
+    with SessionLocal() as db:
+        rows = [ICD11Code(icd_name=n) for n in names]
+        db.add_all(rows)
+        db.commit()
+        return [r.id for r in rows]
+
+
+def _run(**kw):
+    job = who_enrichment.start(**kw)
+    who_enrichment._worker.join(timeout=30)
+    return job
+
+
+def test_bulk_enrichment_fills_mms_and_tm2_in_batches(stub_who, monkeypatch):
+    from app.services import translation_index
+    rebuilds = []
+    monkeypatch.setattr(translation_index, 'schedule_rebuild', lambda names=(): rebuilds.append(set(names)))
+    suffix = uuid.uuid4().hex[:8]
+    ids = _seed(f'Jvara {suffix}', f'Kasa {suffix}', f'Atisara {suffix}')
+    job = _run(release=RELEASE)
+    # Two chunks, one index rebuild at the end covering both
+    assert len(rebuilds) == 1 and {f'Jvara {suffix}', f'Kasa {suffix}', f'Atisara {suffix}'} <= rebuilds[0]
+
+    with SessionLocal() as db:
+        rows = {r.id: r for r in db.query(ICD11Code).filter(ICD11Code.id.in_(ids))}
+        jvara, kasa = rows[ids[0]], rows[ids[1]]
+        assert jvara.icd_code == 'BK01' and jvara.description == f'Def of Jvara {suffix}'
+        assert jvara.tm2_code == 'SM01' and jvara.tm2_definition == 'TM2 def' and jvara.who_release == RELEASE
+        assert kasa.icd_code == 'BK01' and kasa.tm2_code is None and kasa.who_enrich_failed is False
+    status = who_enrichment.status(job['id'])
+    assert status['state'] == 'completed' and status['processed'] == status['total'] >= 3
+    assert who_enrichment.progress(job['id'])['percent'] == 100.0
+
+    # Rows already attempted for the release are skipped unless forced
+    stub_who.clear()
+    job = _run(release=RELEASE)
+    assert who_enrichment.status(job['id'])['total'] == 0 and stub_who == []
+    _run(release=RELEASE, force=True)
+    assert f'Kasa {suffix}' in stub_who
+
+
+def test_interrupted_job_resumes_from_its_checkpoint(stub_who):
+    suffix = uuid.uuid4().hex[:8]
+    ids = _seed(f'Done {suffix}', f'Pending {suffix}')
+    with SessionLocal() as db:
+        db.add(WhoEnrichmentJob(state='running', release=RELEASE, force=False, concurrency=2,
+                                last_icd_id=ids[0], total=1, processed=0, enriched=0, not_found=0, deferred=0))
+        db.commit()
+
+    job = who_enrichment.resume()
+    who_enrichment._worker.join(timeout=30)
+    assert f'Done {suffix}' not in stub_who and f'Pending {suffix}' in stub_who
+    assert who_enrichment.status(job['id'])['state'] == 'completed'
+    assert who_enrichment.resume() is None
+
+
+def test_rows_missing_during_a_who_outage_are_deferred(stub_who, monkeypatch):
+    suffix = uuid.uuid4().hex[:8]
+    (icd_id,) = _seed(f'Outage {suffix}')
+    monkeypatch.setattr(who_api_client, 'mms_search_by_release', lambda *a, **k: None)
+    monkeypatch.setattr(who_api_client.breakers, 'degraded', lambda: True)
+    job = _run(release=RELEASE)
+    with SessionLocal() as db:
+        assert db.get(ICD11Code, icd_id).who_enriched_at is None
+    assert who_enrichment.status(job['id'])['deferred'] >= 1
@@ -0,0 +1,95 @@
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test_unified.db')
+os.environ.setdefault('SECRET_KEY', 'a_very_secret_key_for_development_change_me')
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_ID', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_SECRET', 'dummy')
+os.environ.setdefault('WHO_TOKEN_URL', 'https://example.org/token')
+os.environ.setdefault('WHO_API_BASE_URL', 'https://example.org/api')
+
+import pytest
+from app.db.models import Base
+from app.db.session import engine, SessionLocal
+from app.services import who_api_client, who_release_mirror, who_response_store
+
+Base.metadata.create_all(bind=engine)
+
+# A few rows in the shape of WHO's LinearizationMiniOutput tabulation
+MMS_TABULATION = "\t".join(["Foundation URI", "Linearization URI", "Code", "BlockId", "Title", "ClassKind"]) + "\n" + "\n".join([
+    "\t".join(["", "http://id.who.int/icd/release/11/2025-01/mms/1", "01", "", "Certain infectious or parasitic diseases", "chapter"]),
+    "\t".join(["http://id.who.int/icd/entity/1435254666", "http://id.who.int/icd/release/11/2025-01/mms/1435254666", "1A00", "", "- Cholera", "category"]),
+    "\t".join(["http://id.who.int/icd/entity/1435254666", "http://id.who.int/icd/release/11/2025-01/mms/1435254666/unspecified", "1A00.Z", "", "- - Cholera, unspecified", "category"]),
+    "\t".join(["http://id.who.int/icd/entity/257068234", "http://id.who.int/icd/release/11/2025-01/mms/257068234", "1A01", "", "- Intestinal infection due to other Vibrio", "category"]),
+]) + "\n"
+
+TM2_DUMP = (
+    '{"id": "http://id.who.int/icd/entity/1234", "code": "SM31", "title": {"@value": "Fever disorder (TM2)"},'
+    ' "definition": "Elevated body temperature pattern", "synonyms": [{"label": {"@value": "Jvara"}}]}\n'
+)
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    (tmp_path / 'mms.txt').write_text(MMS_TABULATION, encoding='utf-8')
+    (tmp_path / 'tm2.jsonl').write_text(TM2_DUMP, encoding='utf-8')
+    with SessionLocal() as db:
+        mms = who_release_mirror.import_release(db, str(tmp_path / 'mms.txt'), 'fixture-01', 'mms')
+        tm2 = who_release_mirror.import_release(db, str(tmp_path / 'tm2.jsonl'), 'fixture-01', 'TM2')
+    monkeypatch.setattr(who_api_client, 'WHO_RELEASE_MIRROR', True)
+    for cache in (who_api_client.negative_cache, who_api_client.release_search_cache, who_api_client.linearized_entity_cache):
+        cache.clear()
+    yield mms, tm2
+    for cache in (who_api_client.negative_cache, who_api_client.release_search_cache, who_api_client.linearized_entity_cache):
+        cache.clear()
+
+
+def test_import_skips_chapters_and_residuals(mirror):
+    mms, tm2 = mirror
+    assert mms == {'entities': 2, 'terms': 2}
+    assert tm2 == {'entities': 1, 'terms': 2}
+    assert 'fixture-01/mms' in who_release_mirror.stats()['releases']
+
+
+def test_release_lookups_resolve_locally_and_fall_back_on_miss(mirror, monkeypatch):
+    calls = []
+
+    def fake_get(url, **kw):
+        calls.append(url)
+        return type('R', (), {'status_code': 404, 'headers': {}})()
+
+    monkeypatch.setattr(who_api_client, 'WHO_LOCAL_NOAUTH', True)
+    monkeypatch.setattr(who_response_store, 'WHO_RESPONSE_STORE_PATH', '')
+    monkeypatch.setattr(who_api_client, 'who_get', fake_get)
+    hit = who_api_client.mms_search_by_release('  cholera ', 'fixture-01')
+    assert hit['code'] == '1A00' and hit['title']['@value'] == 'Cholera'
+    tm2 = who_api_client.tm2_search_by_release('JVARA', 'fixture-01')
+    assert tm2['code'] == 'SM31' and tm2['definition']['@value'] == 'Elevated body temperature pattern'
+    ent = who_api_client.fetch_linearized_entity_by_release('257068234', 'mms', 'fixture-01')
+    assert ent['code'] == '1A01'
+    assert calls == []
+
+    # Not in the mirror (or release not mirrored): the live API is asked
+    assert who_api_client.mms_search_by_release('Typhoid', 'fixture-01') is None
+    assert calls
+
+
+def test_async_lookups_query_the_mirror_off_the_event_loop(mirror, monkeypatch):
+    import asyncio, threading
+    from app.services import who_api_async
+    threads = []
+    search = who_release_mirror.search
+
+    def recording_search(*args):
+        threads.append(threading.get_ident())
+        return search(*args)
+
+    monkeypatch.setattr(who_release_mirror, 'search', recording_search)
+    monkeypatch.setattr(who_api_client, 'who_get', lambda *a, **k: pytest.fail('mirrored release must not call WHO'))
+
+    async def run():
+        return threading.get_ident(), await who_api_async.mms_search_by_release('Cholera', 'fixture-01')
+
+    loop_thread, found = asyncio.run(run())
+    assert found['code'] == '1A00'
+    assert threads and loop_thread not in threads
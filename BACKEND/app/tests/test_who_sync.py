@@ -0,0 +1,177 @@
+import os, uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test_unified.db')
+os.environ.setdefault('SECRET_KEY', 'a_very_secret_key_for_development_change_me')
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_ID', 'dummy')
+os.environ.setdefault('WHO_API_CLIENT_SECRET', 'dummy')
+os.environ.setdefault('WHO_TOKEN_URL', 'https://example.org/token')
+os.environ.setdefault('WHO_API_BASE_URL', 'https://example.org/api')
+
+import pytest
+from app.core.config import settings
+from app.db.models import Base, ICD11Code
+from app.db.session import engine, SessionLocal
+from app.services import who_api_client, who_sync
+
+Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def stub_who(monkeypatch):
+    """WHO returns a coded entity per name; names containing 'Broken' raise."""
+    answers = {}
+
+    def fetch(term):
+        if 'Broken' in term:
+            raise who_api_client.requests.exceptions.ConnectionError('down')
+        return answers.get(term, {'code': 'WS01', 'title': {'@value': term}, 'definition': {'@value': f'Def of {term}'}})
+
+    monkeypatch.setattr(who_api_client, 'search_and_fetch_entity', fetch)
+    monkeypatch.setattr(settings, 'WHO_SYNC_BATCH_SIZE', 2)
+    who_api_client.breakers.reset()
+    # Rows left by other tests (and earlier runs on the shared DB) count as fresh, so a
+    # cycle only visits the rows the test seeds
+    with SessionLocal() as db:
+        db.query(ICD11Code).update({'who_synced_at': datetime.now(timezone.utc)})
+        db.commit()
+    return answers
+
+
+def _seed(*names):
+    with SessionLocal() as db:
+        rows = [ICD11Code(icd_name=n) for n in names]
+        db.add_all(rows)
+        db.commit()
+        return [r.id for r in rows]
+
+
+def test_sync_cycle_visits_only_stale_rows_and_tracks_changes(stub_who):
+    suffix = uuid.uuid4().hex[:8]
+    ids = _seed(f'Sync A {suffix}', f'Sync B {suffix}', f'Sync Broken {suffix}')
+    cycle = who_sync._run_cycle()
+    assert cycle['checked'] == 3 and cycle['changes'] == 2 and cycle['failed'] == 1
+    assert cycle['chunks'] == 2 and cycle['rows_per_second'] is not None
+    with SessionLocal() as db:
+        a, b, broken = (db.get(ICD11Code, i) for i in ids)
+        assert a.icd_code == 'WS01' and a.description == f'Def of Sync A {suffix}'
+        assert a.who_synced_at is not None and len(a.who_sync_hash) == 64
+        assert broken.who_synced_at is None  # failed lookups stay stale for the next cycle
+
+    # Freshly checked rows are skipped; only the failed one is retried
+    cycle = who_sync._run_cycle()
+    assert cycle['checked'] == 1 and cycle['failed'] == 1 and cycle['stale_remaining'] == 1
+
+    # Stale again with an identical WHO payload: checked, nothing written but the timestamp
+    with SessionLocal() as db:
+        db.get(ICD11Code, ids[0]).who_synced_at = datetime.now(timezone.utc) - timedelta(hours=settings.WHO_SYNC_STALE_HOURS + 1)
+        db.get(ICD11Code, ids[1]).who_synced_at = datetime.now(timezone.utc) - timedelta(hours=settings.WHO_SYNC_STALE_HOURS + 1)
+        db.commit()
+    stub_who[f'Sync B {suffix}'] = {'code': 'WS02', 'title': {'@value': 'B'}, 'definition': {'@value': 'New B'}}
+    cycle = who_sync._run_cycle()
+    assert cycle['unchanged'] == 1 and cycle['changes'] == 1
+    with SessionLocal() as db:
+        assert db.get(ICD11Code, ids[1]).icd_code == 'WS02'
+
+    status = who_sync.status()
+    assert status['recent_cycles'][-1] == cycle
+
+
+def test_sync_job_checks_the_rows_after_its_cursor_and_excludes_cycles(stub_who, monkeypatch):
+    import threading
+    ids = _seed(*[f'Trigger {i} {uuid.uuid4().hex[:8]}' for i in range(3)])
+    gate, fetch = threading.Event(), who_api_client.search_and_fetch_entity
+    monkeypatch.setattr(who_api_client, 'search_and_fetch_entity', lambda term: gate.wait(10) and fetch(term))
+    job = who_sync.enqueue_job(page_size=2, cursor=ids[0] - 1)
+    # The scheduler leader cannot start a cycle (and cut a release) while the job runs
+    assert not who_sync._cycle_guard.acquire()
+    gate.set()
+    who_sync._job_worker.join(timeout=30)
+    job = who_sync.job_status(job['id'])
+    assert job['state'] == 'completed' and job['processed'] == job['total'] == 3 and job['changes'] == 3
+
+    assert who_sync._cycle_guard.acquire()
+    try:
+        with pytest.raises(who_sync.SyncJobRunning):
+            who_sync.enqueue_job()
+    finally:
+        who_sync._cycle_guard.release()
+
+
+def test_leader_lock_admits_a_single_holder():
+    from app.services import leader_lock
+    name = f'test-leader-{uuid.uuid4().hex[:8]}'
+    first, second = leader_lock.LeaderLock(name), leader_lock.LeaderLock(name)
+    assert first.acquire() and first.held()
+    assert not second.acquire() and not second.held()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_leader_lock_drops_its_own_connection_when_unlock_fails(monkeypatch):
+    from types import SimpleNamespace
+    from sqlalchemy.pool import NullPool
+    from app.services import leader_lock
+    with leader_lock._lock_connect() as conn:
+        assert isinstance(conn.engine.pool, NullPool)  # never the app's pool
+
+    class _Conn:
+        calls = []
+
+        def execute(self, stmt, params=None):
+            if 'unlock' in str(stmt):
+                raise RuntimeError('connection reset')
+            return SimpleNamespace(scalar=lambda: True)
+
+        def commit(self):
+            pass
+
+        def invalidate(self):
+            self.calls.append('invalidate')
+
+        def close(self):
+            self.calls.append('close')
+
+    monkeypatch.setattr(leader_lock, 'engine', SimpleNamespace(dialect=SimpleNamespace(name='postgresql')))
+    monkeypatch.setattr(leader_lock, '_lock_connect', _Conn)
+    lock = leader_lock.LeaderLock(f'test-leader-{uuid.uuid4().hex[:8]}')
+    assert lock.acquire()
+    lock.release()
+    assert _Conn.calls == ['invalidate', 'close'] and not lock.held()
+
+
+def test_status_is_read_from_the_persisted_row(stub_who, monkeypatch):
+    _seed(f'Persisted {uuid.uuid4().hex[:8]}')
+    cycle = who_sync._run_cycle(max_rows=25)
+    # Another worker has none of this process's in-memory state
+    monkeypatch.setattr(who_sync, '_recent_cycles', who_sync.deque(maxlen=10))
+    monkeypatch.setattr(who_sync, '_last_status', {})
+    status = who_sync.status()
+    assert status['last_cycle']['checked'] == cycle['checked']
+    assert status['recent_cycles'][-1]['started_at'] == cycle['started_at']
+
+
+def test_trigger_enqueues_a_paged_job_over_the_whole_table(stub_who):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    ids = _seed(*[f'Job {i} {uuid.uuid4().hex[:8]}' for i in range(3)])
+    with SessionLocal() as db:
+        # Fresh rows are still revisited by a full job
+        db.get(ICD11Code, ids[0]).who_synced_at = datetime.now(timezone.utc)
+        db.commit()
+
+    client = TestClient(app)
+    r = client.post('/api/admin/who-sync/trigger', params={'page_size': 2, 'cursor': ids[0] - 1})
+    assert r.status_code == 202, r.text
+    job_id = r.json()['job_id']
+    who_sync._job_worker.join(timeout=30)
+
+    job = client.get(f'/api/admin/who-sync/jobs/{job_id}').json()
+    assert job['state'] == 'completed' and job['processed'] == job['total'] >= 3 and job['percent'] == 100.0
+    assert job['cursor'] >= ids[-1] and job['changes'] >= 3
+    with SessionLocal() as db:
+        assert all(db.get(ICD11Code, i).icd_code == 'WS01' for i in ids)
+    assert who_sync.status()['recent_cycles'][-1]['trigger'] == f'job {job_id}'
+    assert client.get('/api/admin/who-sync/jobs/999999').status_code == 404
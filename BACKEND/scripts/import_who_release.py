@@ -0,0 +1,31 @@
+"""Import a WHO ICD-11 release file (MMS or TM2) into the local release mirror.
+
+Run with:
+    python -m scripts.import_who_release <file> --release 2025-01 --linearization mms
+
+<file> is a linearization tabulation (LinearizationMiniOutput-*.txt, tab-separated) or an
+entity dump (.json / .jsonl). Re-importing the same release/linearization replaces it.
+"""
+import argparse
+
+from app.db.session import SessionLocal, engine
+from app.db.models import Base
+from app.services import who_release_mirror
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--release", required=True, help="WHO release id, e.g. 2025-01")
+    parser.add_argument("--linearization", required=True, choices=("mms", "tm2"))
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        counts = who_release_mirror.import_release(db, args.path, args.release, args.linearization)
+    print(f"Imported {counts['entities']} entities ({counts['terms']} search terms) "
+          f"into the {args.release}/{args.linearization} mirror.")
+
+
+if __name__ == "__main__":
+    main()